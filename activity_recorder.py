@@ -0,0 +1,95 @@
+# activity_recorder.py
+
+# --- Standard Library Imports ---
+import json  # Tuần tự hóa details (dict) để lưu vào cột Text
+import threading
+from datetime import datetime, timedelta
+
+# --- Application-Specific Imports ---
+from models import UserActivity
+from write_behind import WriteBehindWriter  # Hàng đợi + thread nền bulk insert dùng chung
+
+DEFAULT_COLLAPSE_WINDOW_SECONDS = 30 * 60  # Xem lại cùng một trang trong 30 phút chỉ ghi một lần
+DEFAULT_COLLAPSE_PREFIXES = ('accessed_',)  # Các activity_type được coi là "xem trang"
+MAX_TRACKED_VIEWS = 50000  # Giới hạn số khóa (user, trang) được nhớ trong mỗi process
+
+
+class ActivityRecorder(WriteBehindWriter):
+    """
+    Ghi UserActivity theo kiểu write-behind (xem WriteBehindWriter, cấu hình với tiền tố USER_ACTIVITY_).
+
+    Các sự kiện "xem trang" (activity_type bắt đầu bằng ACTIVITY_COLLAPSE_PREFIXES) của cùng một người dùng,
+    cùng trang và cùng details chỉ được ghi một lần trong ACTIVITY_COLLAPSE_WINDOW_SECONDS, nên bảng
+    user_activity tăng theo số buổi học thực sự chứ không theo số lần tải trang.
+    Việc gộp được thực hiện trong bộ nhớ của từng process, nên các trang chỉ đọc
+    không còn ghi database trong request.
+    """
+
+    model = UserActivity
+    config_prefix = 'USER_ACTIVITY'
+    extension_name = 'activity_recorder'
+    thread_name = 'activity-recorder'
+
+    def __init__(self, app=None):
+        self._last_recorded = {}  # (user_id, activity_type, details) -> thời điểm ghi gần nhất
+        self._views_lock = threading.Lock()
+        self.collapse_window = timedelta(seconds=DEFAULT_COLLAPSE_WINDOW_SECONDS)
+        self.collapse_prefixes = DEFAULT_COLLAPSE_PREFIXES
+        super().__init__(app)
+
+    def init_app(self, app):
+        """
+        Ngoài cấu hình của WriteBehindWriter, đọc thêm:
+          - ACTIVITY_COLLAPSE_WINDOW_SECONDS: cửa sổ gộp các lần xem trang lặp lại (0 để tắt).
+          - ACTIVITY_COLLAPSE_PREFIXES: tuple tiền tố activity_type được gộp.
+        """
+        self.collapse_window = timedelta(seconds=app.config.setdefault(
+            'ACTIVITY_COLLAPSE_WINDOW_SECONDS', DEFAULT_COLLAPSE_WINDOW_SECONDS))
+        self.collapse_prefixes = tuple(app.config.setdefault('ACTIVITY_COLLAPSE_PREFIXES', DEFAULT_COLLAPSE_PREFIXES))
+        super().init_app(app)
+
+    def _to_row(self, activity):
+        return {
+            'user_id': activity['user_id'],
+            'activity_type': activity['activity_type'],
+            'details': activity['details'],
+            'timestamp': activity['timestamp'],
+        }
+
+    def _should_collapse(self, key, now):
+        """True nếu cùng sự kiện xem trang đã được ghi trong cửa sổ gộp."""
+        with self._views_lock:
+            last_recorded = self._last_recorded.get(key)
+            if last_recorded is not None and now - last_recorded < self.collapse_window:
+                return True
+            self._last_recorded[key] = now
+            if len(self._last_recorded) > MAX_TRACKED_VIEWS:
+                # Bỏ các khóa đã hết cửa sổ gộp để giới hạn bộ nhớ
+                cutoff = now - self.collapse_window
+                self._last_recorded = {k: t for k, t in self._last_recorded.items() if t >= cutoff}
+            return False
+
+    def record(self, user_id, activity_type, details=None):
+        """
+        Ghi nhận một hoạt động của người dùng (không ghi database trong request).
+
+        Args:
+            user_id (int): ID người dùng. Bỏ qua nếu None (chưa đăng nhập).
+            activity_type (str): Loại hoạt động, ví dụ 'accessed_dashboard_page', 'words_saved'.
+            details (dict | str, optional): Thông tin thêm; dict được lưu dưới dạng JSON.
+
+        Returns:
+            bool: True nếu sự kiện được đưa vào hàng đợi, False nếu bị gộp hoặc bị bỏ.
+        """
+        if not user_id:
+            return False
+        if details is not None and not isinstance(details, str):
+            details = json.dumps(details, ensure_ascii=False, sort_keys=True)
+
+        now = datetime.utcnow()
+        if self.collapse_window and activity_type.startswith(self.collapse_prefixes):
+            if self._should_collapse((user_id, activity_type, details), now):
+                self._count('collapsed')
+                return False
+
+        return self.write({'user_id': user_id, 'activity_type': activity_type, 'details': details, 'timestamp': now})
@@ -0,0 +1,337 @@
+# api_log_archive.py
+
+# --- Standard Library Imports ---
+import gzip  # Các đoạn lưu trữ là JSON Lines nén gzip (mỗi lần lưu thêm một gzip member)
+import json
+import os
+import tempfile  # Ghi file index nguyên tử (ghi file tạm rồi os.replace)
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+# --- Third-party Library Imports ---
+from sqlalchemy import select, delete, func
+
+# --- Application-Specific Imports ---
+from api_log_writer import API_LOG_COLUMNS
+from models import db, APILog
+
+# Lưu trữ APILog cũ: log có timestamp trước (đầu ngày hôm nay - API_LOG_RETENTION_DAYS) được chuyển từ bảng api_log
+# sang các file JSON Lines nén gzip, mỗi ngày (UTC) một file api_log-YYYY-MM-DD.jsonl.gz trong API_LOG_ARCHIVE_DIR,
+# rồi bị xóa khỏi bảng theo từng lô. index.json trong cùng thư mục ghi số dòng, khoảng thời gian và khoảng id
+# của từng file, nên việc đọc lại một khoảng ngày chỉ mở đúng các file cần thiết.
+#
+# Số liệu tổng hợp (api_call_hourly/api_call_daily, api_latency_bucket) không bị xóa cùng log, nên thống kê
+# trên /admin/api-logs vẫn đầy đủ. Mốc xóa luôn là đầu một ngày, nên log còn lại trong bảng là trọn các ngày
+# (xem api_rollups.rebuild_rollups).
+
+INDEX_FILENAME = 'index.json'
+LOCK_FILENAME = '.archive.lock'
+STALE_LOCK_SECONDS = 3600  # Lock lâu hơn thế này coi như sót lại do process bị dừng giữa chừng
+ARCHIVE_COLUMNS = ('id',) + API_LOG_COLUMNS
+
+
+def segment_filename(day):
+    return f"api_log-{day.isoformat()}.jsonl.gz"
+
+
+def _to_json_row(row):
+    values = dict(row._mapping)
+    values['timestamp'] = values['timestamp'].isoformat()
+    return values
+
+
+def _from_json_row(values):
+    values['timestamp'] = datetime.fromisoformat(values['timestamp'])
+    return values
+
+
+class ArchiveLocked(Exception):
+    """Một process khác đang lưu trữ log."""
+
+
+class APILogArchiver:
+    """
+    Extension chuyển APILog cũ sang file lưu trữ (xem đầu file) và đọc lại khi admin cần.
+
+    Cấu hình:
+      - API_LOG_RETENTION_DAYS: số ngày log được giữ trong bảng api_log (mặc định 30; None hoặc 0 để giữ tất cả).
+      - API_LOG_ARCHIVE_DIR: thư mục chứa file lưu trữ (mặc định <instance>/api_log_archive).
+      - API_LOG_ARCHIVE_BATCH_SIZE: số log được chuyển và xóa trong một transaction (mặc định 5000).
+      - API_LOG_ARCHIVE_INTERVAL_SECONDS: chu kỳ tự lưu trữ, chạy trong thread nền sau một request
+        (mặc định 3600; 0 để chỉ chạy bằng `flask archive-api-logs`).
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.retention_days = None
+        self.directory = None
+        self.batch_size = 5000
+        self.interval = 0
+        self._last_run = time.monotonic()
+        self._run_lock = threading.Lock()  # Mỗi process chỉ một lần lưu trữ tại một thời điểm
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.retention_days = app.config.setdefault('API_LOG_RETENTION_DAYS', 30)
+        self.directory = app.config.setdefault('API_LOG_ARCHIVE_DIR', os.path.join(app.instance_path, 'api_log_archive'))
+        self.batch_size = app.config.setdefault('API_LOG_ARCHIVE_BATCH_SIZE', 5000)
+        self.interval = app.config.setdefault('API_LOG_ARCHIVE_INTERVAL_SECONDS', 3600)
+        app.extensions['api_log_archive'] = self
+        app.after_request(self._maybe_archive_in_background)
+
+    # --- Index ---
+
+    def _path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def load_index(self):
+        """
+        Đọc index.json: {'segments': {tên file: thông tin},
+                         'pending_append': None hoặc {max_id, cutoff, sizes: {tên file: số byte trước khi ghi}},
+                         'pending_delete': None hoặc {max_id, cutoff}}.
+        """
+        try:
+            with open(self._path(INDEX_FILENAME), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'segments': {}, 'pending_append': None, 'pending_delete': None}
+
+    def _save_index(self, index):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(index, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(tmp_path, self._path(INDEX_FILENAME))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _acquire_lock(self):
+        """Lock giữa các process (file tạo bằng O_EXCL, dùng được trên mọi hệ điều hành)."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(LOCK_FILENAME)
+        try:
+            if time.time() - os.path.getmtime(path) > STALE_LOCK_SECONDS:
+                os.remove(path)
+        except OSError:
+            pass
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            raise ArchiveLocked(path)
+
+    def _release_lock(self):
+        try:
+            os.remove(self._path(LOCK_FILENAME))
+        except FileNotFoundError:
+            pass
+
+    # --- Lưu trữ ---
+
+    def cutoff(self, retention_days=None, now=None):
+        """Mốc xóa: đầu ngày (UTC) cách hôm nay `retention_days` ngày, hoặc None nếu không giới hạn."""
+        retention_days = self.retention_days if retention_days is None else retention_days
+        if not retention_days:
+            return None
+        today = (now or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0)
+        return today - timedelta(days=retention_days)
+
+    def archive(self, retention_days=None, now=None):
+        """
+        Chuyển log cũ hơn mốc xóa sang file lưu trữ và xóa khỏi api_log, từng lô API_LOG_ARCHIVE_BATCH_SIZE log.
+
+        Với mỗi lô:
+          1. Ghi index kèm 'pending_append' (max_id của lô và kích thước các file sẽ được ghi thêm).
+          2. Ghi thêm vào file của từng ngày, rồi ghi index với thông tin file mới và 'pending_delete'
+             thay cho 'pending_append'.
+          3. Xóa lô khỏi bảng và commit, rồi mới bỏ 'pending_delete'.
+        Nếu process dừng giữa chừng: dừng ở bước 1-2, lần chạy sau cắt các file về kích thước đã ghi
+        (bỏ phần của lô dang dở, các dòng vẫn còn trong bảng và được lưu lại); dừng ở bước 3, lần chạy sau
+        chỉ xóa nốt lô đó. Không dòng nào bị ghi trùng vào file hay bị xóa khi chưa được lưu.
+
+        Returns:
+            dict: {archived: số log đã chuyển, deleted: số log đã xóa khỏi bảng, cutoff: mốc xóa}.
+
+        Raises:
+            ArchiveLocked: Nếu một process khác đang lưu trữ.
+        """
+        cutoff = self.cutoff(retention_days, now)
+        result = {'archived': 0, 'deleted': 0, 'cutoff': cutoff}
+        if cutoff is None:
+            return result
+
+        self._acquire_lock()
+        try:
+            index = self.load_index()
+            if index.get('pending_append'):
+                self._rollback_pending_append(index)
+            if index.get('pending_delete'):
+                result['deleted'] += self._finish_pending_delete(index)
+
+            columns = [getattr(APILog, column) for column in ARCHIVE_COLUMNS]
+            while True:
+                rows = db.session.execute(
+                    select(*columns).where(APILog.timestamp < cutoff).order_by(APILog.id).limit(self.batch_size)
+                ).all()
+                if not rows:
+                    break
+                pending = {'max_id': rows[-1].id, 'cutoff': cutoff.isoformat()}
+                index['pending_append'] = dict(pending, sizes=self._segment_sizes(rows))
+                self._save_index(index)
+                self._append_segments(index, rows)
+                index['pending_append'] = None
+                index['pending_delete'] = pending
+                self._save_index(index)
+                result['archived'] += len(rows)
+                result['deleted'] += self._finish_pending_delete(index)
+                if len(rows) < self.batch_size:
+                    break
+        finally:
+            self._release_lock()
+        return result
+
+    def _segment_sizes(self, rows):
+        """Kích thước hiện tại (byte, 0 nếu chưa có) của các file mà các dòng sẽ được ghi thêm vào."""
+        sizes = {}
+        for filename in {segment_filename(row.timestamp.date()) for row in rows}:
+            try:
+                sizes[filename] = os.path.getsize(self._path(filename))
+            except FileNotFoundError:
+                sizes[filename] = 0
+        return sizes
+
+    def _rollback_pending_append(self, index):
+        """Cắt các file về kích thước trước lô dang dở (index['pending_append']), rồi bỏ đánh dấu trong index."""
+        for filename, size in index['pending_append']['sizes'].items():
+            path = self._path(filename)
+            if size == 0:
+                if os.path.exists(path):
+                    os.remove(path)
+            elif os.path.exists(path):
+                with open(path, 'r+b') as f:
+                    f.truncate(size)
+        index['pending_append'] = None
+        self._save_index(index)
+
+    def _append_segments(self, index, rows):
+        """Ghi thêm các dòng vào file của ngày tương ứng (một gzip member mới cho mỗi file) và cập nhật index."""
+        by_day = {}
+        for row in rows:
+            by_day.setdefault(row.timestamp.date(), []).append(row)
+
+        for day, day_rows in sorted(by_day.items()):
+            filename = segment_filename(day)
+            with gzip.open(self._path(filename), 'at', encoding='utf-8') as f:
+                for row in day_rows:
+                    f.write(json.dumps(_to_json_row(row), ensure_ascii=False))
+                    f.write('\n')
+
+            segment = index['segments'].setdefault(filename, {
+                'day': day.isoformat(), 'rows': 0, 'min_id': day_rows[0].id, 'max_id': day_rows[0].id,
+                'first_timestamp': day_rows[0].timestamp.isoformat(),
+                'last_timestamp': day_rows[0].timestamp.isoformat(),
+            })
+            segment['rows'] += len(day_rows)
+            segment['min_id'] = min(segment['min_id'], day_rows[0].id)
+            segment['max_id'] = max(segment['max_id'], day_rows[-1].id)
+            segment['first_timestamp'] = min(segment['first_timestamp'],
+                                             min(row.timestamp for row in day_rows).isoformat())
+            segment['last_timestamp'] = max(segment['last_timestamp'],
+                                            max(row.timestamp for row in day_rows).isoformat())
+            segment['bytes'] = os.path.getsize(self._path(filename))
+
+    def _finish_pending_delete(self, index):
+        """Xóa khỏi api_log lô đã được ghi vào file (index['pending_delete']), rồi bỏ đánh dấu trong index."""
+        pending = index['pending_delete']
+        try:
+            deleted = db.session.execute(
+                delete(APILog).where(APILog.id <= pending['max_id'],
+                                     APILog.timestamp < datetime.fromisoformat(pending['cutoff']))
+            ).rowcount
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        index['pending_delete'] = None
+        self._save_index(index)
+        return deleted
+
+    def _maybe_archive_in_background(self, response):
+        """after_request: chạy archive() trong thread nền, mỗi process tối đa một lần mỗi interval giây."""
+        if not self.interval or not self.retention_days or time.monotonic() - self._last_run < self.interval:
+            return response
+        if self._run_lock.acquire(blocking=False):
+            self._last_run = time.monotonic()
+            threading.Thread(target=self._archive_in_app_context, name='api-log-archiver', daemon=True).start()
+        return response
+
+    def _archive_in_app_context(self):
+        try:
+            with self.app.app_context():
+                self.archive()
+        except ArchiveLocked:
+            pass
+        except Exception as e:
+            print(f"ERROR: Lưu trữ API log thất bại: {e}")
+        finally:
+            self._run_lock.release()
+
+    # --- Đọc lại ---
+
+    def get_segments(self, start_day=None, end_day=None):
+        """Thông tin các file lưu trữ trong khoảng ngày [start_day, end_day] (date hoặc None), ngày cũ nhất trước."""
+        segments = []
+        for filename, segment in sorted(self.load_index()['segments'].items()):
+            day = date.fromisoformat(segment['day'])
+            if (start_day is None or day >= start_day) and (end_day is None or day <= end_day):
+                segments.append(dict(segment, file=filename))
+        return segments
+
+    def iter_archived(self, start_day=None, end_day=None, api_name=None, success=None):
+        """
+        Đọc lại log đã lưu trữ trong khoảng ngày, chỉ mở các file mà index cho biết nằm trong khoảng đó.
+
+        Yields:
+            dict: Các cột của APILog (timestamp là datetime), theo thứ tự ngày rồi thứ tự ghi.
+        """
+        for segment in self.get_segments(start_day, end_day):
+            with gzip.open(self._path(segment['file']), 'rt', encoding='utf-8') as f:
+                for line in f:
+                    values = json.loads(line)
+                    if api_name and values['api_name'] != api_name:
+                        continue
+                    if success is not None and bool(values['success']) != success:
+                        continue
+                    yield _from_json_row(values)
+
+    def query_archived(self, start_day=None, end_day=None, api_name=None, success=None, limit=200):
+        """
+        Như iter_archived nhưng dừng sau `limit` log.
+
+        Returns:
+            tuple: (danh sách log, True nếu còn log phù hợp chưa được trả về).
+        """
+        logs = []
+        for values in self.iter_archived(start_day, end_day, api_name=api_name, success=success):
+            if len(logs) >= limit:
+                return logs, True
+            logs.append(values)
+        return logs, False
+
+    def get_stats(self):
+        """Tổng số log/byte đã lưu trữ, khoảng ngày, và log cũ nhất còn trong bảng api_log."""
+        segments = self.get_segments()
+        return {
+            'retention_days': self.retention_days,
+            'segments': len(segments),
+            'rows': sum(segment['rows'] for segment in segments),
+            'bytes': sum(segment.get('bytes', 0) for segment in segments),
+            'first_day': segments[0]['day'] if segments else None,
+            'last_day': segments[-1]['day'] if segments else None,
+            'oldest_live_log': db.session.scalar(select(func.min(APILog.timestamp))),
+        }
@@ -0,0 +1,127 @@
+# api_log_query.py
+
+# --- Standard Library Imports ---
+import csv  # Xuất log dạng CSV
+import io
+import json
+from datetime import datetime, timedelta
+
+# --- Application-Specific Imports ---
+from api_log_writer import API_LOG_COLUMNS
+from keyset import keyset_page  # Phân trang keyset (seek) thay cho OFFSET
+from models import APILog
+
+# Lọc và phân trang log trên /admin/api-logs. Danh sách đi từ mới đến cũ theo keyset (timestamp, id),
+# mỗi bộ lọc có index bắt đầu bằng cột lọc và kết thúc bằng timestamp (xem APILog.__table_args__),
+# nên trang thứ bao nhiêu cũng chỉ đọc `limit` dòng. Xuất CSV/JSON Lines cũng đi theo keyset từng đoạn
+# EXPORT_CHUNK_SIZE dòng, không giữ cả tập kết quả trong bộ nhớ.
+
+KEYSET_COLUMNS = (APILog.timestamp, APILog.id)
+EXPORT_COLUMNS = ('id',) + API_LOG_COLUMNS
+EXPORT_CHUNK_SIZE = 1000
+FILTER_KEYS = ('api_name', 'success', 'user_id', 'status_code', 'since', 'until')
+
+
+def _parse_time(value, end_of_day=False):
+    """'YYYY-MM-DD' hoặc 'YYYY-MM-DDTHH:MM' (input datetime-local). Với ngày không có giờ và end_of_day, lấy hết ngày đó."""
+    parsed = datetime.fromisoformat(value)
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def parse_filters(args):
+    """
+    Đọc bộ lọc từ query string (request.args).
+
+    Returns:
+        tuple: (filters, conditions). filters là dict chuỗi đã nhập (để điền lại form và tạo link),
+               conditions là danh sách điều kiện SQLAlchemy trên APILog.
+
+    Raises:
+        ValueError: Nếu có giá trị không hợp lệ (user_id/status_code không phải số, thời gian sai định dạng...).
+    """
+    filters = {key: (args.get(key) or '').strip() for key in FILTER_KEYS}
+    conditions = []
+    if filters['api_name']:
+        conditions.append(APILog.api_name == filters['api_name'])
+    if filters['success']:
+        if filters['success'] not in ('1', '0'):
+            raise ValueError("success phải là 1 hoặc 0")
+        conditions.append(APILog.success == (filters['success'] == '1'))
+    if filters['user_id']:
+        conditions.append(APILog.user_id == int(filters['user_id']))
+    if filters['status_code']:
+        conditions.append(APILog.status_code == int(filters['status_code']))
+    if filters['since']:
+        conditions.append(APILog.timestamp >= _parse_time(filters['since']))
+    if filters['until']:
+        conditions.append(APILog.timestamp < _parse_time(filters['until'], end_of_day=True))
+    return filters, conditions
+
+
+def active_filters(filters):
+    """Chỉ các bộ lọc có giá trị (để đưa vào url_for mà không sinh ra ?api_name=&success=...)."""
+    return {key: value for key, value in filters.items() if value}
+
+
+def get_page(conditions, after=None, limit=50):
+    """
+    Một trang log mới nhất thỏa `conditions`, theo keyset (timestamp, id) giảm dần.
+
+    Returns:
+        tuple: (logs, next_cursor); next_cursor là None nếu đây là trang cuối.
+
+    Raises:
+        ValueError: Nếu `after` không hợp lệ.
+    """
+    return keyset_page(APILog.query.filter(*conditions), list(KEYSET_COLUMNS),
+                       after=after, limit=limit, descending=True)
+
+
+def iter_logs(conditions, chunk_size=EXPORT_CHUNK_SIZE):
+    """Duyệt toàn bộ log thỏa `conditions` (mới đến cũ), mỗi lần chỉ tải `chunk_size` dòng."""
+    cursor = None
+    while True:
+        logs, cursor = get_page(conditions, after=cursor, limit=chunk_size)
+        yield from logs
+        if cursor is None:
+            return
+
+
+def _export_values(log_entry):
+    values = {column: getattr(log_entry, column) for column in EXPORT_COLUMNS}
+    values['timestamp'] = values['timestamp'].isoformat()
+    return values
+
+
+def iter_csv(conditions):
+    """Sinh từng đoạn CSV (dòng tiêu đề, rồi mỗi chunk log một đoạn) để trả về dưới dạng streaming response."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for count, log_entry in enumerate(iter_logs(conditions), start=1):
+        writer.writerow(_export_values(log_entry))
+        if count % EXPORT_CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_jsonl(conditions):
+    """Như iter_csv nhưng mỗi log là một dòng JSON."""
+    lines = []
+    for log_entry in iter_logs(conditions):
+        lines.append(json.dumps(_export_values(log_entry), ensure_ascii=False))
+        if len(lines) == EXPORT_CHUNK_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (iter_csv, 'text/csv; charset=utf-8'),
+    'jsonl': (iter_jsonl, 'application/x-ndjson; charset=utf-8'),
+}
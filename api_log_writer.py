@@ -0,0 +1,47 @@
+# api_log_writer.py
+
+# --- Standard Library Imports ---
+from datetime import datetime
+
+# --- Application-Specific Imports ---
+import api_rollups  # Số lời gọi theo giờ/ngày, cập nhật cùng lúc với api_log
+import latency_histogram  # Histogram thời gian gọi API, cập nhật cùng lúc với api_log
+from models import APILog
+from write_behind import WriteBehindWriter  # Hàng đợi + thread nền bulk insert dùng chung
+
+# Các cột của APILog được sao chép khi đưa vào hàng đợi (id do database sinh)
+API_LOG_COLUMNS = ('api_name', 'timestamp', 'success', 'status_code', 'error_message', 'request_details', 'user_id',
+                   'duration_ms', 'response_bytes')
+
+
+class APILogWriter(WriteBehindWriter):
+    """
+    Ghi APILog theo kiểu write-behind (xem WriteBehindWriter, cấu hình với tiền tố API_LOG_).
+
+    Trước đây mỗi lời gọi API kết thúc bằng db.session.add(log_entry) + commit() ngay trong request
+    (3 commit cho mỗi từ ở /enter-words), tranh nhau khóa ghi của SQLite và dùng chung session với
+    dữ liệu của người dùng. APILogWriter chỉ sao chép giá trị của log vào hàng đợi; thread nền
+    ghi theo lô bằng session riêng.
+
+    Cùng transaction với mỗi lô, thời gian gọi API (duration_ms) được cộng vào histogram
+    api_latency_bucket (xem latency_histogram.py) để trang admin tính percentile mà không quét api_log,
+    và số lời gọi được cộng vào api_call_hourly/api_call_daily (xem api_rollups.py) cho các thẻ thống kê và biểu đồ.
+    """
+
+    model = APILog
+    config_prefix = 'API_LOG'
+    extension_name = 'api_log_writer'
+    thread_name = 'api-log-writer'
+
+    def _to_row(self, log_entry):
+        """Sao chép giá trị của một APILog (chưa lưu) thành dict để bulk insert."""
+        row = {column: getattr(log_entry, column) for column in API_LOG_COLUMNS}
+        if row['timestamp'] is None:
+            row['timestamp'] = datetime.utcnow()  # Thời điểm gọi API, không phải thời điểm ghi
+        if row['success'] is None:
+            row['success'] = True  # Giống default của cột APILog.success
+        return row
+
+    def _after_insert(self, rows):
+        latency_histogram.record_rows(rows)
+        api_rollups.record_rows(rows)
@@ -0,0 +1,192 @@
+# api_rollups.py
+
+# --- Standard Library Imports ---
+from datetime import datetime, timedelta
+
+# --- Third-party Library Imports ---
+from sqlalchemy import select, delete, insert, func, case
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert  # INSERT ... ON CONFLICT DO UPDATE (app dùng SQLite)
+
+# --- Application-Specific Imports ---
+from models import db, APILog, APICallHourly, APICallDaily
+
+# Số lời gọi API được tổng hợp sẵn theo giờ (api_call_hourly) và theo ngày (api_call_daily), theo api_name,
+# kết quả (success) và mã HTTP. APILogWriter cộng dồn vào hai bảng này trong cùng transaction với mỗi lô api_log
+# (xem api_log_writer.py), nên trang /admin/api-logs không cần COUNT/GROUP BY trên bảng api_log nữa:
+# số dòng phải đọc chỉ phụ thuộc số ngày x số API x số mã HTTP, không phụ thuộc số log.
+
+NO_STATUS_CODE = 0  # status_code của lời gọi không có response (thay cho NULL, vì là một phần của khóa chính)
+
+# Định dạng giống cách SQLAlchemy lưu DateTime trong SQLite, để dòng do rebuild_rollups() tạo bằng SQL
+# và dòng do record_rows() tạo từ Python có cùng khóa chính
+_HOUR_FORMAT = '%Y-%m-%d %H:00:00.000000'
+_DAY_FORMAT = '%Y-%m-%d 00:00:00.000000'
+
+DAILY_CHART_DAYS = 30
+MONTHLY_CHART_MONTHS = 12
+
+
+def _hour_start(timestamp):
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def _day_start(timestamp):
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+ROLLUPS = (
+    (APICallHourly, _hour_start, _HOUR_FORMAT),
+    (APICallDaily, _day_start, _DAY_FORMAT),
+)
+
+
+def aggregate_rows(rows, period_start):
+    """Gộp các dòng APILog (dict) thành các dòng tổng hợp theo (period_start(timestamp), api_name, success, mã HTTP)."""
+    rollup = {}
+    for row in rows:
+        key = (period_start(row['timestamp']), row['api_name'], bool(row['success']),
+               row.get('status_code') or NO_STATUS_CODE)
+        rollup[key] = rollup.get(key, 0) + 1
+    return [{'period_start': key[0], 'api_name': key[1], 'success': key[2], 'status_code': key[3], 'calls': calls}
+            for key, calls in rollup.items()]
+
+
+def record_rows(rows):
+    """
+    Cộng các dòng APILog vừa insert vào api_call_hourly và api_call_daily, trong transaction hiện tại
+    của db.session (không commit).
+    """
+    if not rows:
+        return
+    for model, period_start, _ in ROLLUPS:
+        table = model.__table__
+        statement = sqlite_insert(table).values(aggregate_rows(rows, period_start))
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['period_start', 'api_name', 'success', 'status_code'],
+            set_={'calls': table.c.calls + statement.excluded.calls}))
+
+
+def rebuild_rollups():
+    """
+    Tính lại hai bảng tổng hợp từ bảng api_log (một lần GROUP BY cho mỗi bảng) và commit.
+    Dùng sau khi nâng cấp (log cũ chưa được tổng hợp) hoặc nếu nghi ngờ số liệu bị lệch.
+
+    Chỉ các giờ/ngày từ đầu ngày của log cũ nhất còn trong bảng trở đi được tính lại; số liệu của các ngày
+    trước đó (log đã được chuyển sang file lưu trữ, xem api_log_archive.py) được giữ nguyên.
+
+    Returns:
+        dict: {tên bảng: số dòng tổng hợp}.
+    """
+    oldest = db.session.scalar(select(func.min(APILog.timestamp)))
+    result = {}
+    try:
+        for model, _, period_format in ROLLUPS:
+            if oldest is None:
+                break
+            period_start = func.strftime(period_format, APILog.timestamp)
+            status_code = func.coalesce(APILog.status_code, NO_STATUS_CODE)
+            db.session.execute(delete(model).where(model.period_start >= _day_start(oldest)))
+            db.session.execute(insert(model).from_select(
+                ['period_start', 'api_name', 'success', 'status_code', 'calls'],
+                select(period_start, APILog.api_name, APILog.success, status_code, func.count())
+                .group_by(period_start, APILog.api_name, APILog.success, status_code)))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    for model, _, _ in ROLLUPS:
+        result[model.__tablename__] = db.session.scalar(select(func.count()).select_from(model))
+    return result
+
+
+# --- Đọc số liệu cho /admin/api-logs ---
+
+def _calls_by_success(model):
+    """Các cột tổng: số lời gọi, số thành công, số thất bại."""
+    return (func.coalesce(func.sum(model.calls), 0).label('count'),
+            func.coalesce(func.sum(case((model.success == True, model.calls), else_=0)), 0).label('successful'),  # noqa: E712
+            func.coalesce(func.sum(case((model.success == False, model.calls), else_=0)), 0).label('failed'))  # noqa: E712
+
+
+def get_totals():
+    """
+    Số liệu cho các thẻ thống kê (thay cho các truy vấn COUNT trên api_log).
+
+    Returns:
+        dict: {total_calls, successful_calls, failed_calls, calls_by_api_name, status_codes_by_api_name,
+               last_24h: {count, successful, failed}}. calls_by_api_name là các dòng có thuộc tính
+              api_name, count, successful, failed (giống truy vấn GROUP BY cũ).
+    """
+    calls_by_api_name = db.session.execute(
+        select(APICallDaily.api_name, *_calls_by_success(APICallDaily))
+        .group_by(APICallDaily.api_name).order_by(APICallDaily.api_name)).all()
+
+    status_codes_by_api_name = {}
+    for api_name, status_code, calls in db.session.execute(
+            select(APICallDaily.api_name, APICallDaily.status_code, func.sum(APICallDaily.calls))
+            .group_by(APICallDaily.api_name, APICallDaily.status_code)
+            .order_by(APICallDaily.api_name, APICallDaily.status_code)):
+        status_codes_by_api_name.setdefault(api_name, []).append((status_code or 'none', calls))
+
+    since = _hour_start(datetime.utcnow()) - timedelta(hours=23)
+    last_24h = db.session.execute(
+        select(*_calls_by_success(APICallHourly)).where(APICallHourly.period_start >= since)).one()
+
+    return {
+        'total_calls': sum(row.count for row in calls_by_api_name),
+        'successful_calls': sum(row.successful for row in calls_by_api_name),
+        'failed_calls': sum(row.failed for row in calls_by_api_name),
+        'calls_by_api_name': calls_by_api_name,
+        'status_codes_by_api_name': status_codes_by_api_name,
+        'last_24h': {'count': last_24h.count, 'successful': last_24h.successful, 'failed': last_24h.failed},
+    }
+
+
+def get_daily_series(days=DAILY_CHART_DAYS, today=None):
+    """
+    Số lời gọi thành công/thất bại của từng ngày trong `days` ngày gần nhất (kể cả ngày không có lời gọi).
+
+    Returns:
+        list: Các dict {label, successful, failed, count}, ngày cũ nhất trước.
+    """
+    today = _day_start(today or datetime.utcnow())
+    first_day = today - timedelta(days=days - 1)
+    by_day = {row.period_start: row for row in db.session.execute(
+        select(APICallDaily.period_start, *_calls_by_success(APICallDaily))
+        .where(APICallDaily.period_start >= first_day)
+        .group_by(APICallDaily.period_start))}
+
+    series = []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        row = by_day.get(day)
+        series.append({'label': day.strftime('%Y-%m-%d'),
+                       'successful': row.successful if row else 0,
+                       'failed': row.failed if row else 0,
+                       'count': row.count if row else 0})
+    return series
+
+
+def get_monthly_series(months=MONTHLY_CHART_MONTHS, today=None):
+    """
+    Như get_daily_series nhưng theo tháng (cộng các dòng của api_call_daily), `months` tháng gần nhất.
+    """
+    month_start = _day_start(today or datetime.utcnow()).replace(day=1)
+    month_starts = [month_start]
+    for _ in range(months - 1):
+        month_starts.insert(0, (month_starts[0] - timedelta(days=1)).replace(day=1))
+
+    month = func.strftime('%Y-%m', APICallDaily.period_start)
+    by_month = {row.month: row for row in db.session.execute(
+        select(month.label('month'), *_calls_by_success(APICallDaily))
+        .where(APICallDaily.period_start >= month_starts[0])
+        .group_by(month))}
+
+    series = []
+    for start in month_starts:
+        row = by_month.get(start.strftime('%Y-%m'))
+        series.append({'label': start.strftime('%Y-%m'),
+                       'successful': row.successful if row else 0,
+                       'failed': row.failed if row else 0,
+                       'count': row.count if row else 0})
+    return series
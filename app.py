@@ -2,18 +2,20 @@
 
 # --- Standard Library Imports ---
 import os  # Để tương tác với hệ điều hành, ví dụ: đọc biến môi trường
-from datetime import datetime, timedelta  # Để làm việc với ngày giờ, ví dụ: created_at, added_at
+import json  # Đọc/ghi kết quả enrichment job dạng JSON
+import time  # Thời điểm lưu snapshot người dùng trong session, đo thời gian gọi API
+from datetime import date, datetime, timedelta  # Để làm việc với ngày giờ, ví dụ: created_at, added_at
 from functools import wraps  # Để tạo decorator (ví dụ: @login_required, @admin_required)
 from models import db, APILog
 # --- Flask and Related Extensions ---
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, has_request_context, \
+    get_template_attribute, g, Response, stream_with_context
 from flask_sqlalchemy import \
     SQLAlchemy  # Dòng này có thể không cần nếu db đã được khởi tạo trong models.py và chỉ import db từ đó
 from flask_migrate import Migrate  # Cho việc quản lý thay đổi schema database
 from flask_dance.contrib.google import make_google_blueprint, google  # Cho việc đăng nhập bằng Google OAuth
 from flask_wtf import FlaskForm  # Lớp cơ sở để tạo form trong Flask-WTF
 from flask_wtf.csrf import CSRFProtect  # Để bảo vệ chống lại tấn công CSRF
-from sqlalchemy import func, case
 from flask_wtf import FlaskForm
 
 # --- WTForms Fields and Validators ---
@@ -22,12 +24,35 @@ from wtforms.validators import DataRequired, Email, EqualTo, Length  # Các vali
 
 # --- Third-Party Libraries ---
 from dotenv import load_dotenv  # Để tải biến môi trường từ file .env
-from deep_translator import GoogleTranslator  # Thư viện dịch thuật sử dụng Google Translate
 import requests  # Để gửi các yêu cầu HTTP (ví dụ: gọi API)
+from deep_translator.exceptions import TranslationNotFound  # Google Translate không có bản dịch (không phải lỗi mạng)
+import click  # Tham số cho các lệnh `flask ...` (CLI)
 
 # --- Application-Specific Imports ---
 from models import db, User, VocabularyList, VocabularyEntry, \
-    APILog, UserActivity  # Import SQLAlchemy instance (db) và các model từ file models.py
+    APILog, UserActivity, SaveListRequest, TELEMETRY_BIND_KEY  # Import SQLAlchemy instance (db) và các model từ file models.py
+from enrichment import EnrichmentEngine, is_incomplete  # Bộ máy xử lý song song các từ ở /enter-words
+from enrichment_jobs import EnrichmentJobRunner  # Chạy enrichment ở background, trả kết quả từng phần
+from deadline import DeadlineExceeded  # Request hết thời gian khi đang chờ kết quả của request khác (single-flight)
+from word_cache import WordCache  # Cache 2 tầng (LRU + bảng word_cache) cho kết quả tra cứu từ
+from upstream import UpstreamClient, \
+    UpstreamUnavailable, UpstreamDeadlineExceeded, UpstreamError  # Connection pool keep-alive, timeout, circuit breaker và bulkhead cho các API bên ngoài
+from api_log_writer import APILogWriter  # Ghi APILog theo lô ở background (write-behind)
+from api_log_archive import APILogArchiver, ArchiveLocked  # Chuyển APILog cũ sang file lưu trữ nén
+from telemetry_db import move_legacy_tables as move_legacy_telemetry_tables  # Chuyển bảng telemetry sang database riêng
+from activity_recorder import ActivityRecorder  # Ghi UserActivity theo lô, gộp các lần xem trang lặp lại
+from sqlite_tuning import SQLiteTuning  # PRAGMA cho connection SQLite (WAL...) và PRAGMA optimize định kỳ
+from query_plans import check_hot_queries  # Kiểm tra EXPLAIN QUERY PLAN của các truy vấn chính
+import counters  # Bộ đếm số list/số từ được cập nhật cùng transaction khi ghi
+import api_rollups  # Số lời gọi API tổng hợp theo giờ/ngày (thẻ thống kê và biểu đồ của /admin/api-logs)
+import api_log_query  # Bộ lọc, phân trang keyset và xuất CSV/JSONL cho danh sách log của /admin/api-logs
+import latency_histogram  # Histogram thời gian gọi API (p50/p95/p99 cho /admin/api-logs)
+from keyset import keyset_page  # Phân trang keyset (seek) thay cho OFFSET
+from bulk_save import bulk_add_entries  # Lưu nhiều từ bằng một lần INSERT, bỏ qua từ đã có trong list
+from server_sessions import ServerSideSessions  # Session lưu phía server, cookie chỉ mang session id
+from local_dictionary import LocalDictionary, parse_dictionaryapi_entry, \
+    import_dictionary  # Từ điển offline, tra trước khi gọi dictionaryapi.dev
+from local_examples import LocalExamples, import_tatoeba_pairs  # Câu ví dụ Tatoeba offline (chỉ mục đảo theo từ)
 
 # === APPLICATION SETUP ===
 
@@ -44,12 +69,53 @@ app.secret_key = os.environ.get("FLASK_SECRET_KEY",
                                 "a_default_fallback_secret_key_if_not_set_for_dev")  # Nên có fallback cho dev
 
 # --- Cấu hình SQLAlchemy ---
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///vocabulary_app.db'  # Đường dẫn tới file database SQLite
+# Đường dẫn tới file database SQLite (đổi bằng biến môi trường DATABASE_URI, ví dụ cho benchmark)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URI', 'sqlite:///vocabulary_app.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False  # Tắt thông báo không cần thiết
+# Database riêng cho các bảng telemetry (api_log, user_activity và các bảng tổng hợp của api_log), với connection
+# riêng: ghi log không tranh khóa ghi của SQLite với dữ liệu người dùng. Migration nằm trong migrations_telemetry/
+# (flask db -d migrations_telemetry upgrade); chuyển dữ liệu cũ sang bằng `flask move-telemetry-data`.
+app.config['SQLALCHEMY_BINDS'] = {
+    TELEMETRY_BIND_KEY: os.environ.get('TELEMETRY_DATABASE_URI', 'sqlite:///telemetry.db'),
+}
+# PRAGMA cho mọi connection SQLite (WAL, synchronous=NORMAL, busy_timeout, cache...), xem sqlite_tuning.PROFILES;
+# SQLITE_PRAGMA_PROFILE=default giữ cấu hình mặc định của SQLite
+app.config['SQLITE_PRAGMA_PROFILE'] = os.environ.get('SQLITE_PRAGMA_PROFILE', 'production')
+app.config['SQLITE_BIND_PRAGMAS'] = {
+    # Thời gian chờ khóa ghi (ms): log được ghi ở thread nền nên có thể chờ lâu hơn request của người dùng
+    TELEMETRY_BIND_KEY: {'busy_timeout': int(float(os.environ.get('TELEMETRY_DATABASE_TIMEOUT', 30)) * 1000)},
+}
 
 db.init_app(app)
 migrate = Migrate(app, db)
 
+# Áp dụng profile PRAGMA trên mỗi connection mới và chạy PRAGMA optimize định kỳ (cần gọi sau db.init_app)
+sqlite_tuning = SQLiteTuning(app)
+
+# Cache kết quả tra cứu từ (dictionaryapi.dev, Tatoeba, Google Translate) dùng chung cho mọi người dùng
+word_cache = WordCache(app)
+
+# Từ điển offline (bảng dictionary_entry, nạp bằng `flask import-dictionary`), tra trước dictionaryapi.dev
+local_dictionary = LocalDictionary(app)
+
+# Câu ví dụ Anh - Việt offline (nạp bằng `flask import-tatoeba`), tra trước tatoeba.org
+local_examples = LocalExamples(app)
+
+# HTTP client dùng chung (keep-alive, timeout theo từng API) cho mọi lời gọi tới API bên ngoài
+upstream = UpstreamClient(app)
+
+# APILog được đưa vào hàng đợi và ghi theo lô bởi thread nền, không commit trong request
+api_log_writer = APILogWriter(app)
+
+# APILog cũ hơn API_LOG_RETENTION_DAYS ngày được chuyển sang file JSON Lines nén trong instance/api_log_archive
+api_log_archive = APILogArchiver(app)
+
+# UserActivity cũng được ghi theo lô; các trang chỉ đọc không còn commit trong request
+activity_recorder = ActivityRecorder(app)
+
+# Nội dung session (user_info, google_auth_pending_setup, last_processed_input...) lưu phía server
+server_sessions = ServerSideSessions(app)
+
 csrf = CSRFProtect(app)  # Khởi tạo CSRFProtect
 
 # --- Tạo Google Blueprint với Flask-Dance ---
@@ -77,21 +143,57 @@ from models import User  # Đảm bảo User model đã được import
 
 
 
-def get_tatoeba_examples(word, source_lang='eng', target_lang='vie'):
+def get_api_log_user_id(user_id=None):
+    """
+    Xác định user_id để ghi vào APILog.
+    Ưu tiên user_id được truyền vào (ví dụ từ thread worker của EnrichmentEngine,
+    nơi không có request context); nếu không có thì lấy từ session hiện tại.
+    """
+    if user_id is not None:
+        return user_id
+    if has_request_context():
+        return session.get("db_user_id")
+    return None
+
+
+def elapsed_ms(started_at):
+    """Số mili giây đã trôi qua kể từ started_at (giá trị của time.perf_counter())."""
+    return round((time.perf_counter() - started_at) * 1000)
+
+
+def record_api_response(log_entry, response, started_at):
+    """Ghi mã trạng thái, kích thước body và thời gian nhận được response vào log_entry."""
+    log_entry.status_code = response.status_code
+    log_entry.response_bytes = len(response.content or b'')
+    log_entry.duration_ms = elapsed_ms(started_at)
+
+
+def write_api_log(log_entry, started_at):
+    """
+    Đưa log_entry vào hàng đợi của APILogWriter (ghi ở background, không commit trong request).
+    Nếu chưa có duration_ms (lời gọi lỗi trước khi có response), thời gian tính tới lúc này.
+    """
+    if log_entry.duration_ms is None:
+        log_entry.duration_ms = elapsed_ms(started_at)
+    api_log_writer.write(log_entry)
+
+
+def get_tatoeba_examples(word, source_lang='eng', target_lang='vie', user_id=None):
     """
     Lấy câu ví dụ tiếng Anh và bản dịch tiếng Việt từ Tatoeba API.
     Trả về một dictionary {'example_en': '...', 'example_vi': '...'} nếu tìm thấy,
-    hoặc None nếu không tìm thấy.
+    hoặc None nếu không tìm thấy. Lỗi request (timeout, HTTP lỗi...) được ném ra dưới dạng UpstreamError.
     """
     TATOEBA_API_URL = f"https://tatoeba.org/en/api_v0/search?from={source_lang}&query={word}&orphans=no&unapproved=no&trans_filter=limit&to={target_lang}"
 
     api_name = "tatoeba_api"
-    user_id_to_log = session.get("db_user_id")
+    user_id_to_log = get_api_log_user_id(user_id)
     log_entry = APILog(api_name=api_name, request_details=f"Word: {word}", user_id=user_id_to_log, success=False)
+    started_at = time.perf_counter()
 
     try:
-        response = requests.get(TATOEBA_API_URL, timeout=10)
-        log_entry.status_code = response.status_code
+        response = upstream.get(api_name, TATOEBA_API_URL)
+        record_api_response(log_entry, response, started_at)
         response.raise_for_status()
         data = response.json()
 
@@ -115,17 +217,18 @@ def get_tatoeba_examples(word, source_lang='eng', target_lang='vie'):
 
         log_entry.error_message = "No matching example sentence or translation found."
 
+    except UpstreamUnavailable:
+        log_entry = None  # Circuit breaker mở / bulkhead đầy: không có lời gọi API nào để ghi log
+        raise  # Để lookup_tatoeba_example trả về giá trị dự phòng mà không cache "không tìm thấy"
     except requests.exceptions.RequestException as e:
+        # Timeout, lỗi kết nối, HTTP lỗi, JSON hỏng: lỗi tạm thời, không phải "không có câu ví dụ"
         log_entry.error_message = f"Request error to Tatoeba API: {str(e)}"
+        raise UpstreamError(api_name, str(e)) from e
     except Exception as e:
         log_entry.error_message = f"Unexpected error processing Tatoeba response: {str(e)}"
     finally:
-        try:
-            db.session.add(log_entry)
-            db.session.commit()
-        except Exception as db_e:
-            db.session.rollback()
-            print(f"CRITICAL ERROR: Không thể ghi API log vào database: {db_e}")
+        if log_entry is not None:
+            write_api_log(log_entry, started_at)  # Ghi log ở background, không commit trong request
 
     return None
 
@@ -163,8 +266,8 @@ def admin_required(f):
             # (JavaScript trên trang chủ có thể đọc param 'open_login_modal' để tự mở modal)
             return redirect(url_for('home', open_login_modal=True))
 
-            # 3. Nếu đã đăng nhập, lấy thông tin người dùng từ database
-        user = User.query.get(current_user_db_id)
+            # 3. Nếu đã đăng nhập, lấy thông tin người dùng (dùng chung cho cả request, xem get_current_user)
+        user = get_current_user()
 
         # 4. Kiểm tra xem người dùng có tồn tại và có phải là Admin không
         if not user or not user.is_admin:
@@ -178,6 +281,75 @@ def admin_required(f):
     return decorated_function
 
 
+# Khóa trong session lưu snapshot các trường hiển thị của người dùng (tên, email, ảnh, is_admin)
+USER_SNAPSHOT_SESSION_KEY = 'user_snapshot'
+app.config.setdefault('USER_SNAPSHOT_TTL_SECONDS', 60)  # 0 để tắt snapshot trong session
+
+
+def get_current_user():
+    """
+    Trả về đối tượng User của người dùng đang đăng nhập, hoặc None.
+    Chỉ truy vấn database tối đa MỘT lần cho mỗi request: kết quả được giữ trong flask.g và dùng chung
+    cho admin_required, get_current_user_info và các route. Không có 'db_user_id' thì không truy vấn.
+    """
+    db_user_id = session.get("db_user_id")
+    if not db_user_id:
+        return None
+    cached = g.get('_current_user')
+    if cached is None or cached[0] != db_user_id:  # Lần đầu trong request, hoặc vừa đăng nhập tài khoản khác
+        cached = (db_user_id, db.session.get(User, db_user_id))
+        g._current_user = cached
+    return cached[1]
+
+
+def _user_snapshot(user):
+    """Các trường hiển thị của User dùng cho base.html (header, sidebar)."""
+    return {
+        "name": user.name,  # Tên gốc (từ Google hoặc form đăng ký)
+        "email": user.email,  # Email của người dùng
+        "display_name": user.display_name,  # Tên hiển thị (nếu có)
+        "picture": user.picture_url,  # URL ảnh đại diện
+        "is_admin": user.is_admin,  # Trạng thái admin (True/False), chỉ để hiển thị menu
+    }
+
+
+def get_current_user_snapshot():
+    """
+    Trả về snapshot (dict) các trường hiển thị của người dùng đang đăng nhập, hoặc None.
+
+    Snapshot được lưu trong session (cookie đã được ký bằng secret_key nên client không sửa được)
+    trong USER_SNAPSHOT_TTL_SECONDS giây, nên các trang chỉ cần hiển thị tên/ảnh không phải truy vấn User.
+    Nếu User đã được tải trong request này (ví dụ bởi admin_required) thì dùng luôn bản mới nhất đó.
+    Việc kiểm tra quyền (admin_required) luôn đọc từ database, không dựa vào snapshot.
+    """
+    db_user_id = session.get("db_user_id")
+    if not db_user_id:
+        return None
+
+    ttl = app.config['USER_SNAPSHOT_TTL_SECONDS']
+    cached = g.get('_current_user')
+    stored = session.get(USER_SNAPSHOT_SESSION_KEY)
+    if ((cached is None or cached[0] != db_user_id) and ttl and stored
+            and stored.get('user_id') == db_user_id and time.time() - stored.get('loaded_at', 0) < ttl):
+        return dict(stored['info'])
+
+    user = get_current_user()
+    if not user:
+        session.pop(USER_SNAPSHOT_SESSION_KEY, None)
+        return None
+    info = _user_snapshot(user)
+    if ttl and (not stored or stored.get('user_id') != db_user_id or stored.get('info') != info
+                or time.time() - stored.get('loaded_at', 0) >= ttl):
+        session[USER_SNAPSHOT_SESSION_KEY] = {'user_id': db_user_id, 'loaded_at': time.time(), 'info': info}
+    return dict(info)
+
+
+def forget_user_snapshot():
+    """Bỏ snapshot trong session và trong request hiện tại (gọi sau khi sửa tên hiển thị, ảnh...)."""
+    session.pop(USER_SNAPSHOT_SESSION_KEY, None)
+    g.pop('_current_user', None)
+
+
 def get_current_user_info():
     """
     Lấy thông tin của người dùng hiện tại đang đăng nhập.
@@ -190,20 +362,14 @@ def get_current_user_info():
     db_user_id = session.get("db_user_id")
 
     if db_user_id:
-        # Nếu có 'db_user_id' trong session, truy vấn database để lấy thông tin người dùng
-        user_from_db = User.query.get(db_user_id)  # User model đã được import từ models.py
+        # Nếu có 'db_user_id' trong session, lấy snapshot của người dùng
+        # (từ session nếu còn hạn, nếu không thì từ User đã/được tải một lần cho request này)
+        user_snapshot = get_current_user_snapshot()
 
-        if user_from_db:
-            # Nếu tìm thấy người dùng trong database, trả về thông tin của họ
+        if user_snapshot:
+            # Nếu tìm thấy người dùng, trả về thông tin của họ
             # Bao gồm cả các trường tùy chỉnh như 'display_name' và 'is_admin'
-            return {
-                "name": user_from_db.name,  # Tên gốc (từ Google hoặc form đăng ký)
-                "email": user_from_db.email,  # Email của người dùng
-                "display_name": user_from_db.display_name,  # Tên hiển thị (nếu có)
-                "picture": user_from_db.picture_url,  # URL ảnh đại diện
-                "is_admin": user_from_db.is_admin,  # Trạng thái admin (True/False)
-                # Bạn có thể thêm 'google_id': user_from_db.google_id nếu cần ở client
-            }
+            return user_snapshot
 
     # 2. Nếu không có 'db_user_id' hoặc không tìm thấy user trong DB,
     #    kiểm tra xem người dùng có vừa xác thực qua Google không (Flask-Dance)
@@ -233,6 +399,16 @@ def get_current_user_info():
     return None
 
 
+@app.context_processor
+def inject_user_info():
+    """
+    Đưa 'user_info' vào mọi template (base.html dùng cho header, sidebar), kể cả các trang không tự truyền.
+    Route nào truyền user_info=... vào render_template thì giá trị đó được ưu tiên.
+    Khách chưa đăng nhập không phát sinh truy vấn nào.
+    """
+    return {'user_info': get_current_user_info()}
+
+
 @app.route('/')
 def home():
     # Lấy thông tin người dùng hiện tại (nếu đã đăng nhập từ trước đó bằng form hoặc Google đã hoàn tất)
@@ -361,7 +537,8 @@ def home():
 def admin_dashboard():
     """
     Hiển thị trang Admin Dashboard.
-    Bao gồm danh sách tất cả người dùng và một số thông tin thống kê cơ bản của họ.
+    Bao gồm danh sách người dùng (phân trang keyset, sắp xếp theo số từ đã lưu, lọc theo trạng thái bị chặn/quyền admin)
+    và một số thông tin thống kê cơ bản của họ.
     """
 
     # 1. Lấy thông tin của Admin đang đăng nhập để truyền cho base template (ví dụ: hiển thị avatar ở header)
@@ -369,23 +546,46 @@ def admin_dashboard():
     # Hàm get_current_user_info() cần trả về một dictionary chứa thông tin người dùng hiện tại,
     # bao gồm 'name', 'email', 'picture', 'is_admin', 'display_name'.
 
-    # 2. Chuẩn bị danh sách dữ liệu người dùng để hiển thị trên "Learning Monitor"
-    users_data = []  # Khởi tạo một danh sách rỗng để chứa thông tin của mỗi người dùng
-
-    # Truy vấn tất cả người dùng từ database, sắp xếp theo ID tăng dần (hoặc tiêu chí khác nếu muốn)
-    all_users_from_db = User.query.order_by(User.id.asc()).all()
-
-    # Lặp qua từng đối tượng User lấy được từ database
-    for user_item in all_users_from_db:
-        # Với mỗi người dùng, tính toán số lượng danh sách từ vựng họ đã tạo
-        num_lists = VocabularyList.query.filter_by(user_id=user_item.id).count()
-
-        # Tính toán tổng số từ vựng (entries) mà người dùng này đã lưu trong tất cả các danh sách của họ
-        num_entries = VocabularyEntry.query.filter_by(user_id=user_item.id).count()
-        # Lưu ý: Điều này giả định model VocabularyEntry của bạn có trường user_id.
-        # Nếu VocabularyEntry chỉ có list_id, bạn cần tính tổng số entry từ các list của user_item.
+    # 2. Đọc các tham số phân trang / sắp xếp / lọc từ query string
+    per_page = max(1, min(request.args.get('per_page', 25, type=int), 100))
+    sort = request.args.get('sort', 'id')  # 'id', 'saved_words_desc', 'saved_words_asc'
+    status_filter = request.args.get('status', 'all')  # 'all', 'active', 'blocked'
+    role_filter = request.args.get('role', 'all')  # 'all', 'admin', 'user'
+
+    # 3. MỘT truy vấn duy nhất trên bảng user: số từ đã lưu đọc từ bộ đếm User.entry_count
+    #    (trước đây là 2 truy vấn COUNT cho MỖI user => 2N+1 truy vấn).
+    monitor_query = User.query
+
+    if status_filter == 'blocked':
+        monitor_query = monitor_query.filter(User.is_blocked == True)
+    elif status_filter == 'active':
+        monitor_query = monitor_query.filter(User.is_blocked == False)
+    if role_filter == 'admin':
+        monitor_query = monitor_query.filter(User.is_admin == True)
+    elif role_filter == 'user':
+        monitor_query = monitor_query.filter(User.is_admin == False)
+
+    # Phân trang keyset: ?after=<cursor> là vị trí (entry_count, id) hoặc id của user cuối trang trước,
+    # không dùng OFFSET/COUNT(*) (xem các index của User và query_plans.hot_queries)
+    if sort == 'saved_words_desc':
+        keyset_columns, descending = [User.entry_count, User.id], True
+    elif sort == 'saved_words_asc':
+        keyset_columns, descending = [User.entry_count, User.id], False
+    else:
+        sort = 'id'
+        keyset_columns, descending = [User.id], False
 
-        # Thêm thông tin của người dùng hiện tại (user_item) và các thống kê vào danh sách users_data
+    try:
+        users_page, next_cursor = keyset_page(monitor_query, keyset_columns, after=request.args.get('after'),
+                                              limit=per_page, descending=descending)
+    except ValueError:
+        flash("Invalid page link. Showing the first page instead.", "warning")
+        users_page, next_cursor = keyset_page(monitor_query, keyset_columns, limit=per_page, descending=descending)
+
+    # 4. Chuẩn bị dữ liệu hiển thị cho các user của trang hiện tại
+    users_data = []
+    for user_item in users_page:
+        num_entries = user_item.entry_count
         users_data.append({
             "id": user_item.id,  # ID của người dùng
             "name": user_item.name,  # Tên gốc (từ Google hoặc form đăng ký)
@@ -400,13 +600,19 @@ def admin_dashboard():
             "is_blocked": user_item.is_blocked  # Để biết người dùng này có bị chặn không
         })
 
-    # 3. Render template cho Admin Dashboard và truyền dữ liệu vào
+    monitor_filters = {"sort": sort, "status": status_filter, "role": role_filter, "per_page": per_page}
+
+    # 5. Render template cho Admin Dashboard và truyền dữ liệu vào
     # 'admin/admin_dashboard_main.html' là file template bạn đã tạo cho giao diện "Learning Monitor"
     # user_info: thông tin của Admin đang đăng nhập (cho base.html)
     # learning_monitor_users: danh sách dữ liệu người dùng đã được chuẩn bị ở trên
+    # is_first_page, next_cursor, monitor_filters: dùng cho thanh lọc và phân trang
     return render_template('admin/admin_dashboard_main.html',
                            user_info=admin_user_info,
-                           learning_monitor_users=users_data)
+                           learning_monitor_users=users_data,
+                           is_first_page=not request.args.get('after'),
+                           next_cursor=next_cursor,
+                           monitor_filters=monitor_filters)
 
 
 @app.route('/login-with-google')  # Định nghĩa route URL là /login-with-google
@@ -469,6 +675,7 @@ def logout():
     #    xác định rằng người dùng đã đăng nhập vào hệ thống của bạn.
     if "db_user_id" in session:
         del session["db_user_id"]
+    session.pop(USER_SNAPSHOT_SESSION_KEY, None)
 
     # Bạn cũng có thể dùng session.clear() để xóa toàn bộ session,
     # nhưng cách xóa từng key cụ thể như trên sẽ an toàn hơn nếu bạn có
@@ -666,25 +873,29 @@ def terms_of_service_page():
     return "<h1>Điều khoản Dịch vụ (Terms of Service)</h1><p>Nội dung sẽ được cập nhật sớm.</p>"
 
 
-def translate_with_deep_translator(text_to_translate, dest_lang='vi', src_lang='auto', is_example=False):
+def translate_with_deep_translator(text_to_translate, dest_lang='vi', src_lang='auto', is_example=False, user_id=None):
     if not text_to_translate or not isinstance(text_to_translate, str) or not text_to_translate.strip():
         return text_to_translate
 
     api_name = "deep_translator_google"
-    user_id_to_log = session.get("db_user_id")
+    user_id_to_log = get_api_log_user_id(user_id)
     log_entry = APILog(
         api_name=api_name,
         request_details=f"Text: {text_to_translate[:100]}...",
         user_id=user_id_to_log,
         success=False
     )
+    started_at = time.perf_counter()
 
     translated_text = None
 
     try:
         # Chỉ dịch nếu là ví dụ hoặc từ đơn ngắn
         if is_example or len(text_to_translate.split()) <= 3:
-            translated_text = GoogleTranslator(source=src_lang, target=dest_lang).translate(text_to_translate)
+            # Circuit breaker + bulkhead, session dùng chung và timeout theo deadline cho Google Translate
+            translated_text = upstream.translate(text_to_translate, source=src_lang, target=dest_lang,
+                                                 api_name=api_name)
+            log_entry.duration_ms = elapsed_ms(started_at)
 
         if translated_text and translated_text.strip().lower() != text_to_translate.strip().lower():
             log_entry.success = True
@@ -693,21 +904,25 @@ def translate_with_deep_translator(text_to_translate, dest_lang='vi', src_lang='
             log_entry.success = True
             log_entry.error_message = "Translation is same as input or skipped."
 
+    except UpstreamUnavailable:
+        log_entry = None  # Không gọi Google Translate: không ghi log
+        raise  # Để lookup_translation trả về văn bản gốc mà không cache
+    except TranslationNotFound as e:
+        log_entry.error_message = str(e)[:500]  # Google trả lời nhưng không có bản dịch: văn bản gốc được cache
     except Exception as e:
+        # Lỗi kết nối, 429, lỗi server...: lỗi tạm thời, để lookup_translation trả về văn bản gốc mà không cache
         log_entry.error_message = str(e)[:500]
+        raise UpstreamError(api_name, str(e)) from e
 
     finally:
-        try:
-            db.session.add(log_entry)
-            db.session.commit()
-        except Exception as db_e:
-            db.session.rollback()
+        if log_entry is not None:
+            write_api_log(log_entry, started_at)  # Ghi log ở background, không commit trong request
 
     return translated_text or text_to_translate
 
 
 
-def translate_text_libre_batch(texts_to_translate, target_lang="vi", source_lang="en"):
+def translate_text_libre_batch(texts_to_translate, target_lang="vi", source_lang="en", user_id=None):
     """
     Dịch một danh sách các đoạn văn bản sử dụng API LibreTranslate (batch request).
 
@@ -716,6 +931,7 @@ def translate_text_libre_batch(texts_to_translate, target_lang="vi", source_lang
         target_lang (str, optional): Mã ngôn ngữ đích (ví dụ: 'vi' cho tiếng Việt). Mặc định là 'vi'.
         source_lang (str, optional): Mã ngôn ngữ nguồn (ví dụ: 'en' cho tiếng Anh). Mặc định là 'en'.
                                      LibreTranslate cũng hỗ trợ 'auto' cho một số trường hợp.
+        user_id (int, optional): ID người dùng ghi vào APILog. Mặc định lấy từ session.
 
     Returns:
         list: Danh sách các chuỗi đã được dịch, theo đúng thứ tự của danh sách đầu vào.
@@ -742,19 +958,25 @@ def translate_text_libre_batch(texts_to_translate, target_lang="vi", source_lang
         "Content-Type": "application/json"  # Bắt buộc để API hiểu payload có 'q' là một mảng
     }
 
-    # 3. Đặt thời gian chờ (timeout) cho request API
-    #    Thời gian chờ cố định là 45 giây. Nếu danh sách texts_to_translate quá lớn hoặc
+    # 3. Thời gian chờ (timeout) cho request API lấy từ cấu hình UPSTREAM_TIMEOUTS['libretranslate_batch']
+    #    (mặc định đọc tối đa 45 giây). Nếu danh sách texts_to_translate quá lớn hoặc
     #    các câu quá dài, bạn có thể cần tăng giá trị này hoặc xem xét việc chia nhỏ batch.
-    timeout_duration = 45  # Đơn vị: giây
+    timeout_duration = upstream.timeout_for('libretranslate_batch')  # (connect, read), đơn vị: giây
+
+    api_name = "libretranslate_batch"
+    log_entry = APILog(api_name=api_name, request_details=f"Texts: {len(texts_to_translate)}",
+                       user_id=get_api_log_user_id(user_id), success=False)
+    started_at = time.perf_counter()
 
     try:
         # In thông báo debug trước khi gửi request
         print(
-            f"Đang gửi batch translation request tới LibreTranslate với timeout: {timeout_duration}s cho {len(texts_to_translate)} câu."
+            f"Đang gửi batch translation request tới LibreTranslate với timeout (connect, read): {timeout_duration}s cho {len(texts_to_translate)} câu."
         )
 
         # 4. Gửi POST request đến API LibreTranslate
-        response = requests.post(
+        response = upstream.post(
+            api_name,
             LIBRETRANSLATE_API_URL,
             json=payload,  # Gửi payload dưới dạng JSON (requests sẽ tự đặt Content-Type từ headers)
             headers=headers,
@@ -764,6 +986,7 @@ def translate_text_libre_batch(texts_to_translate, target_lang="vi", source_lang
         # 5. Kiểm tra lỗi HTTP từ response
         #    response.raise_for_status() sẽ ném ra một exception (HTTPError)
         #    nếu mã trạng thái HTTP là lỗi (4xx hoặc 5xx).
+        record_api_response(log_entry, response, started_at)
         response.raise_for_status()
 
         # 6. Phân tích JSON response
@@ -779,28 +1002,41 @@ def translate_text_libre_batch(texts_to_translate, target_lang="vi", source_lang
                 len(translated_texts_list) == len(texts_to_translate):
             # Nếu có danh sách kết quả, nó là list, và số lượng kết quả khớp với số lượng đầu vào
             print("Dịch batch thành công!")  # Debug
+            log_entry.success = True
             return translated_texts_list  # Trả về danh sách các bản dịch
         else:
             # Nếu kết quả không như mong đợi (ví dụ: thiếu key, sai định dạng, số lượng không khớp)
             print(f"Lỗi dịch batch: Không tìm thấy 'translatedTexts' hoặc số lượng không khớp. Response: {data}")
+            log_entry.error_message = "Missing 'translatedTexts' or result count mismatch."
             # Trả về danh sách các chuỗi gốc nếu có vấn đề với cấu trúc response
             return [str(text) for text in texts_to_translate]  # Đảm bảo mọi thứ là string
 
+    except UpstreamUnavailable as e:
+        # Circuit breaker mở / bulkhead đầy: không gửi request, không ghi log; các từ sẽ được dịch từng từ
+        print(f"Bỏ qua dịch batch: {e}")
+        log_entry = None
+        return [str(text) for text in texts_to_translate]  # Trả về gốc
     except requests.exceptions.Timeout:
         # 8. Xử lý lỗi Timeout (nếu request vượt quá timeout_duration)
-        print(f"Timeout ({timeout_duration}s) khi dịch batch cho: {texts_to_translate}")
+        print(f"Timeout {timeout_duration}s khi dịch batch cho: {texts_to_translate}")
+        log_entry.error_message = f"Timeout {timeout_duration}s"
         return [str(text) for text in texts_to_translate]  # Trả về gốc
     except requests.exceptions.RequestException as e:
         # 9. Xử lý các lỗi request khác (ví dụ: lỗi kết nối, lỗi HTTP đã được raise_for_status() ném ra)
         print(f"Lỗi Request API trong khi dịch batch: {e}")
+        log_entry.error_message = f"Request error to LibreTranslate: {str(e)}"[:500]
         return [str(text) for text in texts_to_translate]  # Trả về gốc
     except Exception as e:
         # 10. Xử lý các lỗi không mong muốn khác (ví dụ: lỗi parse JSON nếu response không phải JSON, ...)
         print(f"Lỗi không mong muốn trong khi dịch batch: {e}")
+        log_entry.error_message = f"Unexpected error processing LibreTranslate response: {str(e)}"[:500]
         return [str(text) for text in texts_to_translate]  # Trả về gốc
+    finally:
+        if log_entry is not None:
+            write_api_log(log_entry, started_at)  # Ghi log ở background, không commit trong request
 
 
-def translate_single_text_libre(text_to_translate, target_lang="vi", source_lang="en", timeout=20):
+def translate_single_text_libre(text_to_translate, target_lang="vi", source_lang="en", timeout=None):
     """
     Dịch một đoạn văn bản đơn lẻ sử dụng API LibreTranslate.
 
@@ -809,7 +1045,8 @@ def translate_single_text_libre(text_to_translate, target_lang="vi", source_lang
         target_lang (str, optional): Mã ngôn ngữ đích. Mặc định là 'vi' (Tiếng Việt).
         source_lang (str, optional): Mã ngôn ngữ nguồn. Mặc định là 'en' (Tiếng Anh).
                                      LibreTranslate cũng có thể hỗ trợ 'auto' cho một số trường hợp.
-        timeout (int, optional): Thời gian chờ tối đa cho request API (tính bằng giây). Mặc định là 20 giây.
+        timeout (int, optional): Thời gian chờ tối đa cho request API (tính bằng giây).
+                                 Mặc định lấy từ UPSTREAM_TIMEOUTS['libretranslate_single'] (đọc tối đa 20 giây).
 
     Returns:
         str: Đoạn văn bản đã dịch, hoặc văn bản gốc nếu có lỗi xảy ra hoặc không dịch được.
@@ -820,6 +1057,9 @@ def translate_single_text_libre(text_to_translate, target_lang="vi", source_lang
         # print(f"translate_single_text_libre: Input rỗng hoặc chỉ chứa khoảng trắng, trả về gốc: '{text_to_translate}'") # Debug
         return text_to_translate
 
+    if timeout is None:
+        timeout = upstream.timeout_for('libretranslate_single')
+
     # 2. Định nghĩa URL của API LibreTranslate và chuẩn bị payload
     LIBRETRANSLATE_API_URL = "https://libretranslate.de/translate"
     # Bạn có thể thử các instance LibreTranslate công khai khác nếu 'libretranslate.de' không ổn định:
@@ -843,7 +1083,8 @@ def translate_single_text_libre(text_to_translate, target_lang="vi", source_lang
         # 3. Gửi POST request đến API LibreTranslate
         #    Sử dụng `data=payload` vì nhiều instance LibreTranslate (bao gồm libretranslate.de)
         #    mong đợi dữ liệu form (application/x-www-form-urlencoded).
-        response = requests.post(
+        response = upstream.post(
+            'libretranslate_single',
             LIBRETRANSLATE_API_URL,
             data=payload,  # Gửi payload dưới dạng form data
             timeout=timeout  # Đặt thời gian chờ cho request
@@ -885,7 +1126,7 @@ def translate_single_text_libre(text_to_translate, target_lang="vi", source_lang
         return text_to_translate  # Trả về văn bản gốc
 
 
-def get_word_details_dictionaryapi(word):
+def get_word_details_dictionaryapi(word, user_id=None):
     """
     Lấy thông tin chi tiết của một từ từ API dictionaryapi.dev.
     Bao gồm loại từ, định nghĩa tiếng Anh, câu ví dụ tiếng Anh, và phiên âm IPA.
@@ -895,25 +1136,31 @@ def get_word_details_dictionaryapi(word):
 
     Args:
         word (str): Từ tiếng Anh cần tra cứu.
+        user_id (int, optional): ID người dùng ghi vào APILog. Mặc định lấy từ session.
 
     Returns:
         list: Một danh sách CHỨA MỘT dictionary nếu tìm thấy thông tin phù hợp
               (ví dụ: [{"type": "noun", "definition_en": "...", "example_en": "...", "ipa": "/.../"}]).
-              Trả về danh sách rỗng ([]) nếu không tìm thấy thông tin, có lỗi API, hoặc từ không tồn tại.
+              Trả về danh sách rỗng ([]) nếu không tìm thấy thông tin hoặc từ không tồn tại (HTTP 404).
+
+    Raises:
+        UpstreamUnavailable: API đang bị circuit breaker/bulkhead chặn.
+        UpstreamError: Timeout, lỗi kết nối, HTTP lỗi khác 404 hoặc phản hồi không đọc được (không được cache).
     """
 
     DICTIONARY_API_URL = f"https://api.dictionaryapi.dev/api/v2/entries/en/{word}"
 
     # Chuẩn bị cho việc ghi log API call
     api_name = "dictionary_api"
-    user_id_to_log = session.get("db_user_id")  # Lấy user_id từ session (nếu có)
+    user_id_to_log = get_api_log_user_id(user_id)  # Lấy user_id được truyền vào hoặc từ session (nếu có)
     # Khởi tạo log entry, mặc định success là False, sẽ được cập nhật nếu thành công
     log_entry = APILog(api_name=api_name, request_details=f"Word: {word}", user_id=user_id_to_log, success=False)
+    started_at = time.perf_counter()
 
     try:
-        # 1. Gửi GET request đến API từ điển, đặt timeout để tránh chờ đợi vô hạn
-        response = requests.get(DICTIONARY_API_URL, timeout=15)  # Tăng nhẹ timeout
-        log_entry.status_code = response.status_code  # Ghi lại mã trạng thái HTTP
+        # 1. Gửi GET request đến API từ điển qua connection pool dùng chung (timeout theo UPSTREAM_TIMEOUTS)
+        response = upstream.get(api_name, DICTIONARY_API_URL)
+        record_api_response(log_entry, response, started_at)  # Mã trạng thái HTTP, kích thước, thời gian
 
         # 2. Kiểm tra lỗi HTTP từ response (ví dụ: 404 Not Found, 500 Internal Server Error)
         response.raise_for_status()  # Nếu có lỗi, sẽ ném ra HTTPError và được bắt ở khối except
@@ -926,104 +1173,264 @@ def get_word_details_dictionaryapi(word):
 
         # 4. Xử lý dữ liệu JSON nhận được
         if isinstance(data, list) and len(data) > 0:
-            # API này thường trả về một mảng, chúng ta lấy phần tử đầu tiên (thường chứa thông tin chính của từ)
-            first_entry_data = data[0]
-
-            # 4a. Trích xuất thông tin phiên âm IPA
-            ipa_text = "N/A"  # Giá trị mặc định nếu không tìm thấy IPA
-            if first_entry_data.get("phonetics"):  # Kiểm tra xem có mục 'phonetics' không
-                for phonetic_item in first_entry_data["phonetics"]:
-                    if phonetic_item.get("text"):  # Ưu tiên lấy trường 'text' chứa IPA
-                        ipa_text = phonetic_item.get("text")
-                        break  # Lấy IPA đầu tiên tìm thấy và thoát vòng lặp
-
-            # 4b. Tìm định nghĩa và ví dụ từ mục 'meanings'
-            if first_entry_data.get("meanings"):
-                for meaning_obj in first_entry_data[
-                    "meanings"]:  # Một từ có thể có nhiều nhóm nghĩa (ví dụ: noun, verb)
-                    part_of_speech = meaning_obj.get("partOfSpeech", "N/A")  # Lấy loại từ
-
-                    if meaning_obj.get("definitions"):  # Mỗi nhóm nghĩa có thể có nhiều định nghĩa
-                        first_definition_without_example = None  # Để lưu định nghĩa đầu tiên tìm được (kể cả không có ví dụ)
-
-                        # Ưu tiên tìm định nghĩa có kèm câu ví dụ
-                        for definition_obj_item in meaning_obj["definitions"]:
-                            definition_en = definition_obj_item.get("definition")  # Câu giải thích nghĩa tiếng Anh
-                            example_en = definition_obj_item.get("example")  # Câu ví dụ tiếng Anh
-
-                            if definition_en:  # Chỉ xử lý nếu có câu định nghĩa
-                                current_details = {
-                                    "type": part_of_speech,
-                                    "definition_en": definition_en,
-                                    "example_en": example_en if example_en else "N/A",  # "N/A" nếu không có ví dụ
-                                    "ipa": ipa_text  # Thêm thông tin IPA đã lấy được ở trên
-                                }
-
-                                if example_en:  # Nếu định nghĩa này có câu ví dụ
-                                    log_entry.success = True  # Đánh dấu API call thành công
-                                    # Trả về ngay định nghĩa này (được ưu tiên vì có ví dụ)
-                                    # Hàm sẽ kết thúc ở đây nếu tìm thấy.
-                                    return [current_details]
-
-                                if not first_definition_without_example:
-                                    # Nếu chưa lưu định nghĩa nào, lưu lại định nghĩa đầu tiên này
-                                    # (phòng trường hợp không có định nghĩa nào có ví dụ)
-                                    first_definition_without_example = current_details
-
-                        # Nếu đã duyệt hết các định nghĩa trong một 'meaning_obj' mà không có cái nào có ví dụ,
-                        # thì sử dụng 'first_definition_without_example' đã lưu (nếu có)
-                        if first_definition_without_example:
-                            log_entry.success = True  # Đánh dấu API call thành công
-                            # Trả về định nghĩa đầu tiên tìm được (không có ví dụ)
-                            # Hàm sẽ kết thúc ở đây nếu tìm thấy.
-                            return [first_definition_without_example]
-
-            # 4c. Trường hợp không tìm thấy định nghĩa nào trong 'meanings' nhưng vẫn lấy được IPA
-            if ipa_text != "N/A":  # Và chưa return ở trên (nghĩa là không có definition_en nào hợp lệ)
-                log_entry.success = True  # Coi như thành công nếu lấy được ít nhất IPA
-                return [{
-                    "type": "N/A",
-                    "definition_en": "No definition found.",
-                    "example_en": "N/A",
-                    "ipa": ipa_text
-                }]
-
-            # Nếu không có định nghĩa hợp lệ nào và cũng không có IPA (hoặc IPA là "N/A" và không có definition)
+            # API này thường trả về một mảng, chúng ta lấy phần tử đầu tiên (thường chứa thông tin chính của từ).
+            # Cách trích định nghĩa/ví dụ/IPA dùng chung với importer của từ điển offline (local_dictionary.py).
+            details = parse_dictionaryapi_entry(data[0])
+            if details:
+                log_entry.success = True  # Tìm được định nghĩa (ưu tiên định nghĩa có ví dụ) hoặc ít nhất IPA
+                return [details]
+
+            # Nếu không có định nghĩa hợp lệ nào và cũng không có IPA
             log_entry.error_message = "No valid definitions or usable IPA found in API response."
             print(f"No valid definitions or IPA found for '{word}'.")
         else:  # data không phải list hoặc list rỗng
             log_entry.error_message = "No detailed entry found or unexpected format from API."
             print(f"No detailed entry found or unexpected format for '{word}'.")
 
+    except UpstreamUnavailable:
+        log_entry = None  # Circuit breaker mở / bulkhead đầy: không có lời gọi API nào để ghi log
+        raise  # Để lookup_word_details trả về giá trị dự phòng mà không cache "không tìm thấy"
     except requests.exceptions.Timeout as e:
         log_entry.error_message = f"Timeout: {str(e)}"
         print(f"Timeout when calling Dictionary API for '{word}': {e}")
+        raise UpstreamError(api_name, 'timeout') from e  # Lỗi tạm thời: không cache "không tìm thấy"
     except requests.exceptions.HTTPError as http_err:
         # log_entry.status_code đã được set ở đầu khối try
         log_entry.error_message = f"HTTP Error: {str(http_err)}"
         print(f"Lỗi HTTP khi gọi Dictionary API cho từ '{word}': {http_err}")
+        if log_entry.status_code != 404:  # 404 là "từ không tồn tại"; 5xx/429... là lỗi tạm thời
+            raise UpstreamError(api_name, f"HTTP {log_entry.status_code}") from http_err
     except requests.exceptions.RequestException as e:
         log_entry.error_message = f"Request Error: {str(e)}"
         print(f"Lỗi Request API cho từ '{word}' với Dictionary API: {e}")
+        raise UpstreamError(api_name, str(e)) from e
     except Exception as e:  # Các lỗi khác, ví dụ lỗi parse JSON nếu response không phải JSON
         log_entry.error_message = f"Unexpected Error: {str(e)}"
         print(f"Lỗi không mong muốn khi lấy chi tiết cho từ '{word}': {e}")
 
     finally:
-        # 5. Luôn ghi log vào database, bất kể thành công hay thất bại
-        #    Điều này đảm bảo mọi nỗ lực gọi API đều được ghi lại.
-        try:
-            db.session.add(log_entry)
-            db.session.commit()
-        except Exception as db_e:
-            db.session.rollback()  # Hoàn tác nếu việc ghi log vào DB bị lỗi
-            print(f"CRITICAL ERROR: Could not write API log to database: {db_e}")
-            # Trong trường hợp này, log_entry có thể không được lưu, nhưng hàm vẫn nên tiếp tục.
+        # 5. Luôn ghi log, bất kể thành công hay thất bại
+        #    Điều này đảm bảo mọi nỗ lực gọi API đều được ghi lại. Log được đưa vào hàng đợi của
+        #    APILogWriter và ghi theo lô ở background, nên lỗi ghi log không ảnh hưởng tới request.
+        #    (Trừ khi lời gọi bị circuit breaker/bulkhead chặn: khi đó không có lời gọi nào để ghi.)
+        if log_entry is not None:
+            write_api_log(log_entry, started_at)
 
     # 6. Nếu không tìm thấy thông tin phù hợp nào hoặc có lỗi, trả về danh sách rỗng
     return []
 
 
+def build_word_result(original_word, detailed_entries_from_dict_api, tatoeba_example_data, translated_word):
+    """
+    Ghép kết quả của 3 nguồn dữ liệu (dictionaryapi.dev, Tatoeba, Google Translate)
+    thành danh sách kết quả hiển thị cho một từ trên trang /enter-words.
+
+    Args:
+        original_word (str): Từ gốc người dùng nhập.
+        detailed_entries_from_dict_api (list): Kết quả của get_word_details_dictionaryapi.
+        tatoeba_example_data (dict | None): Kết quả của get_tatoeba_examples.
+        translated_word (str): Kết quả của translate_with_deep_translator cho original_word.
+
+    Returns:
+        list: Danh sách chứa một dictionary (cấu trúc giống processed_results_dict[word]).
+    """
+    print(f"Đang xử lý từ: {original_word}")
+
+    # Khởi tạo các biến với giá trị mặc định
+    english_definition = "No English definition found."
+    word_type = "N/A"
+    ipa_text = "N/A"
+    example_en = "N/A"
+    vietnamese_example_sentence = "Không có câu ví dụ."
+
+    # --- BƯỚC 1: ĐỊNH NGHĨA & IPA TỪ DICTIONARYAPI.DEV ---
+    if detailed_entries_from_dict_api:
+        entry_detail = detailed_entries_from_dict_api[0]
+        english_definition = entry_detail.get("definition_en", "No English definition found.")
+        word_type = entry_detail.get("type", "N/A")
+        ipa_text = entry_detail.get("ipa", "N/A")
+
+    # --- BƯỚC 2: CÂU VÍ DỤ TỪ TATOEBA API ---
+    # Nếu Tatoeba không có, example_en và vietnamese_example_sentence giữ giá trị mặc định.
+    if tatoeba_example_data:
+        example_en = tatoeba_example_data['example_en']
+        vietnamese_example_sentence = tatoeba_example_data['example_vi']
+    else:
+        print(f"DEBUG: Tatoeba failed to find example for '{original_word}'. No example will be provided.")
+
+    # --- BƯỚC 3: NGHĨA TIẾNG VIỆT ---
+    # Bản dịch đã được gọi song song; chỉ dùng khi có định nghĩa tiếng Anh hợp lệ (giống logic cũ).
+    vietnamese_explanation = "Không thể dịch giải thích này."
+    if english_definition and english_definition.strip() and english_definition.lower() != "n/a" and english_definition.lower() != "no english definition found.":
+        if english_definition.lower() != original_word.lower():
+            if translated_word and translated_word.strip().lower() != english_definition.strip().lower():
+                vietnamese_explanation = translated_word
+        else:
+            if translated_word and translated_word.strip().lower() != original_word.strip().lower():
+                vietnamese_explanation = translated_word
+
+    # --- TỔNG HỢP KẾT QUẢ CUỐI CÙNG ---
+    return [{
+        "type": word_type,
+        "definition_en": english_definition,
+        "definition_vi": vietnamese_explanation,
+        "example_sentence": example_en,  # example_en đã được lấy từ Tatoeba
+        "example_sentence_vi": vietnamese_example_sentence,  # example_sentence_vi đã được lấy từ Tatoeba
+        "ipa": ipa_text
+    }]
+
+
+# --- CÁC HÀM TRA CỨU CÓ CACHE ---
+# Bọc các hàm gọi API bằng word_cache: người dùng sau nhập lại cùng một từ sẽ không gọi API nữa.
+# Khi API bị circuit breaker/bulkhead chặn (UpstreamUnavailable) hoặc lỗi tạm thời (UpstreamError: timeout, 5xx...),
+# word_cache trả về bản cache đã hết hạn nếu có; nếu không, các hàm dưới đây trả về ngay giá trị dự phòng
+# (như khi không tìm thấy) và không cache nó.
+# Riêng UpstreamDeadlineExceeded (request hết thời gian) được ném tiếp để EnrichmentEngine đánh dấu kết quả
+# của từ là chưa đầy đủ (incomplete) thay vì coi như "không tìm thấy"; DeadlineExceeded khi hết thời gian
+# trong lúc chờ request khác tra cùng từ (single-flight) cũng vậy.
+
+def lookup_word_details(word, user_id=None):
+    """
+    Tra từ điển offline trước; nếu từ không có trong đó thì dùng get_word_details_dictionaryapi có cache.
+    Danh sách rỗng được coi là "không tìm thấy".
+    """
+    local_details = local_dictionary.lookup(word)
+    if local_details is not None:
+        return local_details
+    try:
+        return word_cache.get_or_load(
+            'dictionary', word,
+            lambda: get_word_details_dictionaryapi(word, user_id=user_id),
+            source_lang='en', target_lang='en'
+        )
+    except UpstreamDeadlineExceeded:
+        raise
+    except (UpstreamUnavailable, UpstreamError):
+        return []
+
+
+def lookup_tatoeba_example(word, user_id=None):
+    """
+    Tìm câu ví dụ trong chỉ mục Tatoeba offline trước; nếu không có thì dùng get_tatoeba_examples có cache.
+    None được coi là "không tìm thấy".
+    """
+    local_example = local_examples.lookup(word)
+    if local_example is not None:
+        return local_example
+    try:
+        return word_cache.get_or_load(
+            'tatoeba', word,
+            lambda: get_tatoeba_examples(word, user_id=user_id),
+            source_lang='eng', target_lang='vie'
+        )
+    except UpstreamDeadlineExceeded:
+        raise
+    except (UpstreamUnavailable, UpstreamError):
+        return None
+
+
+def is_failed_translation(text, translated):
+    """Bản dịch rỗng hoặc giống hệt văn bản gốc được coi là dịch không thành công."""
+    return not translated or translated.strip().lower() == text.strip().lower()
+
+
+def lookup_translation(text, dest_lang='vi', src_lang='auto', is_example=False, user_id=None):
+    """
+    translate_with_deep_translator có cache.
+    Bản dịch giống hệt văn bản gốc (dịch lỗi hoặc bị bỏ qua) được coi là "không tìm thấy".
+    """
+    try:
+        return word_cache.get_or_load(
+            'translation_example' if is_example else 'translation', text,
+            lambda: translate_with_deep_translator(text, dest_lang=dest_lang, src_lang=src_lang,
+                                                   is_example=is_example, user_id=user_id),
+            source_lang=src_lang, target_lang=dest_lang,
+            is_negative=lambda translated: is_failed_translation(text, translated)
+        )
+    except UpstreamDeadlineExceeded:
+        raise
+    except (UpstreamUnavailable, UpstreamError):
+        return text
+
+
+def lookup_translations_batch(texts, dest_lang='vi', src_lang='auto', user_id=None):
+    """
+    Dịch cả danh sách từ/cụm từ bằng ít request nhất có thể (dùng cho EnrichmentEngine).
+
+    1. Lấy các bản dịch đã có trong word_cache (cùng khóa cache với lookup_translation).
+    2. Gửi các từ còn lại trong MỘT request translate_text_libre_batch. Từ nào đang được một request
+       khác dịch (cùng khóa single-flight với lookup_translation) thì chờ kết quả đó thay vì dịch lại.
+    3. Những từ batch dịch lỗi (hoặc cụm dài hơn 3 từ, vốn không được dịch) được trả về None: EnrichmentEngine
+       dịch lại chúng bằng lookup_translation như các lời gọi riêng, song song trong pool.
+
+    Returns:
+        list: Bản dịch theo đúng vị trí của texts, None cho từ cần dịch lại từng từ.
+    """
+    cached = word_cache.get_many('translation', texts, source_lang=src_lang, target_lang=dest_lang)
+    # Giống translate_with_deep_translator: chỉ dịch từ đơn/cụm từ ngắn
+    to_translate = [text for text in dict.fromkeys(texts) if text not in cached and len(text.split()) <= 3]
+
+    # Nhận dịch các từ chưa ai dịch (leader), chờ các từ đang được request khác dịch (follower)
+    single_flight = word_cache.single_flight
+    claimed, waiting = {}, {}  # text -> (khóa single-flight, lời gọi)
+    for text in to_translate:
+        key = word_cache.flight_key('translation', text, source_lang=src_lang, target_lang=dest_lang)
+        if key is None or not single_flight.enabled:
+            claimed[text] = (None, None)
+            continue
+        call, is_leader = single_flight.begin(key)
+        (claimed if is_leader else waiting)[text] = (key, call)
+
+    translated_by_text = dict(cached)
+    try:
+        if claimed:
+            batch_texts = list(claimed)
+            batch_results = translate_text_libre_batch(batch_texts, target_lang=dest_lang, source_lang=src_lang,
+                                                       user_id=user_id)
+            for text, translated in zip(batch_texts, batch_results):
+                key, call = claimed.pop(text)
+                translated_ok = not is_failed_translation(text, translated)
+                if translated_ok:
+                    word_cache.set('translation', text, translated, source_lang=src_lang, target_lang=dest_lang)
+                    translated_by_text[text] = translated
+                if call is not None:
+                    single_flight.finish(key, call, translated, ok=translated_ok)
+    finally:
+        # Không để request khác chờ mãi các từ mà batch không trả về (lỗi bất ngờ)
+        for key, call in claimed.values():
+            if call is not None:
+                single_flight.finish(key, call, ok=False)
+
+    for text, (key, call) in waiting.items():
+        try:
+            translated_ok, translated = single_flight.wait(key, call)
+        except DeadlineExceeded:
+            break  # Hết thời gian: các từ còn lại cũng không chờ nữa
+        except Exception:
+            continue  # Lời gọi của request kia lỗi: dịch lại từng từ ở bước fallback
+        if translated_ok and not is_failed_translation(text, translated):
+            translated_by_text[text] = translated
+
+    # Những mục batch không xử lý được: để EnrichmentEngine dịch lại từng từ (song song, không chạy ở đây)
+    return [translated_by_text.get(text) for text in texts]
+
+
+# Khởi tạo EnrichmentEngine sau khi các hàm gọi API đã được định nghĩa.
+enrichment_engine = EnrichmentEngine(
+    dictionary_lookup=lookup_word_details,
+    example_lookup=lookup_tatoeba_example,
+    translate=lookup_translation,
+    build_result=build_word_result,
+    translate_batch=lookup_translations_batch,
+    app=app
+)
+
+# Khi bật (mặc định), POST /enter-words trả về ngay và kết quả từng từ được hiển thị dần qua polling.
+# Đặt ENRICHMENT_ASYNC_JOBS=False để quay lại chế độ đồng bộ (chờ xử lý xong cả batch).
+app.config.setdefault('ENRICHMENT_ASYNC_JOBS', True)
+enrichment_job_runner = EnrichmentJobRunner(enrichment_engine, app=app)
+
+
 # --- CHỈNH SỬA HÀM enter_words_page ---
 @app.route('/enter-words', methods=['GET', 'POST'])
 @login_required
@@ -1055,73 +1462,28 @@ def enter_words_page():
 
     input_str = ""
     processed_results_dict = {}
+    enrichment_job_info = None
 
     if form.validate_on_submit():
         input_str = form.words_input.data
         session['last_processed_input'] = input_str
 
         words_list = [word.strip() for word in input_str.split(',') if word.strip()]
-
-        if words_list:
-            for original_word in words_list:
-                print(f"Đang xử lý từ: {original_word}")
-
-                # Khởi tạo các biến với giá trị mặc định
-                english_definition = "No English definition found."
-                word_type = "N/A"
-                ipa_text = "N/A"
-                example_en = "N/A"
-                vietnamese_example_sentence = "Không có câu ví dụ."
-
-                # --- BƯỚC 1: LẤY ĐỊNH NGHĨA & IPA TỪ DICTIONARYAPI.DEV (BỎ QUA OXFORD) ---
-                # Vẫn giữ logic này để lấy định nghĩa tiếng Anh và IPA.
-                print(f"DEBUG: Getting definition/IPA from dictionaryapi.dev for '{original_word}'.")
-                detailed_entries_from_dict_api = get_word_details_dictionaryapi(original_word)
-
-                if detailed_entries_from_dict_api:
-                    entry_detail = detailed_entries_from_dict_api[0]
-                    english_definition = entry_detail.get("definition_en", "No English definition found.")
-                    word_type = entry_detail.get("type", "N/A")
-                    ipa_text = entry_detail.get("ipa", "N/A")
-
-                # --- BƯỚC 2: CHỈ LẤY CÂU VÍ DỤ TỪ TATOEBA API ---
-                # Nếu Tatoeba không có, sẽ không có câu ví dụ.
-                print(f"DEBUG: Attempting Tatoeba API for example for '{original_word}'.")
-                tatoeba_example_data = get_tatoeba_examples(original_word)  # GỌI TATOEBA API
-
-                if tatoeba_example_data:
-                    example_en = tatoeba_example_data['example_en']
-                    vietnamese_example_sentence = tatoeba_example_data['example_vi']
-                    print(f"DEBUG: Successfully got example from Tatoeba for '{original_word}'.")
-                else:
-                    # Nếu Tatoeba không có, example_en và vietnamese_example_sentence sẽ giữ giá trị mặc định ("N/A", "Không có câu ví dụ.")
-                    print(f"DEBUG: Tatoeba failed to find example for '{original_word}'. No example will be provided.")
-
-                # --- BƯỚC 3: DỊCH ĐỊNH NGHĨA TIẾNG ANH SANG TIẾNG VIỆT ---
-                # Logic này giữ nguyên để dịch english_definition
-                vietnamese_explanation = "Không thể dịch giải thích này."
-                if english_definition and english_definition.strip() and english_definition.lower() != "n/a" and english_definition.lower() != "no english definition found.":
-                    if english_definition.lower() != original_word.lower():
-                        translated_definition = translate_with_deep_translator(original_word)
-                        if translated_definition and translated_definition.strip().lower() != english_definition.strip().lower():
-                            vietnamese_explanation = translated_definition
-                    else:
-                        translated_word_meaning = translate_with_deep_translator(original_word)
-                        if translated_word_meaning and translated_word_meaning.strip().lower() != original_word.strip().lower():
-                            vietnamese_explanation = translated_word_meaning
-
-                # --- TỔNG HỢP KẾT QUẢ CUỐI CÙNG ---
-                processed_results_dict[original_word] = []
-                processed_results_dict[original_word].append({
-                    "type": word_type,
-                    "definition_en": english_definition,
-                    "definition_vi": vietnamese_explanation,
-                    "example_sentence": example_en,  # example_en đã được lấy từ Tatoeba
-                    "example_sentence_vi": vietnamese_example_sentence,  # example_sentence_vi đã được lấy từ Tatoeba
-                    "ipa": ipa_text
-                })
-                print(f"  Kết quả cho '{original_word}': {processed_results_dict[original_word]}")
-
+        words_list = list(dict.fromkeys(words_list))  # Loại bỏ từ trùng nhưng giữ nguyên thứ tự
+
+        if words_list and app.config['ENRICHMENT_ASYNC_JOBS']:
+            # Tạo job chạy nền và trả trang về ngay; trình duyệt polling kết quả từng từ
+            # qua enter_words_job_status (xem enrichment_jobs.py).
+            job = enrichment_job_runner.enqueue(words_list, user_id=current_user_db_id)
+            enrichment_job_info = {
+                "id": job.id,
+                "words": words_list,
+                "poll_url": url_for('enter_words_job_status', job_id=job.id)
+            }
+        elif words_list:
+            # Tất cả các từ được xử lý song song bởi EnrichmentEngine (xem enrichment.py),
+            # kết quả trả về theo đúng thứ tự người dùng nhập.
+            processed_results_dict = enrichment_engine.enrich_words(words_list, user_id=current_user_db_id)
         elif input_str:
             flash("Vui lòng nhập từ hợp lệ, cách nhau bằng dấu phẩy.", "info")
 
@@ -1138,13 +1500,72 @@ def enter_words_page():
                            user_info=display_user_info,
                            input_words_str=form.words_input.data or "",
                            results=processed_results_dict,
+                           enrichment_job=enrichment_job_info,
                            user_existing_lists=user_lists,
                            target_list_info=target_list_info)
 
+
+@app.route('/enter-words/jobs/<job_id>', methods=['GET'])
+@login_required
+def enter_words_job_status(job_id):
+    """
+    Endpoint polling cho enrichment job.
+    Trả về trạng thái job và các kết quả mới hoàn thành sau con trỏ ?after=<item_id>.
+    Khi job ở trạng thái 'partial', một từ có thể nhận thêm item mới (kết quả bổ sung) thay thế item cũ.
+    """
+    current_user_db_id = session.get("db_user_id")
+    job = enrichment_job_runner.get_job(job_id, current_user_db_id)
+    if not job:
+        return jsonify({"success": False, "message": "Không tìm thấy job."}), 404
+
+    after_item_id = request.args.get('after', 0, type=int)
+    render_word_result = get_template_attribute('partials/word_result.html', 'word_result')
+
+    items = []
+    for item in enrichment_job_runner.get_items_after(job.id, after_item_id):
+        result = json.loads(item.result) if item.result else []
+        items.append({
+            "id": item.id,
+            "position": item.position,
+            "word": item.word,
+            "result": result,
+            "incomplete": is_incomplete(result),
+            "html": str(render_word_result(item.word, result, is_open=(item.position == 0)))
+        })
+
+    return jsonify({
+        "success": True,
+        "status": job.status,
+        "total": job.total_words,
+        "completed": job.completed_words,
+        "items": items
+    })
+
 # --- Sửa đổi hàm save_list_route ---
+# Idempotency key của /save-list được giữ trong khoảng thời gian này (đủ cho các lần client retry)
+app.config.setdefault('SAVE_LIST_IDEMPOTENCY_TTL_HOURS', 24)
+
+
+def get_saved_list_response(user_id, idempotency_key):
+    """Trả về response (dict) đã lưu của một request /save-list trước đó với cùng idempotency key, hoặc None."""
+    if not idempotency_key:
+        return None
+    previous = SaveListRequest.query.filter_by(user_id=user_id, idempotency_key=idempotency_key).first()
+    return json.loads(previous.response) if previous else None
+
+
 @app.route('/save-list', methods=['POST'])
 # @login_required
 def save_list_route():
+    """
+    Lưu các từ đã tra cứu vào một list mới hoặc list có sẵn.
+
+    - Tất cả các từ được lưu bằng một lần INSERT nhiều dòng (bulk_save.bulk_add_entries);
+      từ đã có trong list (so sánh theo từ đã chuẩn hóa) được bỏ qua và trả về trong 'existing_words',
+      từ lặp lại trong chính request được lưu một lần, các lần lặp trả về trong 'duplicate_words'.
+    - Idempotency: client gửi header Idempotency-Key (hoặc trường 'idempotency_key' trong JSON).
+      Request lặp lại với cùng key nhận lại đúng response lần đầu, không lưu thêm lần nữa.
+    """
     current_user_db_id = session.get("db_user_id")
     if current_user_db_id:
         log_user_activity(current_user_db_id, 'words_saved',
@@ -1158,11 +1579,15 @@ def save_list_route():
         print("DEBUG: No JSON data received in save_list_route.")  # DEBUG
         return jsonify({"success": False, "message": "Không nhận được dữ liệu."}), 400
 
-    print(f"DEBUG: Data received by save_list_route: {data}")  # DEBUG: In toàn bộ payload
-
     vocabulary_items_data = data.get('words')
     list_name_from_input = data.get('list_name')
     existing_list_id = data.get('existing_list_id')
+    idempotency_key = (request.headers.get('Idempotency-Key') or data.get('idempotency_key') or '').strip()[:64]
+
+    # Request lặp lại (client retry): trả lại kết quả lần đầu
+    saved_response = get_saved_list_response(current_user_db_id, idempotency_key)
+    if saved_response is not None:
+        return jsonify(saved_response)
 
     if not vocabulary_items_data or not isinstance(vocabulary_items_data, list) or len(vocabulary_items_data) == 0:
         print("DEBUG: No vocabulary items to save.")  # DEBUG
@@ -1197,40 +1622,52 @@ def save_list_route():
                         "message": "Vui lòng cung cấp tên cho danh sách mới hoặc chọn một danh sách hiện có."}), 400
 
     try:
-        for item_data in vocabulary_items_data:
-            print(f"DEBUG: Processing item_data for word: {item_data.get('original_word')}")  # DEBUG
-            print(
-                f"DEBUG: example_sentence_vi from item_data: {item_data.get('example_sentence_vi')}")  # DEBUG: RẤT QUAN TRỌNG
-
-            new_entry = VocabularyEntry(
-                original_word=item_data.get('original_word'),
-                word_type=item_data.get('word_type'),
-                definition_en=item_data.get('definition_en'),
-                definition_vi=item_data.get('definition_vi'),
-                ipa=item_data.get('ipa'),
-                example_en=item_data.get('example_en'),
-                example_vi=item_data.get('example_sentence_vi'),  # DÒNG NÀY ĐÃ ĐƯỢC SỬA. KIỂM TRA LẠI CHÍNH TẢ
-                user_id=current_user_db_id,
-                vocabulary_list=target_list
-            )
-            db.session.add(new_entry)
-            print(
-                f"DEBUG: Added new_entry for '{new_entry.original_word}' with example_vi='{new_entry.example_vi}'.")  # DEBUG
+        if is_new_list:
+            db.session.flush()  # Lấy id cho list mới trước khi bulk insert các từ
+            counters.list_created(current_user_db_id)
 
-        db.session.commit()
-        print("DEBUG: Database commit successful.")  # DEBUG
+        saved_words, existing_words, duplicate_words = bulk_add_entries(target_list, current_user_db_id,
+                                                                        vocabulary_items_data)
 
-        action_message = f"Đã thêm từ vào danh sách '{target_list.name}'." if existing_list_id else f"Đã tạo và lưu danh sách '{target_list.name}'."
+        if existing_list_id:
+            action_message = f"Đã thêm {len(saved_words)} từ vào danh sách '{target_list.name}'."
+        else:
+            action_message = f"Đã tạo và lưu danh sách '{target_list.name}'."
+        if existing_words:
+            action_message += f" Bỏ qua {len(existing_words)} từ đã có trong danh sách."
+        if duplicate_words:
+            action_message += f" Bỏ qua {len(duplicate_words)} từ bị lặp lại."
 
-        return jsonify({
+        response_data = {
             "success": True,
             "message": action_message,
             "list_id": target_list.id,
-            "is_new_list": is_new_list
-        })
+            "is_new_list": is_new_list,
+            "saved_count": len(saved_words),
+            "existing_words": existing_words,
+            "duplicate_words": duplicate_words
+        }
+
+        if idempotency_key:
+            # Lưu key cùng transaction với các từ: hoặc cả hai cùng được ghi, hoặc không gì cả
+            db.session.add(SaveListRequest(user_id=current_user_db_id, idempotency_key=idempotency_key,
+                                           list_id=target_list.id, response=json.dumps(response_data)))
+            expired_before = datetime.utcnow() - timedelta(hours=app.config['SAVE_LIST_IDEMPOTENCY_TTL_HOURS'])
+            SaveListRequest.query.filter(SaveListRequest.created_at < expired_before).delete()
+
+        db.session.commit()
+
+        return jsonify(response_data)
 
     except Exception as e:
         db.session.rollback()
+
+        # Hai request cùng idempotency key chạy đồng thời: request commit sau vi phạm unique constraint
+        # của save_list_request -> trả về kết quả của request đã commit trước.
+        saved_response = get_saved_list_response(current_user_db_id, idempotency_key)
+        if saved_response is not None:
+            return jsonify(saved_response)
+
         print(f"ERROR: Exception during saving list/words for user {current_user_db_id}: {e}")  # DEBUG Lỗi chi tiết
         import traceback
         traceback.print_exc()  # DEBUG: In đầy đủ traceback trên server console
@@ -1283,11 +1720,67 @@ def my_lists_page():
                            my_vocabulary_lists=user_lists)
 
 
+# Số từ mỗi trang ở trang chi tiết list: trang đầu được render sẵn, các trang sau được tải qua JSON khi cuộn
+app.config.setdefault('LIST_ENTRIES_PAGE_SIZE', 50)
+LIST_ENTRIES_MAX_PAGE_SIZE = 200  # Giới hạn tham số ?limit= của các endpoint JSON
+
+
+def get_list_entries_page(vocab_list, after=None, limit=None):
+    """
+    Lấy một trang VocabularyEntry của list theo keyset (added_at, id), dùng index (list_id, added_at).
+
+    Args:
+        vocab_list (VocabularyList): List cần lấy từ (đã kiểm tra quyền truy cập).
+        after (str, optional): Cursor của trang trước (next_cursor); None để lấy trang đầu.
+        limit (int, optional): Số từ tối đa; mặc định LIST_ENTRIES_PAGE_SIZE.
+
+    Returns:
+        tuple: (entries, next_cursor); next_cursor là None nếu đã hết.
+
+    Raises:
+        ValueError: Nếu cursor không hợp lệ.
+    """
+    return keyset_page(VocabularyEntry.query.filter_by(list_id=vocab_list.id),
+                       [VocabularyEntry.added_at, VocabularyEntry.id],
+                       after=after, limit=limit or app.config['LIST_ENTRIES_PAGE_SIZE'])
+
+
+def list_entries_json_response(vocab_list, render_entry):
+    """
+    Trả về JSON một trang từ của list (tham số ?after=<cursor>&limit=<n>).
+    Mỗi từ kèm 'html' render bằng macro `render_entry` để trang hiện tại chỉ việc chèn vào cuối danh sách.
+    """
+    limit = request.args.get('limit', app.config['LIST_ENTRIES_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, LIST_ENTRIES_MAX_PAGE_SIZE))
+    try:
+        entries, next_cursor = get_list_entries_page(vocab_list, after=request.args.get('after'), limit=limit)
+    except ValueError:
+        return jsonify({"success": False, "message": "Cursor không hợp lệ."}), 400
+
+    return jsonify({
+        "success": True,
+        "entries": [{
+            "id": entry.id,
+            "original_word": entry.original_word,
+            "word_type": entry.word_type,
+            "ipa": entry.ipa,
+            "definition_en": entry.definition_en,
+            "definition_vi": entry.definition_vi,
+            "example_en": entry.example_en,
+            "example_vi": entry.example_vi,
+            "added_at": entry.added_at.isoformat() if entry.added_at else None,
+            "html": str(render_entry(entry))
+        } for entry in entries],
+        "next_cursor": next_cursor
+    })
+
+
 @app.route('/my-lists/<int:list_id>')
 def list_detail_page(list_id):
     """
     Hiển thị trang chi tiết của một VocabularyList cụ thể.
-    Bao gồm thông tin của danh sách và tất cả các VocabularyEntry (từ vựng) trong danh sách đó.
+    Bao gồm thông tin của danh sách và trang đầu các VocabularyEntry (từ vựng) trong danh sách đó;
+    các trang sau được tải dần qua list_entries_api.
     Chỉ người dùng sở hữu danh sách mới có thể xem được.
     """
     log_user_activity(session.get("db_user_id"), 'accessed_list_detail_page', details={'list_id': list_id})
@@ -1317,27 +1810,45 @@ def list_detail_page(list_id):
         flash("The word list was not found or you do not have access.", "danger")
         return redirect(url_for('my_lists_page'))
 
-    # 5. Nếu VocabularyList hợp lệ, lấy tất cả các VocabularyEntry (từ vựng)
-    #    thuộc về danh sách này.
-    #    Sắp xếp các từ theo ngày thêm (added_at) tăng dần (từ cũ nhất đến mới nhất).
-    #    Bạn có thể thay đổi tiêu chí sắp xếp nếu muốn (ví dụ: theo original_word).
-    entries_in_list = VocabularyEntry.query.filter_by(list_id=vocab_list.id).order_by(
-        VocabularyEntry.added_at.asc()).all()
+    # 5. Nếu VocabularyList hợp lệ, lấy TRANG ĐẦU các VocabularyEntry (từ vựng) của danh sách này,
+    #    sắp xếp theo ngày thêm (added_at) tăng dần (từ cũ nhất đến mới nhất).
+    #    Các trang sau được trình duyệt tải qua list_entries_api với next_cursor.
+    entries_in_list, next_cursor = get_list_entries_page(vocab_list)
 
     # In ra thông tin debug ở server (tùy chọn)
     print(
-        f"Hiển thị chi tiết list '{vocab_list.name}' (ID: {vocab_list.id}) cho user {current_user_db_id} với {len(entries_in_list)} từ.")
+        f"Hiển thị chi tiết list '{vocab_list.name}' (ID: {vocab_list.id}) cho user {current_user_db_id} "
+        f"với {len(entries_in_list)}/{vocab_list.entry_count} từ ở trang đầu.")
     if entries_in_list:
         print(f"Entry đầu tiên trong list: {entries_in_list[0].original_word}")
 
     # 6. Render template 'list_detail.html' và truyền các dữ liệu cần thiết vào:
     #    - user_info: Thông tin của người dùng đang đăng nhập (cho base.html).
     #    - current_list: Đối tượng VocabularyList đang được xem chi tiết.
-    #    - entries: Danh sách các đối tượng VocabularyEntry trong current_list.
+    #    - entries: Trang đầu các đối tượng VocabularyEntry trong current_list.
+    #    - next_cursor: Cursor để tải trang tiếp theo (None nếu đã hết).
     return render_template('list_detail.html',
                            user_info=display_user_info,
                            current_list=vocab_list,
-                           entries=entries_in_list)
+                           entries=entries_in_list,
+                           next_cursor=next_cursor)
+
+
+@app.route('/my-lists/<int:list_id>/entries')
+def list_entries_api(list_id):
+    """
+    JSON: một trang từ của list (keyset theo added_at, id), dùng cho việc tải dần trên trang list_detail.
+    Tham số: ?after=<next_cursor của trang trước>&limit=<số từ>.
+    """
+    current_user_db_id = session.get("db_user_id")
+    if not current_user_db_id:
+        return jsonify({"success": False, "message": "Vui lòng đăng nhập để xem danh sách."}), 401
+
+    vocab_list = VocabularyList.query.filter_by(id=list_id, user_id=current_user_db_id).first()
+    if not vocab_list:
+        return jsonify({"success": False, "message": "Không tìm thấy danh sách hoặc bạn không có quyền."}), 404
+
+    return list_entries_json_response(vocab_list, get_template_attribute('partials/list_entry.html', 'list_entry'))
 
 
 @app.route('/delete-list/<int:list_id>', methods=['POST'])  # Route cho Admin xóa list
@@ -1391,6 +1902,7 @@ def delete_list_route(list_id):
         #    VocabularyList và VocabularyEntry (trong model VocabularyList),
         #    tất cả các VocabularyEntry (từ vựng) liên quan đến danh sách này
         #    sẽ tự động bị xóa theo khỏi database.
+        counters.list_deleted(list_to_delete)
         db.session.delete(list_to_delete)
         db.session.commit()  # Lưu các thay đổi vào database.
 
@@ -1511,6 +2023,7 @@ def admin_delete_vocab_entry_route(entry_id):
     print(f"DEBUG: Found entry '{entry_original_word}' (ID: {entry_id}) for deletion.")
 
     try:
+        counters.entries_removed(parent_list_id, entry_to_delete.user_id)
         db.session.delete(entry_to_delete)
         db.session.commit()
 
@@ -1630,8 +2143,8 @@ def profile_page():
         # Chuyển hướng về trang chủ, có thể kèm tham số để JavaScript tự mở modal đăng nhập.
         return redirect(url_for('home', open_login_modal='true'))
 
-        # 2. Lấy đối tượng User từ database dựa trên ID đã lưu trong session.
-    user = User.query.get(current_user_db_id)
+        # 2. Lấy đối tượng User từ database dựa trên ID đã lưu trong session (một lần cho cả request).
+    user = get_current_user()
     if not user:
         # Nếu không tìm thấy user (ví dụ: session hỏng hoặc user đã bị xóa),
         # hiển thị lỗi, xóa session và chuyển hướng về trang chủ.
@@ -1703,9 +2216,9 @@ def profile_page():
     #    Hoặc khi POST request có lỗi validation và redirect về (nếu bạn dùng PRG pattern)
     #    Hoặc khi POST AJAX thành công và client tự reload trang.
 
-    # Lấy các thông tin thống kê cho người dùng
-    num_lists = VocabularyList.query.filter_by(user_id=user.id).count()
-    num_entries = VocabularyEntry.query.filter_by(user_id=user.id).count()  # Giả định VocabularyEntry có user_id
+    # Lấy các thông tin thống kê cho người dùng (đọc bộ đếm, không COUNT(*) lại mỗi lần xem)
+    num_lists = user.list_count
+    num_entries = user.entry_count
 
     # Tính toán thời gian người dùng đã tham gia
     time_with_us_str = calculate_time_difference(user.created_at)  # Hàm này cần được định nghĩa ở đâu đó
@@ -1957,12 +2470,9 @@ def admin_view_list_entries_page(owner_user_id, list_id):
         return redirect(url_for('admin_view_user_detail', user_id_to_view=owner_user_id))
         # Hoặc 'admin_bp.view_user_detail'
 
-    # 4. Nếu VocabularyList hợp lệ, lấy tất cả các VocabularyEntry (từ vựng)
-    #    thuộc về danh sách này.
-    #    Sắp xếp các từ theo ngày thêm (added_at) tăng dần (từ cũ nhất đến mới nhất).
-    #    Bạn có thể thay đổi tiêu chí sắp xếp nếu muốn (ví dụ: theo original_word).
-    entries_in_list = VocabularyEntry.query.filter_by(list_id=vocab_list.id).order_by(
-        VocabularyEntry.added_at.asc()).all()
+    # 4. Nếu VocabularyList hợp lệ, lấy TRANG ĐẦU các VocabularyEntry (từ vựng) của danh sách này,
+    #    sắp xếp theo ngày thêm (added_at) tăng dần. Các trang sau được tải qua admin_list_entries_api.
+    entries_in_list, next_cursor = get_list_entries_page(vocab_list)
 
     print(f"DEBUG: Preparing to render admin_list_entries.html for list ID: {list_id}")
     print(f"DEBUG: Number of entries: {len(entries_in_list)}")
@@ -1983,7 +2493,21 @@ def admin_view_list_entries_page(owner_user_id, list_id):
                            user_info=admin_user_info,
                            current_list=vocab_list,
                            list_owner=list_owner,
-                           entries=entries_in_list)
+                           entries=entries_in_list,
+                           next_cursor=next_cursor)
+
+
+@app.route('/admin/user/<int:owner_user_id>/list/<int:list_id>/entries')
+@admin_required
+def admin_list_entries_api(owner_user_id, list_id):
+    """JSON: một trang từ của list cho trang Admin xem list (tham số giống list_entries_api)."""
+    vocab_list = VocabularyList.query.filter_by(id=list_id, user_id=owner_user_id).first()
+    if not vocab_list:
+        return jsonify({"success": False, "message": "Không tìm thấy danh sách của người dùng này."}), 404
+
+    render_entry = get_template_attribute('partials/admin_list_entry.html', 'admin_list_entry')
+    return list_entries_json_response(
+        vocab_list, lambda entry: render_entry(entry, vocab_list.id, owner_user_id))
 
 
 @app.route('/google-complete-setup', methods=['GET', 'POST'])
@@ -2078,20 +2602,12 @@ def google_complete_setup_page():
 
 # THÊM HÀM GHI LOG HOẠT ĐỘNG
 def log_user_activity(user_id, activity_type, details=None):
-    """Ghi lại một hoạt động của người dùng."""
-    if user_id:
-        activity = UserActivity(
-            user_id=user_id,
-            activity_type=activity_type,
-            details=details
-        )
-        try:
-            db.session.add(activity)
-            db.session.commit()
-            print(f"Logged activity for user {user_id}: {activity_type}")
-        except Exception as e:
-            db.session.rollback()
-            print(f"Error logging activity for user {user_id}: {activity_type} - {e}")
+    """
+    Ghi lại một hoạt động của người dùng.
+    Sự kiện được đưa vào hàng đợi của ActivityRecorder và ghi theo lô ở background;
+    các lần xem lại cùng một trang trong cửa sổ gộp không được ghi thêm.
+    """
+    activity_recorder.record(user_id, activity_type, details=details)
 
 
 @app.route('/admin/entry/<int:entry_id>/edit', methods=['POST'])
@@ -2166,43 +2682,54 @@ def admin_edit_vocab_entry_route(entry_id):
         return jsonify({"success": False, "message": f"Lỗi server khi cập nhật mục từ: {str(e)}"}), 500
 
 
+app.config.setdefault('API_LOGS_PAGE_SIZE', 50)
+API_LOGS_MAX_PAGE_SIZE = 200  # Giới hạn tham số ?limit= của /admin/api-logs
+
+
 @app.route('/admin/api-logs')
 @admin_required
 def admin_api_logs_page():
     admin_user_info = get_current_user_info()
 
-    # --- PHÂN TRANG (PAGINATION) ---
-    page = request.args.get('page', 1, type=int)  # Lấy số trang từ URL (mặc định là 1)
-    per_page = 10  # Số lượng log trên mỗi trang (bạn có thể thay đổi, ví dụ 20, 50, 100)
-
-    # Lấy các bản ghi log API từ database với phân trang
-    # paginate() trả về một đối tượng Pagination
-    # .options(db.load_only(APILog.id, APILog.api_name, ...)) # Tùy chọn: chỉ tải các cột cần thiết để tối ưu
-    pagination = APILog.query.order_by(APILog.timestamp.desc()).paginate(
-        page=page,
-        per_page=per_page,
-        error_out=False  # Nếu page number không hợp lệ, không báo lỗi 404
-    )
-
-    logs = pagination.items  # Lấy danh sách các log cho trang hiện tại
+    latency_window = request.args.get('window', latency_histogram.DEFAULT_WINDOW)
+    if latency_window not in latency_histogram.WINDOWS:
+        latency_window = latency_histogram.DEFAULT_WINDOW
 
-    # --- THỐNG KÊ TỔNG QUAN (GIỮ NGUYÊN) ---
-    total_calls = APILog.query.count()
-    successful_calls = APILog.query.filter_by(success=True).count()
-    failed_calls = total_calls - successful_calls
+    # --- LỌC VÀ PHÂN TRANG KEYSET ---
+    # ?after=<cursor> là vị trí (timestamp, id) của log cuối trang trước, không dùng OFFSET;
+    # bộ lọc api_name, success, user_id, status_code, since, until (xem api_log_query.parse_filters)
+    limit = request.args.get('limit', app.config['API_LOGS_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, API_LOGS_MAX_PAGE_SIZE))
+    try:
+        filters, conditions = api_log_query.parse_filters(request.args)
+        logs, next_cursor = api_log_query.get_page(conditions, after=request.args.get('after'), limit=limit)
+    except ValueError:
+        flash("Invalid filter or page link. Showing the latest logs instead.", "warning")
+        filters, conditions = api_log_query.parse_filters({})
+        logs, next_cursor = api_log_query.get_page(conditions, limit=limit)
 
-    calls_by_api_name = db.session.query(
-        APILog.api_name,
-        func.count(APILog.id).label('count'),
-        func.sum(case((APILog.success == True, 1), else_=0)).label('successful'),
-        func.sum(case((APILog.success == False, 1), else_=0)).label('failed')
-    ).group_by(APILog.api_name).all()
+    # --- THỐNG KÊ TỔNG QUAN ---
+    # Đọc từ các bảng tổng hợp theo giờ/ngày (api_rollups.py) thay vì COUNT/GROUP BY trên toàn bộ api_log
+    rollup_totals = api_rollups.get_totals()
 
     stats = {
-        "total_calls": total_calls,
-        "successful_calls": successful_calls,
-        "failed_calls": failed_calls,
-        "calls_by_api_name": calls_by_api_name
+        "total_calls": rollup_totals["total_calls"],
+        "successful_calls": rollup_totals["successful_calls"],
+        "failed_calls": rollup_totals["failed_calls"],
+        "calls_by_api_name": rollup_totals["calls_by_api_name"],
+        "status_codes_by_api_name": rollup_totals["status_codes_by_api_name"],
+        "last_24h": rollup_totals["last_24h"],
+        "daily_calls": api_rollups.get_daily_series(),  # Biểu đồ 30 ngày gần nhất
+        "monthly_calls": api_rollups.get_monthly_series(),  # Biểu đồ 12 tháng gần nhất
+        "word_cache": word_cache.get_stats(),  # Hit/miss của cache tra cứu từ (tính từ khi process khởi động)
+        "local_dictionary": local_dictionary.get_stats(),  # Số từ tra được trong từ điển offline
+        "local_examples": local_examples.get_stats(),  # Số câu ví dụ tìm được trong chỉ mục Tatoeba offline
+        "single_flight": word_cache.single_flight.get_stats(),  # Số lời gọi API trùng nhau đã được gộp
+        "upstreams": upstream.get_resilience_stats(),  # Circuit breaker + bulkhead của từng API
+        "api_log_writer": api_log_writer.get_stats(),  # Hàng đợi ghi log write-behind của process hiện tại
+        "api_log_archive": api_log_archive.get_stats(),  # Số log đã chuyển sang file lưu trữ
+        # p50/p95/p99 của từng API trong khoảng thời gian đã chọn, tính từ histogram gộp sẵn (không quét api_log)
+        "latency": latency_histogram.get_latency_stats(latency_window),
     }
 
     # --- TRUYỀN DỮ LIỆU VÀO TEMPLATE ---
@@ -2210,7 +2737,76 @@ def admin_api_logs_page():
                            user_info=admin_user_info,
                            logs=logs,
                            stats=stats,
-                           pagination=pagination)  # TRUYỀN ĐỐI TƯỢNG PHÂN TRANG MỚI VÀO
+                           latency_window=latency_window,
+                           latency_windows=latency_histogram.WINDOWS,
+                           filters=filters,
+                           filter_args=api_log_query.active_filters(filters),
+                           is_first_page=not request.args.get('after'),
+                           next_cursor=next_cursor,
+                           limit=limit)
+
+
+@app.route('/admin/api-logs/export.<export_format>')
+@admin_required
+def admin_export_api_logs(export_format):
+    """
+    Xuất các log thỏa bộ lọc hiện tại (cùng tham số với /admin/api-logs) dạng CSV hoặc JSON Lines.
+    Kết quả được stream theo từng đoạn (api_log_query.iter_logs), không tải cả tập log vào bộ nhớ.
+    """
+    if export_format not in api_log_query.EXPORT_FORMATS:
+        return "Unsupported export format.", 404
+    try:
+        _, conditions = api_log_query.parse_filters(request.args)
+    except ValueError:
+        return "Invalid filter.", 400
+
+    generate, content_type = api_log_query.EXPORT_FORMATS[export_format]
+    filename = f"api_logs-{datetime.utcnow():%Y%m%d-%H%M%S}.{export_format}"
+    return Response(stream_with_context(generate(conditions)), content_type=content_type,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
+ARCHIVE_QUERY_LIMIT = 200  # Số log tối đa hiển thị cho một lần tra cứu log đã lưu trữ
+
+
+@app.route('/admin/api-logs/archive')
+@admin_required
+def admin_api_log_archive_page():
+    """
+    Xem các log đã được chuyển khỏi bảng api_log (xem api_log_archive.py).
+    Chỉ đọc các file lưu trữ của khoảng ngày được chọn (?start=YYYY-MM-DD&end=YYYY-MM-DD),
+    có thể lọc thêm theo api_name và success (1/0).
+    """
+    admin_user_info = get_current_user_info()
+    filters = {
+        'start': request.args.get('start', '').strip(),
+        'end': request.args.get('end', '').strip(),
+        'api_name': request.args.get('api_name', '').strip(),
+        'success': request.args.get('success', '').strip(),
+    }
+
+    logs, truncated, searched = [], False, False
+    if filters['start'] or filters['end']:
+        try:
+            start_day = date.fromisoformat(filters['start']) if filters['start'] else None
+            end_day = date.fromisoformat(filters['end']) if filters['end'] else None
+        except ValueError:
+            flash("Invalid date. Please use the YYYY-MM-DD format.", "danger")
+        else:
+            success = {'1': True, '0': False}.get(filters['success'])
+            logs, truncated = api_log_archive.query_archived(start_day, end_day, api_name=filters['api_name'] or None,
+                                                             success=success, limit=ARCHIVE_QUERY_LIMIT)
+            searched = True
+
+    return render_template('admin/api_log_archive.html',
+                           user_info=admin_user_info,
+                           segments=api_log_archive.get_segments(),
+                           archive_stats=api_log_archive.get_stats(),
+                           filters=filters,
+                           logs=logs,
+                           truncated=truncated,
+                           searched=searched,
+                           limit=ARCHIVE_QUERY_LIMIT)
 
 
 @app.route('/my-lists/<int:list_id_to_delete>/delete', methods=['POST'])
@@ -2255,6 +2851,7 @@ def delete_my_vocabulary_list(list_id_to_delete):
         #    giữa VocabularyList và VocabularyEntry (trong model VocabularyList),
         #    việc xóa VocabularyList này sẽ tự động xóa tất cả các VocabularyEntry
         #    liên kết với nó.
+        counters.list_deleted(list_to_delete)
         db.session.delete(list_to_delete)
         db.session.commit()  # Lưu các thay đổi (bao gồm cả cascade delete) vào database.
 
@@ -2325,7 +2922,8 @@ def delete_my_vocab_entry(entry_id):
     entry_original_word = entry_to_delete.original_word  # Từ gốc, để dùng trong thông báo.
 
     try:
-        # 6. Thực hiện xóa VocabularyEntry khỏi database.
+        # 6. Thực hiện xóa VocabularyEntry khỏi database (và giảm bộ đếm trong cùng transaction).
+        counters.entries_removed(parent_list_id, entry_to_delete.user_id)
         db.session.delete(entry_to_delete)
         db.session.commit()  # Lưu các thay đổi vào database.
 
@@ -2444,8 +3042,8 @@ def dashboard_page():
     log_user_activity(current_user_db_id, 'accessed_dashboard_page')
     # 1. Kiểm tra xem người dùng đã đăng nhập chưa.
     current_user_db_id = session.get("db_user_id")
-    user = User.query.get(current_user_db_id)
-    if not current_user_db_id:
+    user = get_current_user()
+    if not user:
         # Nếu chưa đăng nhập, hiển thị thông báo và chuyển hướng về trang chủ,
         # có thể kèm tham số để JavaScript tự mở modal đăng nhập.
         flash("Please log in to access dashboard.", "warning")
@@ -2459,12 +3057,11 @@ def dashboard_page():
         return redirect(url_for('logout'))  # Đăng xuất để làm sạch session
 
     # 3. Lấy các thông tin thống kê cho người dùng hiện tại.
-    #    3a. Đếm tổng số VocabularyList mà người dùng này đã tạo.
-    num_lists = VocabularyList.query.filter_by(user_id=current_user_db_id).count()
+    #    3a. Tổng số VocabularyList mà người dùng này đã tạo (bộ đếm User.list_count).
+    num_lists = user.list_count
 
-    #    3b. Đếm tổng số VocabularyEntry (từ vựng) mà người dùng này đã lưu
-    #        (giả định model VocabularyEntry có trường user_id liên kết trực tiếp).
-    num_entries = VocabularyEntry.query.filter_by(user_id=current_user_db_id).count()
+    #    3b. Tổng số VocabularyEntry (từ vựng) mà người dùng này đã lưu (bộ đếm User.entry_count).
+    num_entries = user.entry_count
 
     #    3c. Gom các thống kê vào một dictionary để dễ truyền vào template.
     stats = {
@@ -2573,7 +3170,7 @@ def update_profile_info_route():
         return redirect(url_for('home'))  # Hoặc url_for('login_page')
 
     # 2. Lấy đối tượng User cần cập nhật từ database.
-    user_to_update = User.query.get(current_user_db_id)
+    user_to_update = get_current_user()
     if not user_to_update:
         # Nếu không tìm thấy user (trường hợp hiếm nếu session hợp lệ), báo lỗi và về trang chủ.
         flash("Error: No user information found to update.", "danger")
@@ -2602,6 +3199,7 @@ def update_profile_info_route():
     try:
         # 6. Lưu các thay đổi vào database.
         db.session.commit()
+        forget_user_snapshot()  # Header/sidebar hiển thị tên mới ngay ở request sau
         flash("Profile information updated successfully!", "success")
 
         # 7. (Quan trọng) Cập nhật lại thông tin trong session['user_info']
@@ -2640,6 +3238,7 @@ def delete_my_list(list_id_to_delete):
         return redirect(url_for('my_lists_page'))
 
     try:
+        counters.list_deleted(list_to_delete)
         db.session.delete(list_to_delete)  # Cascade delete sẽ xóa các VocabularyEntry liên quan
         db.session.commit()
         flash(f"Vocabulary list '{list_to_delete.name}' and all its words have been deleted successfully.", "success")
@@ -2734,6 +3333,149 @@ def rename_my_list_ajax(list_id):
         return jsonify({"success": False, "message": f"Lỗi server khi đổi tên danh sách: {str(e)}"}), 500
 
 
+# === CLI COMMANDS ===
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """
+    Chạy EXPLAIN QUERY PLAN cho các truy vấn chính (query_plans.hot_queries) và
+    thoát với mã lỗi 1 nếu có truy vấn nào đọc toàn bộ bảng hoặc phải sort không dùng index.
+    Lưu ý: sau ANALYZE (flask optimize-db --analyze), với bảng chỉ có vài dòng SQLite có thể chọn SCAN vì rẻ hơn;
+    nên kiểm tra trên database chưa có thống kê (sqlite_stat1) hoặc có dữ liệu thật.
+    Dùng: flask check-query-plans
+    """
+    failed = False
+    for name, plan, problems in check_hot_queries():
+        status = "FAIL" if problems else "OK"
+        print(f"[{status}] {name}")
+        for detail in plan:
+            print(f"        {detail}")
+        failed = failed or bool(problems)
+    if failed:
+        raise SystemExit(1)
+
+
+@app.cli.command('optimize-db')
+@click.option('--analyze', is_flag=True, help="Chạy ANALYZE đầy đủ thay vì PRAGMA optimize.")
+def optimize_db_command(analyze):
+    """
+    Cập nhật thống kê cho query planner của SQLite trên mọi database (app cũng tự chạy PRAGMA optimize định kỳ,
+    xem SQLITE_OPTIMIZE_INTERVAL_SECONDS). Nên chạy --analyze sau khi nạp nhiều dữ liệu (import-dictionary...).
+    Dùng: flask optimize-db [--analyze]
+    """
+    for stats in sqlite_tuning.get_stats():
+        print(f"{stats['bind']}: " + ", ".join(f"{name}={value}" for name, value in stats['pragmas'].items()))
+    for bind_key, seconds in sqlite_tuning.optimize(analyze=analyze).items():
+        print(f"Đã {'ANALYZE' if analyze else 'PRAGMA optimize'} database {bind_key or 'main'} trong {seconds:.2f}s.")
+
+
+@app.cli.command('archive-api-logs')
+@click.option('--older-than-days', type=int, default=None,
+              help="Số ngày log được giữ lại (mặc định API_LOG_RETENTION_DAYS).")
+def archive_api_logs_command(older_than_days):
+    """
+    Chuyển API log cũ sang file lưu trữ nén (API_LOG_ARCHIVE_DIR) và xóa khỏi bảng api_log
+    (app cũng tự chạy định kỳ, xem API_LOG_ARCHIVE_INTERVAL_SECONDS).
+    Dùng: flask archive-api-logs [--older-than-days 30]
+    """
+    api_log_writer.flush()
+    try:
+        result = api_log_archive.archive(retention_days=older_than_days)
+    except ArchiveLocked:
+        print("Một process khác đang lưu trữ API log, hãy thử lại sau.")
+        raise SystemExit(1)
+    if result['cutoff'] is None:
+        print("Không giới hạn thời gian lưu API log (API_LOG_RETENTION_DAYS), không có gì để làm.")
+        return
+    print(f"Đã lưu trữ {result['archived']} log trước {result['cutoff']:%Y-%m-%d} "
+          f"và xóa {result['deleted']} log khỏi bảng api_log.")
+
+
+@app.cli.command('move-telemetry-data')
+def move_telemetry_data_command():
+    """
+    Chuyển api_log, user_activity và các bảng tổng hợp của api_log từ database chính sang database telemetry
+    (SQLALCHEMY_BINDS['telemetry']) rồi xóa chúng khỏi database chính. Nếu bị dừng giữa chừng, chạy lại để chép tiếp.
+    Dùng (một lần, sau khi nâng cấp): flask db -d migrations_telemetry upgrade && flask move-telemetry-data
+    """
+    api_log_writer.flush()
+    activity_recorder.flush()
+    moved = move_legacy_telemetry_tables()
+    if not moved:
+        print("Không có bảng telemetry nào trong database chính cần chuyển.")
+    for table_name, rows in moved.items():
+        print(f"Đã chuyển {rows} dòng của bảng {table_name} sang database telemetry.")
+
+
+@app.cli.command('rebuild-api-rollups')
+def rebuild_api_rollups_command():
+    """
+    Tính lại các bảng tổng hợp số lời gọi API theo giờ/ngày (api_call_hourly, api_call_daily) từ bảng api_log.
+    Dùng sau khi nâng cấp từ phiên bản chưa có bảng tổng hợp, hoặc khi nghi ngờ số liệu bị lệch.
+    Dùng: flask rebuild-api-rollups
+    """
+    rows = api_rollups.rebuild_rollups()
+    print(f"Đã tính lại {rows['api_call_hourly']} dòng theo giờ và {rows['api_call_daily']} dòng theo ngày.")
+
+
+@app.cli.command('reconcile-counters')
+def reconcile_counters_command():
+    """
+    Tính lại các bộ đếm phi chuẩn hóa (VocabularyList.entry_count, User.list_count, User.entry_count)
+    từ dữ liệu thật, dùng khi nghi ngờ bộ đếm bị lệch (ví dụ sau khi sửa dữ liệu trực tiếp trong database).
+    Dùng: flask reconcile-counters
+    """
+    fixed = counters.reconcile_counters()
+    print(f"Đã sửa bộ đếm của {fixed['vocabulary_list']} danh sách và {fixed['user']} người dùng.")
+
+
+@app.cli.command('import-dictionary')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--replace', is_flag=True, help="Xóa từ điển cũ trước khi nạp.")
+def import_dictionary_command(path, replace):
+    """
+    Nạp bản dump từ điển (JSON Lines của dictionaryapi.dev, Wiktionary/kaikki.org hoặc dạng phẳng; có thể .gz)
+    vào từ điển offline.
+    Dùng: flask import-dictionary en-dictionary.jsonl.gz [--replace]
+    """
+    result = import_dictionary(path, replace=replace)
+    print(f"Đã đọc {result['read']} dòng, bỏ qua {result['skipped']}; từ điển offline có {result['total']} từ.")
+
+
+@app.cli.command('import-tatoeba')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--replace', is_flag=True, help="Xóa các câu ví dụ cũ trước khi nạp.")
+@click.option('--vietnamese-first', is_flag=True, help="File là cặp Việt - Anh (câu tiếng Việt ở cột đầu).")
+def import_tatoeba_command(path, replace, vietnamese_first):
+    """
+    Nạp file "Sentence pairs" Anh - Việt của Tatoeba (TSV, có thể .gz) vào chỉ mục câu ví dụ offline.
+    Dùng: flask import-tatoeba eng-vie_sentence_pairs.tsv [--replace]
+    """
+    result = import_tatoeba_pairs(path, replace=replace, vietnamese_first=vietnamese_first)
+    print(f"Đã đọc {result['read']} dòng, bỏ qua {result['skipped']}; có {result['total']} cặp câu ví dụ offline.")
+
+
+@app.cli.command('sweep-enrichment-jobs')
+def sweep_enrichment_jobs_command():
+    """
+    Xóa các enrichment job đã xong quá ENRICHMENT_JOB_RETENTION_HOURS giờ (cùng kết quả của chúng) và đánh dấu
+    'failed' các job bị bỏ dở (app cũng tự dọn định kỳ, xem ENRICHMENT_JOB_SWEEP_INTERVAL_SECONDS).
+    Dùng: flask sweep-enrichment-jobs
+    """
+    result = enrichment_job_runner.sweep()
+    print(f"Đã đánh dấu {result['stale']} job bị bỏ dở là 'failed' và xóa {result['deleted']} job cũ.")
+
+
+@app.cli.command('sweep-sessions')
+def sweep_sessions_command():
+    """
+    Xóa các server-side session đã hết hạn (app cũng tự dọn định kỳ, xem SESSION_SWEEP_INTERVAL_SECONDS).
+    Dùng: flask sweep-sessions
+    """
+    removed = server_sessions.sweep()
+    print(f"Đã xóa {removed} session hết hạn.")
+
+
 if __name__ == '__main__':
     with app.app_context():
         app.run(debug=True)
@@ -0,0 +1,104 @@
+# benchmarks/bench_enrichment.py
+"""
+Benchmark EnrichmentEngine với các upstream API giả lập (stub) bằng time.sleep.
+
+So sánh:
+  - "sequential": cách enter_words_page cũ, lần lượt dictionary -> Tatoeba -> translate cho từng từ.
+  - "engine": EnrichmentEngine, tất cả lời gọi chạy song song trong pool thread.
+
+Chạy từ thư mục gốc của repo:
+    python benchmarks/bench_enrichment.py --words 20 --workers 60
+
+Với --deadline, engine dừng ở ENRICHMENT_DEADLINE_SECONDS và trả kết quả một phần cho các từ chưa xong:
+    python benchmarks/bench_enrichment.py --words 50 --workers 12 --deadline 0.5
+"""
+
+# --- Standard Library Imports ---
+import argparse
+import os
+import random
+import sys
+import time
+
+# Cho phép import enrichment.py khi chạy script trực tiếp từ thư mục benchmarks/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+
+from enrichment import EnrichmentEngine, is_incomplete  # noqa: E402
+
+
+def make_stub(latencies, name):
+    """Tạo hàm tra cứu giả có độ trễ cố định theo từng từ."""
+
+    def stub(word, user_id=None):
+        time.sleep(latencies[word][name])
+        return f"{name}:{word}"
+
+    return stub
+
+
+def build_result(word, dictionary_data, example_data, translated):
+    return [{"definition_en": dictionary_data, "example_sentence": example_data, "definition_vi": translated}]
+
+
+def run_sequential(words, dictionary_lookup, example_lookup, translate):
+    results = {}
+    for word in words:
+        results[word] = build_result(word, dictionary_lookup(word), example_lookup(word), translate(word))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--words', type=int, default=20, help='Số từ trong một lần nhập')
+    parser.add_argument('--workers', type=int, default=60, help='ENRICHMENT_MAX_WORKERS')
+    parser.add_argument('--min-latency', type=float, default=0.05, help='Độ trễ nhỏ nhất của một lời gọi (giây)')
+    parser.add_argument('--max-latency', type=float, default=0.30, help='Độ trễ lớn nhất của một lời gọi (giây)')
+    parser.add_argument('--deadline', type=float, default=None, help='ENRICHMENT_DEADLINE_SECONDS (mặc định: không giới hạn)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words = [f"word{i}" for i in range(args.words)]
+    latencies = {
+        word: {name: rng.uniform(args.min_latency, args.max_latency) for name in ('dictionary', 'example', 'translate')}
+        for word in words
+    }
+    dictionary_lookup = make_stub(latencies, 'dictionary')
+    example_lookup = make_stub(latencies, 'example')
+    translate = make_stub(latencies, 'translate')
+
+    app = Flask(__name__)
+    app.config['ENRICHMENT_MAX_WORKERS'] = args.workers
+    app.config['ENRICHMENT_DEADLINE_SECONDS'] = args.deadline
+    engine = EnrichmentEngine(dictionary_lookup, example_lookup, translate, build_result, app=app)
+
+    sum_of_words = sum(sum(per_word.values()) for per_word in latencies.values())
+    slowest_word = max(max(per_word.values()) for per_word in latencies.values())
+
+    start = time.perf_counter()
+    sequential_results = run_sequential(words, dictionary_lookup, example_lookup, translate)
+    sequential_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine_results = engine.enrich_words(words)
+    engine_time = time.perf_counter() - start
+
+    incomplete_words = [word for word, result in engine_results.items() if is_incomplete(result)]
+
+    assert list(engine_results) == words, "Kết quả phải giữ đúng thứ tự đầu vào"
+    assert all(engine_results[word] == sequential_results[word] for word in words if word not in incomplete_words), \
+        "Kết quả của engine phải giống cách xử lý tuần tự"
+
+    print(f"words={args.words} workers={args.workers}")
+    print(f"  tổng độ trễ của tất cả lời gọi : {sum_of_words:8.3f}s")
+    print(f"  lời gọi chậm nhất              : {slowest_word:8.3f}s")
+    print(f"  sequential                     : {sequential_time:8.3f}s")
+    print(f"  engine                         : {engine_time:8.3f}s  (x{sequential_time / engine_time:.1f})")
+    if args.deadline:
+        print(f"  từ chưa đầy đủ khi hết deadline: {len(incomplete_words):8d}/{len(words)}")
+
+
+if __name__ == '__main__':
+    main()
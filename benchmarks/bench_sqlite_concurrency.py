@@ -0,0 +1,162 @@
+# benchmarks/bench_sqlite_concurrency.py
+"""
+Benchmark thông lượng khi đọc và ghi đồng thời: N thread đọc (GET /my-lists/<id>, /dashboard) và
+M thread ghi (POST /save-list, mỗi lần thêm vài từ mới vào cùng một list) chạy qua các route thật của app,
+so sánh profile PRAGMA 'default' (mặc định của SQLite: rollback journal, synchronous=FULL) với 'production'
+(WAL, synchronous=NORMAL, busy_timeout, cache/mmap lớn hơn; xem sqlite_tuning.PROFILES).
+
+Mỗi profile chạy trong một process riêng (profile được áp dụng khi tạo engine lúc import app) với database
+SQLite tạm mới. Request chạy qua Flask test client trong cùng process, không có HTTP server, nên số liệu
+là thời gian xử lý của app + SQLite. Với rollback journal người đọc bị chặn trong lúc ghi commit (và ngược lại);
+với WAL chỉ các người ghi phải chờ nhau.
+
+Chạy từ thư mục gốc của repo:
+    python benchmarks/bench_sqlite_concurrency.py --readers 8 --writers 2 --seconds 10 [--db-dir instance]
+"""
+
+# --- Standard Library Imports ---
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILES = ('default', 'production')
+WORDS_PER_SAVE = 3
+
+
+def run_worker(args):
+    """Chạy benchmark cho profile hiện tại (đã đặt qua biến môi trường) và in kết quả dạng JSON."""
+    # Cho phép import app.py khi chạy script trực tiếp từ thư mục benchmarks/
+    sys.path.insert(0, REPO_ROOT)
+    from app import app  # noqa: E402
+    from models import db, User  # noqa: E402
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        db.create_all()
+        user = User(name='Bench', email='bench@example.com')
+        user.set_password('bench-password')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    def client():
+        test_client = app.test_client()
+        with test_client.session_transaction() as session:
+            session['db_user_id'] = user_id
+        return test_client
+
+    def new_word(word):
+        return {'original_word': word, 'word_type': 'noun',
+                'definition_en': f'Definition of {word}.', 'definition_vi': f'Nghĩa của {word}.'}
+
+    response = client().post('/save-list', json={'list_name': 'Bench', 'words': [
+        new_word(f'seed{i}') for i in range(200)]})
+    list_id = response.get_json()['list_id']
+
+    stop = threading.Event()
+    results = {'read': [], 'write': []}
+    errors = {'read': 0, 'write': 0}
+    lock = threading.Lock()
+
+    def reader(index):
+        test_client, paths = client(), [f'/my-lists/{list_id}', '/dashboard']
+        latencies, failed, i = [], 0, 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            response = test_client.get(paths[i % len(paths)])
+            latencies.append(time.perf_counter() - start)
+            failed += response.status_code != 200
+            i += 1
+        with lock:
+            results['read'].extend(latencies)
+            errors['read'] += failed
+
+    def writer(index):
+        test_client = client()
+        latencies, failed, i = [], 0, 0
+        while not stop.is_set():
+            words = [new_word(f'w{index}x{i}x{j}') for j in range(WORDS_PER_SAVE)]
+            start = time.perf_counter()
+            response = test_client.post('/save-list', json={'existing_list_id': list_id, 'words': words})
+            latencies.append(time.perf_counter() - start)
+            failed += response.status_code != 200 or not response.get_json().get('success')
+            i += 1
+        with lock:
+            results['write'].extend(latencies)
+            errors['write'] += failed
+
+    threads = ([threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+               + [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)])
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    print(json.dumps({'results': results, 'errors': errors}))
+
+
+def run_profile(profile, args):
+    """Chạy run_worker trong một process mới với profile và database tạm riêng."""
+    with tempfile.TemporaryDirectory(dir=args.db_dir) as tmp_dir:
+        tmp_dir = os.path.abspath(tmp_dir)  # Đường dẫn SQLite tương đối sẽ bị Flask-SQLAlchemy hiểu là trong instance/
+        env = dict(os.environ,
+                   SQLITE_PRAGMA_PROFILE=profile,
+                   DATABASE_URI=f"sqlite:///{os.path.join(tmp_dir, 'main.db')}",
+                   TELEMETRY_DATABASE_URI=f"sqlite:///{os.path.join(tmp_dir, 'telemetry.db')}")
+        command = [sys.executable, os.path.abspath(__file__), '--worker',
+                   '--readers', str(args.readers), '--writers', str(args.writers), '--seconds', str(args.seconds)]
+        output = subprocess.run(command, env=env, cwd=tmp_dir, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(kind, latencies, failed, seconds):
+    latencies_ms = sorted(latency * 1000 for latency in latencies) or [0.0]
+    p95 = latencies_ms[min(len(latencies_ms) - 1, int(len(latencies_ms) * 0.95))]
+    return (f"  {kind:<6} {len(latencies):>7} req  {len(latencies) / seconds:>8.1f} req/s  "
+            f"p50 {statistics.median(latencies_ms):>7.1f} ms  p95 {p95:>7.1f} ms  "
+            f"max {latencies_ms[-1]:>7.1f} ms  lỗi {failed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=8, help="Số thread đọc (mặc định 8)")
+    parser.add_argument('--writers', type=int, default=2, help="Số thread ghi (mặc định 2)")
+    parser.add_argument('--seconds', type=float, default=10, help="Thời gian chạy mỗi profile (mặc định 10 giây)")
+    parser.add_argument('--db-dir', default=None,
+                        help="Thư mục đặt database tạm (mặc định thư mục tạm của hệ thống; nếu đó là tmpfs thì fsync "
+                             "gần như không tốn gì, nên chọn thư mục trên ổ đĩa thật để thấy ảnh hưởng của synchronous)")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    print(f"{args.readers} thread đọc, {args.writers} thread ghi ({WORDS_PER_SAVE} từ mỗi lần lưu), "
+          f"{args.seconds:g} giây mỗi profile\n")
+    throughput = {}
+    for profile in PROFILES:
+        result = run_profile(profile, args)
+        print(f"Profile {profile}:")
+        for kind in ('read', 'write'):
+            print(summarize(kind, result['results'][kind], result['errors'][kind], args.seconds))
+        throughput[profile] = {kind: len(result['results'][kind]) / args.seconds for kind in ('read', 'write')}
+
+    print()
+    for kind in ('read', 'write'):
+        base = throughput['default'][kind]
+        ratio = throughput['production'][kind] / base if base else float('inf')
+        print(f"Thông lượng {kind}: production / default = {ratio:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
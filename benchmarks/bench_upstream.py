@@ -0,0 +1,118 @@
+# benchmarks/bench_upstream.py
+"""
+Benchmark độ trễ mỗi lời gọi HTTP: requests.get trực tiếp (mở kết nối mới mỗi lần)
+so với UpstreamClient (session dùng chung, connection pool keep-alive).
+
+Upstream được giả lập bằng một HTTP server cục bộ (HTTP/1.1, hỗ trợ keep-alive) trả về JSON
+giống dictionaryapi.dev. Server đếm số kết nối TCP đã mở để thấy rõ việc dùng lại kết nối.
+Lưu ý: server cục bộ không có TLS, nên mức chênh lệch ở đây chỉ là phần bắt tay TCP;
+với API thật qua HTTPS (thêm bắt tay TLS và độ trễ mạng) mức chênh lệch lớn hơn nhiều.
+
+Chạy từ thư mục gốc của repo:
+    python benchmarks/bench_upstream.py --calls 500 --threads 8
+"""
+
+# --- Standard Library Imports ---
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Cho phép import upstream.py khi chạy script trực tiếp từ thư mục benchmarks/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests  # noqa: E402
+
+from upstream import UpstreamClient  # noqa: E402
+
+STUB_PAYLOAD = json.dumps([{
+    "word": "example",
+    "phonetics": [{"text": "/ɪɡˈzɑːmpəl/"}],
+    "meanings": [{"partOfSpeech": "noun",
+                  "definitions": [{"definition": "A thing characteristic of its kind.",
+                                   "example": "It's a good example of the style."}]}]
+}]).encode('utf-8')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Cần HTTP/1.1 để giữ kết nối (keep-alive)
+    # Header và body được ghi bằng 2 lần write; tắt Nagle để tránh trễ ~40ms (delayed ACK) trên kết nối keep-alive
+    disable_nagle_algorithm = True
+    connections = 0
+    connections_lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with StubHandler.connections_lock:
+            StubHandler.connections += 1
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(STUB_PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(STUB_PAYLOAD)
+
+    def log_message(self, format, *args):
+        pass  # Không in log của từng request
+
+
+def run_calls(call, calls, threads):
+    """Chạy `calls` lời gọi bằng `threads` thread, trả về danh sách độ trễ từng lời gọi (giây)."""
+
+    def timed_call(i):
+        start = time.perf_counter()
+        response = call(i)
+        response.raise_for_status()
+        response.json()
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(timed_call, range(calls)))
+
+
+def summarize(name, latencies, wall_time, connections):
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    p95 = latencies_ms[int(len(latencies_ms) * 0.95) - 1]
+    print(f"  {name:<16} mean={statistics.mean(latencies_ms):7.3f}ms  p50={statistics.median(latencies_ms):7.3f}ms  "
+          f"p95={p95:7.3f}ms  total={wall_time:6.3f}s  tcp_connections={connections}")
+    return statistics.mean(latencies_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=500, help='Số lời gọi cho mỗi cách')
+    parser.add_argument('--threads', type=int, default=8, help='Số thread gọi đồng thời (như EnrichmentEngine)')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/api/v2/entries/en/example"
+
+    print(f"calls={args.calls} threads={args.threads} stub={url}")
+
+    StubHandler.connections = 0
+    start = time.perf_counter()
+    latencies = run_calls(lambda i: requests.get(url, timeout=15), args.calls, args.threads)
+    bare_mean = summarize('requests.get', latencies, time.perf_counter() - start, StubHandler.connections)
+
+    client = UpstreamClient()
+    client.pool_maxsize = args.threads
+    StubHandler.connections = 0
+    start = time.perf_counter()
+    latencies = run_calls(lambda i: client.get('dictionary_api', url), args.calls, args.threads)
+    pooled_mean = summarize('UpstreamClient', latencies, time.perf_counter() - start, StubHandler.connections)
+    client.close()
+
+    print(f"  mean latency speedup: x{bare_mean / pooled_mean:.1f}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
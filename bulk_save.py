@@ -0,0 +1,93 @@
+# bulk_save.py
+
+# --- Standard Library Imports ---
+from datetime import datetime
+
+# --- Third-party Library Imports ---
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert  # INSERT ... ON CONFLICT DO NOTHING (app dùng SQLite)
+
+# --- Application-Specific Imports ---
+from models import db, VocabularyEntry, normalize_word
+import counters
+
+# Số dòng tối đa trong một câu INSERT nhiều dòng / một danh sách IN (...):
+# 500 dòng x 10 cột vẫn dưới giới hạn số tham số của SQLite (32766).
+BULK_CHUNK_SIZE = 500
+
+# Các cột được nhận từ payload của /save-list (tên trong payload -> tên cột)
+ENTRY_FIELDS = {
+    'word_type': 'word_type',
+    'definition_en': 'definition_en',
+    'definition_vi': 'definition_vi',
+    'ipa': 'ipa',
+    'example_en': 'example_en',
+    'example_sentence_vi': 'example_vi',
+}
+
+
+def _chunks(items, size=BULK_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def bulk_add_entries(vocab_list, user_id, items):
+    """
+    Lưu nhiều từ vào một list bằng INSERT nhiều dòng (Core), bỏ qua các từ đã có trong list.
+
+    Từ "đã có" được xác định theo normalized_word (normalize_word(original_word)) qua unique index
+    (list_id, normalized_word): một truy vấn IN (...) dùng index để biết từ nào đã có, và
+    ON CONFLICT DO NOTHING phòng trường hợp hai request cùng lưu một từ đồng thời.
+    Các từ trùng nhau trong chính payload chỉ được lưu một lần (giữ bản đầu tiên), các lần lặp lại được trả về riêng.
+    Bộ đếm (counters) được cập nhật trong cùng transaction; hàm KHÔNG commit.
+
+    Args:
+        vocab_list (VocabularyList): List đích (đã có id, đã kiểm tra quyền sở hữu).
+        user_id (int): ID người dùng sở hữu các từ.
+        items (list): Các dict từ payload /save-list (original_word, word_type, definition_en, ...).
+
+    Returns:
+        tuple: (saved_words, existing_words, duplicate_words) — danh sách original_word đã lưu, bỏ qua vì đã có
+               trong list, và bỏ qua vì lặp lại trong chính payload.
+    """
+    added_at = datetime.utcnow()  # Cùng thời điểm cho cả lô; thứ tự trong list giữ theo id tăng dần
+    rows_by_key = {}
+    duplicate_words = []
+    for item in items:
+        original_word = (item.get('original_word') or '').strip()
+        normalized = normalize_word(original_word)[:200]
+        if not normalized:
+            continue
+        if normalized in rows_by_key:
+            duplicate_words.append(original_word)
+            continue
+        row = {'original_word': original_word, 'normalized_word': normalized,
+               'list_id': vocab_list.id, 'user_id': user_id, 'added_at': added_at}
+        for payload_field, column in ENTRY_FIELDS.items():
+            row[column] = item.get(payload_field)
+        rows_by_key[normalized] = row
+
+    # Các từ đã có trong list (tra theo unique index, không quét cả list)
+    existing_keys = set()
+    for keys in _chunks(list(rows_by_key)):
+        existing_keys.update(db.session.scalars(
+            select(VocabularyEntry.normalized_word).where(
+                VocabularyEntry.list_id == vocab_list.id,
+                VocabularyEntry.normalized_word.in_(keys))))
+
+    new_rows, existing_words = [], []
+    for key, row in rows_by_key.items():
+        if key in existing_keys:
+            existing_words.append(row['original_word'])
+        else:
+            new_rows.append(row)
+
+    inserted = 0
+    for chunk in _chunks(new_rows):
+        statement = sqlite_insert(VocabularyEntry).values(chunk).on_conflict_do_nothing(
+            index_elements=['list_id', 'normalized_word'])
+        inserted += db.session.execute(statement).rowcount
+
+    if inserted:
+        counters.entries_added(vocab_list.id, user_id, inserted)
+    return [row['original_word'] for row in new_rows], existing_words, duplicate_words
@@ -0,0 +1,84 @@
+# counters.py
+
+# --- Third-party Library Imports ---
+from sqlalchemy import update, select, func
+
+# --- Application-Specific Imports ---
+from models import db, User, VocabularyList, VocabularyEntry
+
+# Các bộ đếm phi chuẩn hóa: VocabularyList.entry_count, User.list_count, User.entry_count.
+#
+# Mỗi route thêm/xóa list hoặc từ gọi các hàm dưới đây TRƯỚC db.session.commit(), nên bộ đếm
+# được cập nhật trong cùng transaction với dữ liệu (rollback thì bộ đếm cũng được hoàn tác).
+# Bộ đếm được tăng/giảm ngay trong câu lệnh UPDATE (col = col + n) thay vì đọc-sửa-ghi trong Python,
+# nên hai request đồng thời không ghi đè kết quả của nhau.
+
+
+def _increment(model, row_id, **deltas):
+    """UPDATE <model> SET col = col + delta, ... WHERE id = row_id (bỏ qua các delta bằng 0)."""
+    values = {column: getattr(model, column) + delta for column, delta in deltas.items() if delta}
+    if row_id is None or not values:
+        return
+    db.session.execute(update(model).where(model.id == row_id).values(**values))
+
+
+def entries_added(list_id, user_id, count=1):
+    """Ghi nhận `count` VocabularyEntry mới được thêm vào list `list_id` của user `user_id`."""
+    _increment(VocabularyList, list_id, entry_count=count)
+    _increment(User, user_id, entry_count=count)
+
+
+def entries_removed(list_id, user_id, count=1):
+    """Ghi nhận `count` VocabularyEntry bị xóa khỏi list `list_id` của user `user_id`."""
+    entries_added(list_id, user_id, -count)
+
+
+def list_created(user_id):
+    """Ghi nhận một VocabularyList mới của user `user_id` (list mới có entry_count = 0)."""
+    _increment(User, user_id, list_count=1)
+
+
+def list_deleted(vocab_list):
+    """
+    Ghi nhận việc xóa một VocabularyList cùng các từ của nó (cascade).
+    Gọi TRƯỚC db.session.delete(vocab_list) để còn đọc được entry_count của list.
+    """
+    _increment(User, vocab_list.user_id, list_count=-1, entry_count=-vocab_list.entry_count)
+
+
+def reconcile_counters():
+    """
+    Tính lại toàn bộ bộ đếm bằng COUNT(*) (mỗi bảng một câu UPDATE) và commit.
+    Chỉ các dòng bị lệch mới được ghi lại.
+
+    Returns:
+        dict: Số dòng đã được sửa, theo bảng: {'vocabulary_list': n, 'user': m}.
+    """
+    list_entries = (select(func.count(VocabularyEntry.id))
+                    .where(VocabularyEntry.list_id == VocabularyList.id)
+                    .scalar_subquery())
+    user_lists = (select(func.count(VocabularyList.id))
+                  .where(VocabularyList.user_id == User.id)
+                  .scalar_subquery())
+    user_entries = (select(func.count(VocabularyEntry.id))
+                    .where(VocabularyEntry.user_id == User.id)
+                    .scalar_subquery())
+
+    try:
+        fixed_lists = db.session.execute(
+            update(VocabularyList)
+            .where(VocabularyList.entry_count != list_entries)
+            .values(entry_count=list_entries)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        fixed_users = db.session.execute(
+            update(User)
+            .where((User.list_count != user_lists) | (User.entry_count != user_entries))
+            .values(list_count=user_lists, entry_count=user_entries)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {'vocabulary_list': fixed_lists, 'user': fixed_users}
@@ -0,0 +1,66 @@
+# deadline.py
+
+# --- Standard Library Imports ---
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar  # Deadline của lời gọi hiện tại (riêng cho từng thread)
+
+# Deadline của request đang xử lý. EnrichmentEngine đặt nó trong mỗi thread worker (xem deadline_scope),
+# UpstreamClient đọc nó để rút ngắn timeout của từng lời gọi API theo thời gian còn lại.
+_current_deadline = ContextVar('deadline', default=None)
+MIN_TIMEOUT_SECONDS = 0.01  # requests/urllib3 không chấp nhận timeout bằng 0
+
+
+class DeadlineExceeded(Exception):
+    """Một lời gọi không được thực hiện (hoặc bị cắt ngang) vì request đã hết thời gian."""
+
+
+class Deadline:
+    """
+    Hạn chót (theo time.monotonic) cho toàn bộ một request, ví dụ một lần POST /enter-words.
+
+    Thay vì mỗi lời gọi API có timeout cố định riêng (15s, 10s, 45s...) khiến thời gian xử lý cả request
+    tăng theo số từ, mọi lời gọi trong request dùng chung một "ngân sách" thời gian: timeout của mỗi lời gọi
+    không vượt quá thời gian còn lại (xem clamp).
+    """
+
+    __slots__ = ('seconds', 'expires_at')
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        """Số giây còn lại (không âm)."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def clamp(self, timeout):
+        """
+        Rút ngắn timeout của requests (số giây hoặc tuple (connect, read)) để không vượt quá thời gian còn lại.
+        """
+        remaining = max(self.remaining(), MIN_TIMEOUT_SECONDS)
+        if isinstance(timeout, tuple):
+            return tuple(min(value, remaining) for value in timeout)
+        return min(timeout, remaining) if timeout is not None else remaining
+
+    def __repr__(self):
+        return f'<Deadline {self.remaining():.2f}s/{self.seconds}s>'
+
+
+def current_deadline():
+    """Deadline của request đang xử lý trong thread hiện tại, hoặc None nếu không giới hạn."""
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(deadline):
+    """Đặt `deadline` (có thể là None) làm deadline hiện tại trong khối with."""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
@@ -0,0 +1,247 @@
+# enrichment.py
+
+# --- Standard Library Imports ---
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait  # Pool thread dùng chung cho các lời gọi API bên ngoài
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+# --- Application-Specific Imports ---
+from deadline import Deadline, DeadlineExceeded, deadline_scope  # Ngân sách thời gian chung cho mọi lời gọi API của một request
+
+INCOMPLETE_KEY = 'incomplete'  # Đánh dấu kết quả thiếu phần nào đó vì hết deadline (cần bổ sung sau)
+
+
+def is_incomplete(result):
+    """True nếu kết quả của một từ (list các dict) được ghép khi còn lời gọi chưa xong lúc hết deadline."""
+    return any(item.get(INCOMPLETE_KEY) for item in result or [])
+
+
+class EnrichmentEngine:
+    """
+    Bộ máy "làm giàu" thông tin cho danh sách từ người dùng nhập ở /enter-words.
+
+    Thay vì xử lý tuần tự từng từ (và với mỗi từ lại chờ lần lượt dictionaryapi.dev,
+    Tatoeba rồi Google Translate), engine đẩy tất cả các lời gọi độc lập vào một pool
+    thread có giới hạn, sau đó ghép lại kết quả đúng theo thứ tự từ người dùng nhập.
+    Thời gian xử lý cả batch vì vậy chỉ phụ thuộc vào từ chậm nhất (khi pool đủ lớn),
+    thay vì tổng thời gian của tất cả các từ.
+
+    Các hàm tra cứu được truyền vào (dependency injection) để tránh import vòng tròn
+    với app.py, giống cách models.py tách `db` ra khỏi ứng dụng chính.
+    Mỗi hàm tra cứu nhận (word, user_id=...) và được chạy trong app context riêng
+    của thread worker, nên có thể dùng db.session để ghi APILog như bình thường.
+
+    Nếu có translate_batch, bản dịch của cả danh sách từ được gửi theo từng nhóm
+    (ENRICHMENT_TRANSLATE_BATCH_SIZE từ/nhóm) thay vì một request cho mỗi từ. Phần tử nào translate_batch
+    trả về None (batch không dịch được) được dịch lại bằng translate như các lời gọi riêng trong pool,
+    song song với nhau, thay vì tuần tự trong thread của batch.
+
+    Cả danh sách từ dùng chung một Deadline (ENRICHMENT_DEADLINE_SECONDS): mỗi lời gọi API trong thread worker
+    lấy thời gian còn lại làm timeout (xem deadline.py, UpstreamClient.request), và từ nào chưa xong khi hết
+    deadline được trả về với những gì đã có, đánh dấu INCOMPLETE_KEY. Thời gian xử lý cả request vì vậy
+    không vượt quá ENRICHMENT_DEADLINE_SECONDS, dù danh sách dài bao nhiêu.
+    """
+
+    def __init__(self, dictionary_lookup, example_lookup, translate, build_result, translate_batch=None, app=None):
+        self.dictionary_lookup = dictionary_lookup  # Lấy định nghĩa + IPA (dictionaryapi.dev)
+        self.example_lookup = example_lookup  # Lấy câu ví dụ + bản dịch (Tatoeba)
+        self.translate = translate  # Dịch nghĩa của từ sang tiếng Việt
+        self.build_result = build_result  # Ghép 3 kết quả trên thành dữ liệu hiển thị cho một từ
+        self.translate_batch = translate_batch  # (tùy chọn) Dịch nhiều từ trong một request, trả về list cùng thứ tự
+        self.translate_batch_size = 25
+        self.deadline_seconds = None
+        self.app = None
+        self.executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Liên kết engine với ứng dụng Flask và khởi tạo pool thread.
+        Số worker tối đa đọc từ app.config['ENRICHMENT_MAX_WORKERS'] (mặc định 12).
+        Thời gian xử lý tối đa của một danh sách từ đọc từ app.config['ENRICHMENT_DEADLINE_SECONDS']
+        (mặc định 10 giây; None hoặc 0 để không giới hạn).
+        """
+        self.app = app
+        max_workers = app.config.setdefault('ENRICHMENT_MAX_WORKERS', 12)
+        self.translate_batch_size = app.config.setdefault('ENRICHMENT_TRANSLATE_BATCH_SIZE', 25)
+        self.deadline_seconds = app.config.setdefault('ENRICHMENT_DEADLINE_SECONDS', 10)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='enrichment')
+        app.extensions['enrichment'] = self
+
+    def new_deadline(self):
+        """Deadline mới cho một danh sách từ, hoặc None nếu không giới hạn thời gian."""
+        return Deadline(self.deadline_seconds) if self.deadline_seconds else None
+
+    def _call_in_app_context(self, deadline, func, *args, **kwargs):
+        """Chạy func trong một app context mới (mỗi thread worker có db.session riêng), với deadline của request."""
+        with self.app.app_context(), deadline_scope(deadline):
+            return func(*args, **kwargs)
+
+    def submit(self, func, *args, deadline=None, **kwargs):
+        """Đưa một lời gọi vào pool, trả về Future. Các lời gọi API bên trong func tuân theo `deadline`."""
+        return self.executor.submit(self._call_in_app_context, deadline, func, *args, **kwargs)
+
+    def submit_word(self, word, user_id=None, translation_future=None, deadline=None):
+        """
+        Gửi đồng thời 3 lời gọi độc lập cho một từ.
+        Bản dịch được gọi "đón đầu" song song với dictionary API; build_result sẽ quyết định
+        có dùng bản dịch hay không dựa trên định nghĩa tiếng Anh nhận được.
+        Nếu translation_future được truyền vào (bản dịch lấy theo batch), không gửi lời gọi dịch riêng.
+        """
+        if translation_future is None:
+            translation_future = self.submit(self.translate, word, user_id=user_id, deadline=deadline)
+        return (
+            self.submit(self.dictionary_lookup, word, user_id=user_id, deadline=deadline),
+            self.submit(self.example_lookup, word, user_id=user_id, deadline=deadline),
+            translation_future,
+        )
+
+    def submit_translation_batches(self, words, user_id=None, deadline=None):
+        """
+        Gửi bản dịch của tất cả các từ theo từng nhóm và trả về một Future cho MỖI từ
+        (cùng thứ tự với words), để phần còn lại của engine xử lý như khi dịch từng từ.
+        """
+        def translate_one(word):
+            return self.submit(self.translate, word, user_id=user_id, deadline=deadline)
+
+        translation_futures = []
+        for start in range(0, len(words), self.translate_batch_size):
+            chunk = words[start:start + self.translate_batch_size]
+            chunk_future = self.submit(self.translate_batch, chunk, user_id=user_id, deadline=deadline)
+            translation_futures.extend(self._split_batch_future(chunk_future, chunk, translate_one))
+        return translation_futures
+
+    @staticmethod
+    def _split_batch_future(chunk_future, chunk, translate_one):
+        """
+        Tách Future của một batch (trả về list) thành một Future cho từng phần tử của chunk theo vị trí.
+        Phần tử có kết quả None được chuyển sang Future của translate_one(word) (một lời gọi riêng trong pool).
+        """
+        item_futures = [Future() for _ in chunk]
+
+        def forward(source_future, item_future):
+            try:
+                item_future.set_result(source_future.result())
+            except Exception as e:
+                item_future.set_exception(e)
+
+        def distribute(done_future):
+            try:
+                results = done_future.result()
+                if len(results) != len(chunk):
+                    raise ValueError(f"translate_batch trả về {len(results)} kết quả cho {len(chunk)} phần tử")
+            except Exception as e:
+                for item_future in item_futures:
+                    item_future.set_exception(e)
+                return
+            for word, item_future, result in zip(chunk, item_futures, results):
+                if result is None:
+                    translate_one(word).add_done_callback(
+                        lambda source_future, item_future=item_future: forward(source_future, item_future))
+                else:
+                    item_future.set_result(result)
+
+        chunk_future.add_done_callback(distribute)
+        return item_futures
+
+    def submit_words(self, words, user_id=None, deadline=None):
+        """Gửi các lời gọi cho toàn bộ danh sách từ, trả về list các tuple 3 Future theo thứ tự words."""
+        if self.translate_batch is not None:
+            translation_futures = self.submit_translation_batches(words, user_id=user_id, deadline=deadline)
+        else:
+            translation_futures = [None] * len(words)
+        return [self.submit_word(word, user_id=user_id, translation_future=translation_future, deadline=deadline)
+                for word, translation_future in zip(words, translation_futures)]
+
+    def collect_word(self, word, futures, deadline=None):
+        """
+        Chờ 3 Future của một từ (không quá `deadline`) và ghép thành kết quả.
+        Lời gọi nào chưa xong khi hết deadline (hoặc bị cắt vì deadline - DeadlineExceeded) được thay bằng
+        giá trị "không tìm thấy" như khi API lỗi, và kết quả được đánh dấu INCOMPLETE_KEY.
+        """
+        _, not_done = wait(futures, timeout=deadline.remaining() if deadline is not None else None)
+        dictionary_future, example_future, translation_future = futures
+        missing = []
+
+        def result_or(future, fallback):
+            if future in not_done:
+                missing.append(future)
+                return fallback
+            try:
+                return future.result()
+            except DeadlineExceeded:
+                missing.append(future)
+                return fallback
+
+        result = self.build_result(
+            word,
+            result_or(dictionary_future, []),
+            result_or(example_future, None),
+            result_or(translation_future, word),
+        )
+        if missing:
+            for item in result:
+                item[INCOMPLETE_KEY] = True
+        return result
+
+    def enrich_words(self, words, user_id=None, deadline=None):
+        """
+        Xử lý toàn bộ danh sách từ và trả về dict {word: [result]} theo đúng thứ tự đầu vào.
+
+        Args:
+            words (list): Danh sách từ tiếng Anh (đã strip). Từ trùng lặp chỉ được tra cứu một lần.
+            user_id (int, optional): ID người dùng để ghi vào APILog.
+            deadline (Deadline, optional): Mặc định là new_deadline().
+
+        Returns:
+            dict: Giống cấu trúc processed_results_dict cũ của enter_words_page; từ chưa xong khi hết deadline
+                  có kết quả một phần (xem is_incomplete).
+        """
+        unique_words = list(dict.fromkeys(words))  # Loại bỏ từ trùng nhưng giữ nguyên thứ tự
+        if deadline is None:
+            deadline = self.new_deadline()
+
+        # 1. Fan-out: đưa tất cả lời gọi của tất cả các từ vào pool ngay lập tức
+        pending = list(zip(unique_words, self.submit_words(unique_words, user_id=user_id, deadline=deadline)))
+
+        # 2. Fan-in: ghép kết quả theo thứ tự đầu vào
+        processed_results = {}
+        for word, futures in pending:
+            processed_results[word] = self.collect_word(word, futures, deadline=deadline)
+        return processed_results
+
+    def iter_completed(self, words, user_id=None, deadline=None):
+        """
+        Giống enrich_words nhưng trả về kết quả của từng từ NGAY KHI từ đó xong (không theo thứ tự).
+        Dùng cho các job chạy nền cần lưu/stream kết quả từng phần.
+        Khi hết deadline, các từ còn lại được trả về ngay với kết quả một phần (xem is_incomplete).
+
+        Yields:
+            tuple: (position, word, result) với position là vị trí của từ trong danh sách đã loại trùng.
+        """
+        unique_words = list(dict.fromkeys(words))
+        if deadline is None:
+            deadline = self.new_deadline()
+        futures_by_position = self.submit_words(unique_words, user_id=user_id, deadline=deadline)
+
+        position_of_future = {}
+        remaining_calls = {}
+        for position, futures in enumerate(futures_by_position):
+            remaining_calls[position] = len(futures)
+            for future in futures:
+                position_of_future[future] = position
+
+        try:
+            for future in as_completed(position_of_future,
+                                       timeout=deadline.remaining() if deadline is not None else None):
+                position = position_of_future[future]
+                remaining_calls[position] -= 1
+                if remaining_calls[position] == 0:  # Cả 3 lời gọi của từ này đã xong
+                    word = unique_words[position]
+                    yield position, word, self.collect_word(word, futures_by_position[position])
+        except FuturesTimeoutError:
+            # Hết deadline: trả về ngay những gì đã có cho các từ còn lại
+            for position, calls_left in remaining_calls.items():
+                if calls_left > 0:
+                    word = unique_words[position]
+                    yield position, word, self.collect_word(word, futures_by_position[position], deadline=deadline)
@@ -0,0 +1,218 @@
+# enrichment_jobs.py
+
+# --- Standard Library Imports ---
+import json  # Lưu kết quả từng từ dưới dạng JSON
+import threading
+import time
+import uuid  # Sinh ID cho job
+from concurrent.futures import ThreadPoolExecutor  # Pool thread chạy các job nền
+from datetime import datetime, timedelta
+
+# --- Third-party Library Imports ---
+from sqlalchemy import select, update, delete, and_, or_, func
+
+# --- Application-Specific Imports ---
+from enrichment import is_incomplete
+from models import db, EnrichmentJob, EnrichmentJobItem
+
+RUNNING_STATUSES = ('running', 'partial')
+FINISHED_STATUSES = ('done', 'failed')
+DEFAULT_RETENTION_HOURS = 24
+DEFAULT_STALE_MINUTES = 15  # Một job bình thường chạy xong trong khoảng 2 lần ENRICHMENT_DEADLINE_SECONDS
+DEFAULT_QUEUED_STALE_MINUTES = 60  # Job có thể phải chờ lâu trong hàng đợi khi nhiều người cùng gửi
+DEFAULT_SWEEP_INTERVAL_SECONDS = 3600
+
+
+class EnrichmentJobRunner:
+    """
+    Chạy việc enrich danh sách từ ở background thay vì giữ request POST /enter-words
+    cho đến khi xong cả batch.
+
+    - enqueue() tạo một EnrichmentJob và trả về ngay lập tức.
+    - Worker nền dùng EnrichmentEngine.iter_completed() và lưu kết quả từng từ
+      vào EnrichmentJobItem ngay khi từ đó xong.
+    - Trang /enter-words polling các kết quả mới (theo id tăng dần của item) để hiển thị dần.
+    - Lượt xử lý đầu tiên dừng ở deadline của engine (ENRICHMENT_DEADLINE_SECONDS). Nếu có từ chưa đầy đủ,
+      job chuyển sang 'partial' (người dùng đã có thể lưu) và chạy thêm một lượt với deadline mới cho các từ đó;
+      kết quả mới được lưu thành item mới cùng position, thay thế kết quả cũ trên trang.
+
+    Kết quả được lưu trong database nên endpoint polling hoạt động đúng
+    kể cả khi có nhiều process phục vụ request. Job (và các item) đã xong được xóa sau một thời gian,
+    job bị bỏ dở (process bị dừng khi đang chạy) được đánh dấu 'failed', xem sweep().
+    """
+
+    def __init__(self, engine, app=None):
+        self.engine = engine  # EnrichmentEngine dùng để xử lý từng từ
+        self.app = None
+        self.executor = None
+        self.retention_hours = DEFAULT_RETENTION_HOURS
+        self.stale_minutes = DEFAULT_STALE_MINUTES
+        self.queued_stale_minutes = DEFAULT_QUEUED_STALE_MINUTES
+        self.sweep_interval = DEFAULT_SWEEP_INTERVAL_SECONDS
+        self._last_sweep = None
+        self._sweep_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Khởi tạo pool thread chạy job. Cấu hình:
+          - ENRICHMENT_JOB_WORKERS: số job chạy đồng thời tối đa (mặc định 4).
+          - ENRICHMENT_JOB_RETENTION_HOURS: số giờ giữ job đã xong (và kết quả của nó) trước khi xóa (mặc định 24).
+          - ENRICHMENT_JOB_STALE_MINUTES: job đã bắt đầu chạy nhưng chưa xong sau chừng ấy phút được coi là
+            bị bỏ dở (mặc định 15).
+          - ENRICHMENT_JOB_QUEUED_STALE_MINUTES: như trên cho job vẫn còn trong hàng đợi, tính từ lúc tạo (mặc định 60).
+          - ENRICHMENT_JOB_SWEEP_INTERVAL_SECONDS: chu kỳ dọn job, chạy trong thread nền sau một request
+            (mặc định 3600, lần đầu ngay sau request đầu tiên; 0 để chỉ dọn bằng `flask sweep-enrichment-jobs`).
+        """
+        self.app = app
+        max_workers = app.config.setdefault('ENRICHMENT_JOB_WORKERS', 4)
+        self.retention_hours = app.config.setdefault('ENRICHMENT_JOB_RETENTION_HOURS', DEFAULT_RETENTION_HOURS)
+        self.stale_minutes = app.config.setdefault('ENRICHMENT_JOB_STALE_MINUTES', DEFAULT_STALE_MINUTES)
+        self.queued_stale_minutes = app.config.setdefault('ENRICHMENT_JOB_QUEUED_STALE_MINUTES',
+                                                          DEFAULT_QUEUED_STALE_MINUTES)
+        self.sweep_interval = app.config.setdefault('ENRICHMENT_JOB_SWEEP_INTERVAL_SECONDS',
+                                                    DEFAULT_SWEEP_INTERVAL_SECONDS)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='enrichment-job')
+        app.extensions['enrichment_jobs'] = self
+        app.after_request(self._maybe_sweep_in_background)
+
+    def enqueue(self, words, user_id):
+        """
+        Tạo một job mới cho danh sách từ và đưa vào hàng đợi.
+
+        Args:
+            words (list): Danh sách từ (đã loại trùng, giữ thứ tự).
+            user_id (int): ID người dùng sở hữu job.
+
+        Returns:
+            EnrichmentJob: Job vừa tạo (trạng thái 'queued').
+        """
+        job = EnrichmentJob(id=str(uuid.uuid4()), user_id=user_id, status='queued', total_words=len(words))
+        db.session.add(job)
+        db.session.commit()
+        self.executor.submit(self._run_job, job.id, list(words), user_id)
+        return job
+
+    def _run_job(self, job_id, words, user_id):
+        """Chạy trong thread nền: xử lý các từ và lưu kết quả từng phần."""
+        with self.app.app_context():
+            # Nhận job khỏi hàng đợi; bỏ qua nếu job không còn 'queued' (ví dụ sweep() đã đánh dấu 'failed')
+            claimed = db.session.execute(
+                update(EnrichmentJob)
+                .where(EnrichmentJob.id == job_id, EnrichmentJob.status == 'queued')
+                .values(status='running', started_at=datetime.utcnow())
+            ).rowcount
+            db.session.commit()
+            if not claimed:
+                return
+            job = db.session.get(EnrichmentJob, job_id)
+
+            try:
+                incomplete_positions = []
+                for position, word, result in self.engine.iter_completed(words, user_id=user_id):
+                    self._save_item(job_id, position, word, result)
+                    job.completed_words += 1
+                    db.session.commit()
+                    if is_incomplete(result):
+                        incomplete_positions.append(position)
+
+                if incomplete_positions:
+                    # Bổ sung các từ chưa đầy đủ (hết deadline) trong một lượt mới
+                    job.status = 'partial'
+                    db.session.commit()
+                    retry_words = [words[position] for position in incomplete_positions]
+                    for retry_index, word, result in self.engine.iter_completed(retry_words, user_id=user_id):
+                        self._save_item(job_id, incomplete_positions[retry_index], word, result)
+                        db.session.commit()
+                db.session.refresh(job)
+                if job.status == 'failed':
+                    return  # sweep() đã coi job là bị bỏ dở và người dùng đã thấy 'failed': không đổi lại
+                job.status = 'done'
+            except Exception as e:
+                db.session.rollback()
+                job = db.session.get(EnrichmentJob, job_id)
+                job.status = 'failed'
+                job.error_message = str(e)[:500]
+                print(f"Lỗi khi chạy enrichment job {job_id}: {e}")
+
+            job.finished_at = datetime.utcnow()
+            try:
+                db.session.commit()
+            except Exception as db_e:
+                db.session.rollback()
+                print(f"CRITICAL ERROR: Không thể cập nhật trạng thái enrichment job {job_id}: {db_e}")
+
+    @staticmethod
+    def _save_item(job_id, position, word, result):
+        db.session.add(EnrichmentJobItem(job_id=job_id, position=position, word=word,
+                                         result=json.dumps(result, ensure_ascii=False)))
+
+    def get_job(self, job_id, user_id):
+        """Lấy job theo ID, chỉ khi job thuộc về user_id. Trả về None nếu không tìm thấy."""
+        return EnrichmentJob.query.filter_by(id=job_id, user_id=user_id).first()
+
+    def get_items_after(self, job_id, after_item_id=0):
+        """Lấy các kết quả mới hơn con trỏ after_item_id, theo thứ tự hoàn thành."""
+        return EnrichmentJobItem.query.filter(
+            EnrichmentJobItem.job_id == job_id,
+            EnrichmentJobItem.id > after_item_id
+        ).order_by(EnrichmentJobItem.id.asc()).all()
+
+    # --- Dọn job cũ ---
+
+    def sweep(self, now=None):
+        """
+        Đánh dấu 'failed' các job bị bỏ dở (thread chạy job đã mất, ví dụ process khởi động lại): job đang chạy
+        quá ENRICHMENT_JOB_STALE_MINUTES phút kể từ khi bắt đầu, hoặc còn trong hàng đợi quá
+        ENRICHMENT_JOB_QUEUED_STALE_MINUTES phút kể từ khi tạo. Sau đó xóa các job đã xong trước ENRICHMENT_JOB_RETENTION_HOURS giờ cùng các item
+        của chúng. Cần app context.
+
+        Returns:
+            dict: {stale: số job bị đánh dấu 'failed', deleted: số job đã xóa}.
+        """
+        now = now or datetime.utcnow()
+        try:
+            stale = db.session.execute(
+                update(EnrichmentJob)
+                .where(EnrichmentJob.finished_at.is_(None), or_(
+                    and_(EnrichmentJob.status == 'queued',
+                         EnrichmentJob.created_at < now - timedelta(minutes=self.queued_stale_minutes)),
+                    and_(EnrichmentJob.status.in_(RUNNING_STATUSES),
+                         # Job tạo trước khi có cột started_at: tính từ lúc tạo
+                         func.coalesce(EnrichmentJob.started_at, EnrichmentJob.created_at)
+                         < now - timedelta(minutes=self.stale_minutes)),
+                ))
+                .values(status='failed', error_message="Job was interrupted before it finished.", finished_at=now)
+            ).rowcount
+
+            expired_jobs = select(EnrichmentJob.id).where(
+                EnrichmentJob.finished_at < now - timedelta(hours=self.retention_hours),
+                EnrichmentJob.status.in_(FINISHED_STATUSES))
+            db.session.execute(delete(EnrichmentJobItem).where(EnrichmentJobItem.job_id.in_(expired_jobs)))
+            deleted = db.session.execute(
+                delete(EnrichmentJob).where(EnrichmentJob.id.in_(expired_jobs))).rowcount
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return {'stale': stale, 'deleted': deleted}
+
+    def _maybe_sweep_in_background(self, response):
+        """after_request: chạy sweep() trong thread nền, mỗi process tối đa một lần mỗi sweep_interval giây."""
+        if not self.sweep_interval or (self._last_sweep is not None
+                                       and time.monotonic() - self._last_sweep < self.sweep_interval):
+            return response
+        if self._sweep_lock.acquire(blocking=False):
+            self._last_sweep = time.monotonic()
+            threading.Thread(target=self._sweep_in_app_context, name='enrichment-job-sweeper', daemon=True).start()
+        return response
+
+    def _sweep_in_app_context(self):
+        try:
+            with self.app.app_context():
+                self.sweep()
+        except Exception as e:
+            print(f"ERROR: Dọn enrichment job thất bại: {e}")
+        finally:
+            self._sweep_lock.release()
@@ -0,0 +1,75 @@
+# keyset.py
+
+# --- Standard Library Imports ---
+import base64  # Cursor được mã hóa base64 (an toàn trong URL) để client coi như chuỗi "mờ"
+import json
+from datetime import datetime
+
+# --- Third-party Library Imports ---
+from sqlalchemy import tuple_
+
+# Phân trang kiểu keyset (seek): thay vì OFFSET (phải đọc lại và bỏ qua mọi dòng của các trang trước),
+# mỗi trang bắt đầu NGAY SAU dòng cuối của trang trước theo bộ khóa sắp xếp, ví dụ (added_at, id).
+# Với index phù hợp (vd. vocabulary_entry(list_id, added_at), id là rowid), mỗi trang chỉ đọc `limit` dòng
+# dù đang ở trang thứ bao nhiêu, và không bị lặp/mất dòng khi có dữ liệu mới được thêm vào giữa chừng.
+
+
+def encode_cursor(values):
+    """Mã hóa giá trị các cột khóa của dòng cuối trang thành cursor (chuỗi base64 an toàn trong URL)."""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, columns):
+    """
+    Giải mã cursor thành tuple giá trị theo kiểu Python của từng cột.
+
+    Raises:
+        ValueError: Nếu cursor không hợp lệ (bị sửa, cắt cụt, hoặc không khớp số cột).
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if not isinstance(payload, list) or len(payload) != len(columns):
+            raise ValueError("số giá trị không khớp với số cột")
+        values = []
+        for column, value in zip(columns, payload):
+            if value is not None and column.type.python_type is datetime:
+                value = datetime.fromisoformat(value)
+            values.append(value)
+        return tuple(values)
+    except ValueError:
+        raise
+    except Exception as e:  # binascii.Error, UnicodeError, TypeError...
+        raise ValueError(f"cursor không hợp lệ: {e}") from e
+
+
+def keyset_page(query, columns, after=None, limit=50, descending=False):
+    """
+    Lấy một trang của `query` theo keyset `columns` (cột cuối phải là khóa duy nhất, thường là id).
+
+    Args:
+        query: Query SQLAlchemy đã lọc (chưa order_by/limit).
+        columns (list): Các cột khóa sắp xếp, ví dụ [VocabularyEntry.added_at, VocabularyEntry.id].
+        after (str, optional): Cursor trả về từ trang trước; None để lấy trang đầu.
+        limit (int): Số dòng tối đa của trang.
+        descending (bool): True để đi từ mới đến cũ.
+
+    Returns:
+        tuple: (items, next_cursor); next_cursor là None nếu đây là trang cuối.
+
+    Raises:
+        ValueError: Nếu `after` không hợp lệ.
+    """
+    if after:
+        key = tuple_(*columns)
+        values = tuple_(*decode_cursor(after, columns))
+        query = query.filter(key < values if descending else key > values)
+    query = query.order_by(*[column.desc() if descending else column.asc() for column in columns])
+
+    # Lấy dư một dòng để biết còn trang sau hay không mà không cần COUNT(*)
+    items = query.limit(limit + 1).all()
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    last = items[-1]
+    return items, encode_cursor([getattr(last, column.key) for column in columns])
@@ -0,0 +1,162 @@
+# latency_histogram.py
+
+# --- Standard Library Imports ---
+import bisect  # Tìm khoảng (bucket) của một duration trong danh sách cận trên đã sắp xếp
+from datetime import datetime, timedelta
+
+# --- Third-party Library Imports ---
+from sqlalchemy import select, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert  # INSERT ... ON CONFLICT DO UPDATE (app dùng SQLite)
+
+# --- Application-Specific Imports ---
+from models import db, APILatencyBucket
+
+# Histogram thời gian gọi API (bảng api_latency_bucket): mỗi dòng là số lời gọi của một API trong một phút
+# có duration_ms thuộc khoảng (cận trên của bucket trước, le_ms]. Các cận tăng gần theo cấp số nhân nên
+# sai số tương đối của percentile gần như không đổi (khoảng +/- 15-25%), dù lời gọi mất 20ms hay 20s.
+BUCKET_BOUNDS_MS = (
+    5, 10, 20, 35, 50, 75, 100, 150, 200, 300, 400, 500, 750, 1000, 1500, 2000, 3000,
+    4000, 5000, 7500, 10000, 15000, 20000, 30000, 45000, 60000,
+)
+OVERFLOW_LE_MS = 2 ** 31 - 1  # Bucket cuối cho các lời gọi lâu hơn BUCKET_BOUNDS_MS[-1]
+
+PERCENTILES = (50, 95, 99)
+
+# Các khoảng thời gian chọn được trên /admin/api-logs: khóa -> (nhãn, độ dài)
+WINDOWS = {
+    '15m': ('Last 15 minutes', timedelta(minutes=15)),
+    '1h': ('Last hour', timedelta(hours=1)),
+    '24h': ('Last 24 hours', timedelta(hours=24)),
+    '7d': ('Last 7 days', timedelta(days=7)),
+}
+DEFAULT_WINDOW = '1h'
+
+
+def bucket_le_ms(duration_ms):
+    """Cận trên (le_ms) của bucket chứa `duration_ms`."""
+    index = bisect.bisect_left(BUCKET_BOUNDS_MS, duration_ms)
+    return BUCKET_BOUNDS_MS[index] if index < len(BUCKET_BOUNDS_MS) else OVERFLOW_LE_MS
+
+
+def bucket_lower_ms(le_ms):
+    """Cận dưới (không tính) của bucket có cận trên `le_ms`."""
+    if le_ms == OVERFLOW_LE_MS:
+        return BUCKET_BOUNDS_MS[-1]
+    index = BUCKET_BOUNDS_MS.index(le_ms)
+    return BUCKET_BOUNDS_MS[index - 1] if index > 0 else 0
+
+
+def bucket_start(timestamp):
+    """Đầu phút chứa `timestamp`."""
+    return timestamp.replace(second=0, microsecond=0)
+
+
+def aggregate_rows(rows):
+    """
+    Gộp các dòng APILog (dict, như APILogWriter đưa vào hàng đợi) thành các dòng api_latency_bucket.
+    Log không có duration_ms (lời gọi không đo được thời gian) bị bỏ qua.
+
+    Returns:
+        list: Các dict {bucket_start, api_name, le_ms, count, duration_sum_ms, response_bytes_sum}.
+    """
+    buckets = {}
+    for row in rows:
+        duration_ms = row.get('duration_ms')
+        if duration_ms is None:
+            continue
+        key = (bucket_start(row['timestamp']), row['api_name'], bucket_le_ms(duration_ms))
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = {'bucket_start': key[0], 'api_name': key[1], 'le_ms': key[2],
+                                     'count': 0, 'duration_sum_ms': 0, 'response_bytes_sum': 0}
+        bucket['count'] += 1
+        bucket['duration_sum_ms'] += duration_ms
+        bucket['response_bytes_sum'] += row.get('response_bytes') or 0
+    return list(buckets.values())
+
+
+def record_rows(rows):
+    """
+    Cộng các dòng APILog vào histogram trong transaction hiện tại của db.session (không commit).
+    Gọi từ APILogWriter ngay sau khi insert chính các dòng đó, nên histogram và api_log luôn khớp nhau.
+    """
+    buckets = aggregate_rows(rows)
+    if not buckets:
+        return
+    statement = sqlite_insert(APILatencyBucket.__table__).values(buckets)
+    excluded = statement.excluded
+    table = APILatencyBucket.__table__
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['bucket_start', 'api_name', 'le_ms'],
+        set_={'count': table.c.count + excluded.count,
+              'duration_sum_ms': table.c.duration_sum_ms + excluded.duration_sum_ms,
+              'response_bytes_sum': table.c.response_bytes_sum + excluded.response_bytes_sum}))
+
+
+def estimate_percentile(histogram, total, percentile):
+    """
+    Ước lượng percentile từ histogram [(le_ms, count)] đã sắp xếp theo le_ms, bằng nội suy tuyến tính
+    trong bucket chứa thứ hạng cần tìm. Với bucket tràn (OVERFLOW_LE_MS), trả về cận dưới của nó.
+    """
+    rank = percentile / 100.0 * total
+    seen = 0
+    for le_ms, count in histogram:
+        if count and seen + count >= rank:
+            lower = bucket_lower_ms(le_ms)
+            if le_ms == OVERFLOW_LE_MS:
+                return lower
+            return round(lower + (le_ms - lower) * (rank - seen) / count)
+        seen += count
+    return histogram[-1][0] if histogram else 0
+
+
+def get_latency_stats(window=DEFAULT_WINDOW, now=None):
+    """
+    p50/p95/p99, thời gian trung bình và kích thước response trung bình của từng API trong khoảng `window`,
+    tính từ bảng api_latency_bucket (không đọc bảng api_log).
+
+    Returns:
+        list: Mỗi API một dict {api_name, calls, avg_ms, p50_ms, p95_ms, p99_ms, slowest_bucket,
+              avg_response_bytes, histogram: [(le_ms, count)]}, sắp xếp theo api_name.
+    """
+    _, length = WINDOWS.get(window, WINDOWS[DEFAULT_WINDOW])
+    since = bucket_start((now or datetime.utcnow()) - length)
+
+    rows = db.session.execute(
+        select(APILatencyBucket.api_name, APILatencyBucket.le_ms,
+               func.sum(APILatencyBucket.count).label('count'),
+               func.sum(APILatencyBucket.duration_sum_ms).label('duration_sum_ms'),
+               func.sum(APILatencyBucket.response_bytes_sum).label('response_bytes_sum'))
+        .where(APILatencyBucket.bucket_start >= since)
+        .group_by(APILatencyBucket.api_name, APILatencyBucket.le_ms)
+        .order_by(APILatencyBucket.api_name, APILatencyBucket.le_ms)
+    ).all()
+
+    per_api = {}
+    for row in rows:
+        api_stats = per_api.setdefault(row.api_name, {'histogram': [], 'calls': 0, 'duration_sum_ms': 0,
+                                                      'response_bytes_sum': 0})
+        api_stats['histogram'].append((row.le_ms, row.count))
+        api_stats['calls'] += row.count
+        api_stats['duration_sum_ms'] += row.duration_sum_ms
+        api_stats['response_bytes_sum'] += row.response_bytes_sum
+
+    stats = []
+    for api_name, api_stats in sorted(per_api.items()):
+        calls = api_stats['calls']
+        if not calls:
+            continue
+        slowest_le_ms = max(le_ms for le_ms, count in api_stats['histogram'] if count)
+        entry = {
+            'api_name': api_name,
+            'calls': calls,
+            'avg_ms': round(api_stats['duration_sum_ms'] / calls),
+            'avg_response_bytes': round(api_stats['response_bytes_sum'] / calls),
+            'slowest_bucket': (f"> {BUCKET_BOUNDS_MS[-1]} ms" if slowest_le_ms == OVERFLOW_LE_MS
+                               else f"<= {slowest_le_ms} ms"),
+            'histogram': api_stats['histogram'],
+        }
+        for percentile in PERCENTILES:
+            entry[f'p{percentile}_ms'] = estimate_percentile(api_stats['histogram'], calls, percentile)
+        stats.append(entry)
+    return stats
@@ -0,0 +1,245 @@
+# local_dictionary.py
+
+# --- Standard Library Imports ---
+import gzip  # Các bản dump từ điển thường được nén .gz
+import json
+import threading
+
+# --- Third-party Library Imports ---
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert  # INSERT ... ON CONFLICT (app dùng SQLite)
+
+# --- Application-Specific Imports ---
+from models import db, DictionaryEntry, normalize_word
+
+# Từ điển offline: thay vì gọi dictionaryapi.dev cho mỗi từ, các trường mà app cần (loại từ, định nghĩa đầu tiên
+# có ví dụ, IPA đầu tiên) được trích sẵn từ một bản dump và lưu mỗi từ một dòng trong bảng dictionary_entry
+# (khóa chính = từ đã chuẩn hóa). Tra một từ là một lần đọc theo khóa chính, không cần mạng.
+#
+# Định dạng dump được hỗ trợ (JSON Lines, có thể nén .gz), tự nhận dạng theo từng dòng:
+#   - dictionaryapi.dev: {"word", "phonetics": [{"text"}], "meanings": [{"partOfSpeech", "definitions": [...]}]}
+#   - Wiktionary (kaikki.org): {"word", "lang_code", "pos", "sounds": [{"ipa"}], "senses": [{"glosses", "examples"}]}
+#   - Dạng phẳng kiểu WordNet: {"word", "pos", "definition", "example", "ipa"}
+
+IMPORT_BATCH_SIZE = 1000  # Số dòng trong một câu INSERT nhiều dòng (5 cột x 1000 < giới hạn tham số của SQLite)
+
+
+def parse_dictionaryapi_entry(entry):
+    """
+    Trích loại từ, định nghĩa, câu ví dụ và IPA từ một phần tử response của dictionaryapi.dev.
+
+    Trong nhóm nghĩa (meaning) đầu tiên có định nghĩa, ưu tiên định nghĩa đầu tiên có kèm câu ví dụ,
+    nếu không có thì lấy định nghĩa đầu tiên. Nếu không có định nghĩa nào nhưng có IPA thì vẫn trả về IPA.
+
+    Returns:
+        dict | None: {"type", "definition_en", "example_en", "ipa"} (giá trị thiếu là "N/A"), hoặc None.
+    """
+    # Phiên âm IPA: lấy trường 'text' đầu tiên có trong 'phonetics'
+    ipa_text = "N/A"
+    for phonetic_item in entry.get("phonetics") or []:
+        if phonetic_item.get("text"):
+            ipa_text = phonetic_item["text"]
+            break
+
+    for meaning_obj in entry.get("meanings") or []:  # Một từ có thể có nhiều nhóm nghĩa (noun, verb...)
+        part_of_speech = meaning_obj.get("partOfSpeech", "N/A")
+        first_definition_without_example = None
+        for definition_obj in meaning_obj.get("definitions") or []:
+            definition_en = definition_obj.get("definition")
+            if not definition_en:
+                continue
+            example_en = definition_obj.get("example")
+            details = {"type": part_of_speech, "definition_en": definition_en,
+                       "example_en": example_en or "N/A", "ipa": ipa_text}
+            if example_en:
+                return details  # Định nghĩa có ví dụ được ưu tiên
+            if not first_definition_without_example:
+                first_definition_without_example = details
+        if first_definition_without_example:
+            return first_definition_without_example
+
+    if ipa_text != "N/A":  # Không có định nghĩa hợp lệ nhưng vẫn có IPA
+        return {"type": "N/A", "definition_en": "No definition found.", "example_en": "N/A", "ipa": ipa_text}
+    return None
+
+
+def parse_wiktionary_entry(record):
+    """Như parse_dictionaryapi_entry, cho một dòng dump Wiktionary của kaikki.org (một loại từ mỗi dòng)."""
+    ipa_text = next((sound["ipa"] for sound in record.get("sounds") or [] if sound.get("ipa")), "N/A")
+    first_definition_without_example = None
+    for sense in record.get("senses") or []:
+        glosses = sense.get("glosses") or sense.get("raw_glosses")
+        if not glosses:
+            continue
+        example_en = next((example["text"] for example in sense.get("examples") or [] if example.get("text")), None)
+        details = {"type": record.get("pos") or "N/A", "definition_en": glosses[0],
+                   "example_en": example_en or "N/A", "ipa": ipa_text}
+        if example_en:
+            return details
+        if not first_definition_without_example:
+            first_definition_without_example = details
+    if first_definition_without_example:
+        return first_definition_without_example
+    if ipa_text != "N/A":
+        return {"type": "N/A", "definition_en": "No definition found.", "example_en": "N/A", "ipa": ipa_text}
+    return None
+
+
+def parse_flat_entry(record):
+    """Dạng phẳng kiểu WordNet: {"word", "pos"/"type", "definition", "example", "ipa"}."""
+    if not record.get("definition") and not record.get("ipa"):
+        return None
+    return {"type": record.get("pos") or record.get("type") or "N/A",
+            "definition_en": record.get("definition") or "No definition found.",
+            "example_en": record.get("example") or "N/A",
+            "ipa": record.get("ipa") or "N/A"}
+
+
+def parse_record(record):
+    """
+    Nhận dạng định dạng của một dòng dump và trích thông tin của từ.
+
+    Returns:
+        tuple | None: (từ gốc, details) hoặc None nếu dòng không dùng được (thiếu từ, không phải tiếng Anh...).
+    """
+    if not isinstance(record, dict) or not record.get("word"):
+        return None
+    if record.get("lang_code", "en") != "en":  # Dump Wiktionary chứa mọi ngôn ngữ
+        return None
+    if "meanings" in record:
+        details = parse_dictionaryapi_entry(record)
+    elif "senses" in record:
+        details = parse_wiktionary_entry(record)
+    else:
+        details = parse_flat_entry(record)
+    return (record["word"], details) if details else None
+
+
+def _open_dump(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def _to_row(word, details):
+    """details (giá trị thiếu là "N/A") -> dòng của bảng dictionary_entry (giá trị thiếu là NULL)."""
+    def value(key, missing):
+        return None if details.get(key) in (None, missing) else details[key]
+
+    return {'word': normalize_word(word)[:200],
+            'word_type': (value('type', 'N/A') or '')[:50] or None,
+            'definition_en': value('definition_en', 'No definition found.'),
+            'example_en': value('example_en', 'N/A'),
+            'ipa': (value('ipa', 'N/A') or '')[:100] or None}
+
+
+def import_dictionary(path, replace=False, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Nạp một bản dump từ điển (JSON Lines, có thể .gz) vào bảng dictionary_entry trong một transaction.
+
+    Với mỗi từ, dòng xuất hiện đầu tiên trong dump được giữ lại (giống việc lấy phần tử đầu tiên của
+    dictionaryapi.dev); các dòng sau của cùng từ chỉ bổ sung IPA nếu dòng đầu không có.
+
+    Args:
+        path (str): Đường dẫn file dump.
+        replace (bool): True để xóa toàn bộ từ điển cũ trước khi nạp.
+        batch_size (int): Số dòng mỗi câu INSERT.
+
+    Returns:
+        dict: {'read': số dòng đã đọc, 'skipped': số dòng bỏ qua, 'total': số từ trong từ điển sau khi nạp}.
+    """
+    table = DictionaryEntry.__table__
+    read = skipped = 0
+
+    def flush(rows):
+        statement = sqlite_insert(table).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=['word'], set_={'ipa': func.coalesce(table.c.ipa, statement.excluded.ipa)})
+        db.session.execute(statement)
+
+    try:
+        if replace:
+            db.session.execute(delete(table))
+        rows = []
+        with _open_dump(path) as dump:
+            for line in dump:
+                line = line.strip()
+                if not line:
+                    continue
+                read += 1
+                try:
+                    parsed = parse_record(json.loads(line))
+                except ValueError:
+                    parsed = None
+                row = _to_row(*parsed) if parsed else None
+                if not row or not row['word']:
+                    skipped += 1
+                    continue
+                rows.append(row)
+                if len(rows) >= batch_size:
+                    flush(rows)
+                    rows = []
+        if rows:
+            flush(rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    total = db.session.scalar(select(func.count()).select_from(table))
+    return {'read': read, 'skipped': skipped, 'total': total}
+
+
+class LocalDictionary:
+    """
+    Tra từ trong từ điển offline (bảng dictionary_entry) trước khi gọi dictionaryapi.dev.
+    Kết quả có cùng dạng với get_word_details_dictionaryapi, nên phần còn lại của app không cần biết
+    dữ liệu đến từ đâu.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Đọc cấu hình LOCAL_DICTIONARY_ENABLED (False để luôn gọi API)."""
+        self.enabled = app.config.setdefault('LOCAL_DICTIONARY_ENABLED', True)
+        app.extensions['local_dictionary'] = self
+
+    def _count(self, counter):
+        with self._lock:
+            self._stats[counter] += 1
+
+    def get_stats(self):
+        """Số lần tra có/không có trong từ điển offline (tính từ khi process khởi động)."""
+        with self._lock:
+            total = self._stats['hits'] + self._stats['misses']
+            return dict(self._stats, total=total,
+                        hit_rate=round(100.0 * self._stats['hits'] / total, 1) if total else 0.0)
+
+    def lookup(self, word):
+        """
+        Tra một từ (cần app context).
+
+        Returns:
+            list | None: [details] giống get_word_details_dictionaryapi nếu có trong từ điển, None nếu không có
+                         (khi đó nơi gọi chuyển sang API).
+        """
+        key = normalize_word(word)[:200]
+        if not self.enabled or not key:
+            return None
+        row = db.session.execute(
+            select(DictionaryEntry.word_type, DictionaryEntry.definition_en,
+                   DictionaryEntry.example_en, DictionaryEntry.ipa)
+            .where(DictionaryEntry.word == key)).first()
+        if row is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return [{"type": row.word_type or "N/A",
+                 "definition_en": row.definition_en or "No definition found.",
+                 "example_en": row.example_en or "N/A",
+                 "ipa": row.ipa or "N/A"}]
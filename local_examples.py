@@ -0,0 +1,185 @@
+# local_examples.py
+
+# --- Standard Library Imports ---
+import csv  # File xuất của Tatoeba là TSV (tab-separated)
+import gzip
+import re
+import sys
+import threading
+
+# --- Third-party Library Imports ---
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert  # INSERT ... ON CONFLICT DO NOTHING (app dùng SQLite)
+
+# --- Application-Specific Imports ---
+from models import db, ExampleSentencePair, ExampleToken
+
+# Câu ví dụ offline: các cặp câu Anh - Việt của Tatoeba được nạp vào bảng example_sentence_pair, cùng một
+# chỉ mục đảo example_token (token -> cặp câu). Tìm ví dụ cho một từ là một lần đọc theo khoảng trên khóa chính
+# (token, rank, pair_id) của example_token, lấy dòng đầu tiên: không gọi tatoeba.org, không duyệt các danh sách
+# translations lồng nhau như get_tatoeba_examples.
+#
+# File nạp vào là bản xuất "Sentence pairs" của Tatoeba (https://tatoeba.org/downloads), mỗi dòng:
+#   <ID câu tiếng Anh> \t <câu tiếng Anh> \t <ID câu tiếng Việt> \t <câu tiếng Việt>
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")  # Từ tiếng Anh, giữ dạng rút gọn như "don't"
+MAX_TOKEN_LENGTH = 100  # Đồng bộ với độ dài cột ExampleToken.token
+MAX_LOOKUP_TOKENS = 5  # Cụm dài hơn thì không tra offline (giống việc chỉ tra từ/cụm từ ngắn)
+IDEAL_EXAMPLE_WORDS = 8  # Độ dài câu ví dụ dễ đọc nhất (số từ)
+IMPORT_BATCH_SIZE = 500  # Số cặp câu mỗi lần ghi
+TOKEN_BATCH_SIZE = 5000  # Số dòng example_token mỗi câu INSERT (3 cột x 5000 < giới hạn tham số của SQLite)
+
+
+def tokenize(text):
+    """Tách văn bản tiếng Anh thành các token chữ thường (theo thứ tự xuất hiện, có thể lặp)."""
+    return [token for token in TOKEN_PATTERN.findall((text or '').lower()) if len(token) <= MAX_TOKEN_LENGTH]
+
+
+def sentence_rank(example_en):
+    """
+    Điểm xếp hạng của một câu ví dụ (càng nhỏ càng tốt): ưu tiên câu dài khoảng IDEAL_EXAMPLE_WORDS từ,
+    là một câu hoàn chỉnh (kết thúc bằng . ! ?), không quá ngắn và không chứa số.
+    Khi bằng điểm, câu có ID nhỏ hơn (lâu đời hơn, thường đã được nhiều người xem lại) đứng trước.
+    """
+    word_count = len(tokenize(example_en))
+    rank = abs(word_count - IDEAL_EXAMPLE_WORDS) * 10
+    if word_count < 3:
+        rank += 30
+    if not example_en.rstrip().endswith(('.', '!', '?')):
+        rank += 20
+    if any(character.isdigit() for character in example_en):
+        rank += 5
+    return rank
+
+
+def _open_export(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def import_tatoeba_pairs(path, replace=False, vietnamese_first=False):
+    """
+    Nạp file xuất cặp câu Anh - Việt của Tatoeba (TSV, có thể .gz) trong một transaction.
+
+    Mỗi câu tiếng Anh chỉ giữ bản dịch tiếng Việt đầu tiên; nạp lại cùng file không tạo dòng trùng.
+
+    Args:
+        path (str): Đường dẫn file TSV.
+        replace (bool): True để xóa toàn bộ câu ví dụ cũ trước khi nạp.
+        vietnamese_first (bool): True nếu file là cặp Việt - Anh (cột câu tiếng Việt đứng trước).
+
+    Returns:
+        dict: {'read': số dòng đã đọc, 'skipped': số dòng bỏ qua, 'total': số cặp câu sau khi nạp}.
+    """
+    pair_table = ExampleSentencePair.__table__
+    token_table = ExampleToken.__table__
+    read = skipped = 0
+    seen_ids = set()  # Câu tiếng Anh đã gặp trong file (một câu có thể có nhiều bản dịch)
+
+    def flush(pairs):
+        db.session.execute(sqlite_insert(pair_table).values(pairs).on_conflict_do_nothing(index_elements=['id']))
+        tokens = [{'token': token, 'rank': pair['rank'], 'pair_id': pair['id']}
+                  for pair in pairs for token in dict.fromkeys(tokenize(pair['example_en']))]
+        for start in range(0, len(tokens), TOKEN_BATCH_SIZE):
+            db.session.execute(sqlite_insert(token_table).values(tokens[start:start + TOKEN_BATCH_SIZE])
+                               .on_conflict_do_nothing())
+
+    csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+    try:
+        if replace:
+            db.session.execute(delete(token_table))
+            db.session.execute(delete(pair_table))
+        pairs = []
+        with _open_export(path) as export:
+            for columns in csv.reader(export, delimiter='\t', quoting=csv.QUOTE_NONE):
+                if not columns:
+                    continue
+                read += 1
+                if len(columns) < 4:
+                    skipped += 1
+                    continue
+                if vietnamese_first:
+                    columns = columns[2:4] + columns[0:2]
+                try:
+                    english_id, translation_id = int(columns[0]), int(columns[2])
+                except ValueError:
+                    skipped += 1
+                    continue
+                example_en, example_vi = columns[1].strip(), columns[3].strip()
+                if english_id in seen_ids or not example_en or not example_vi or not tokenize(example_en):
+                    skipped += 1
+                    continue
+                seen_ids.add(english_id)
+                pairs.append({'id': english_id, 'translation_id': translation_id, 'example_en': example_en,
+                              'example_vi': example_vi, 'rank': sentence_rank(example_en)})
+                if len(pairs) >= IMPORT_BATCH_SIZE:
+                    flush(pairs)
+                    pairs = []
+        if pairs:
+            flush(pairs)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    total = db.session.scalar(select(func.count()).select_from(pair_table))
+    return {'read': read, 'skipped': skipped, 'total': total}
+
+
+class LocalExamples:
+    """
+    Tìm câu ví dụ Anh - Việt trong chỉ mục Tatoeba offline trước khi gọi tatoeba.org.
+    Kết quả có cùng dạng với get_tatoeba_examples: {'example_en': ..., 'example_vi': ...}.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Đọc cấu hình LOCAL_EXAMPLES_ENABLED (False để luôn gọi tatoeba.org)."""
+        self.enabled = app.config.setdefault('LOCAL_EXAMPLES_ENABLED', True)
+        app.extensions['local_examples'] = self
+
+    def _count(self, counter):
+        with self._lock:
+            self._stats[counter] += 1
+
+    def get_stats(self):
+        """Số lần tìm được/không tìm được câu ví dụ offline (tính từ khi process khởi động)."""
+        with self._lock:
+            total = self._stats['hits'] + self._stats['misses']
+            return dict(self._stats, total=total,
+                        hit_rate=round(100.0 * self._stats['hits'] / total, 1) if total else 0.0)
+
+    def lookup(self, word):
+        """
+        Tìm câu ví dụ tốt nhất (rank nhỏ nhất) chứa từ/cụm từ `word` (cần app context).
+
+        Với cụm nhiều từ, tra chỉ mục theo token dài nhất (thường hiếm nhất) rồi lọc các câu chứa cả cụm.
+
+        Returns:
+            dict | None: {'example_en', 'example_vi'}, hoặc None nếu không có (nơi gọi chuyển sang API).
+        """
+        tokens = tokenize(word)
+        if not self.enabled or not tokens or len(tokens) > MAX_LOOKUP_TOKENS:
+            return None
+
+        query = (select(ExampleSentencePair.example_en, ExampleSentencePair.example_vi)
+                 .join(ExampleToken, ExampleToken.pair_id == ExampleSentencePair.id)
+                 .where(ExampleToken.token == max(tokens, key=len))
+                 .order_by(ExampleToken.rank, ExampleToken.pair_id)
+                 .limit(1))
+        if len(tokens) > 1:
+            query = query.where(ExampleSentencePair.example_en.ilike(f"%{' '.join(tokens)}%"))
+
+        row = db.session.execute(query).first()
+        if row is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return {'example_en': row.example_en, 'example_vi': row.example_vi}
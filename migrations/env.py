@@ -51,6 +51,16 @@ def get_metadata():
     return target_db.metadata
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    """
+    Bỏ qua các bảng thuộc bind khác (ví dụ bảng telemetry, có migration riêng trong migrations_telemetry/):
+    database chính cũ vẫn có thể còn các bảng này cho đến khi chạy `flask move-telemetry-data`.
+    """
+    if type_ == 'table' and reflected and compare_to is None:
+        return not any(name in metadata.tables for key, metadata in target_db.metadatas.items() if key is not None)
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -65,7 +75,7 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True, include_object=include_object
     )
 
     with context.begin_transaction():
@@ -100,6 +110,7 @@ def run_migrations_online():
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
+            include_object=include_object,
             **conf_args
         )
 
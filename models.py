@@ -20,6 +20,21 @@ from wtforms.validators import DataRequired, Email, Length, EqualTo  # Các bộ
 # để tránh vấn đề circular import (import vòng tròn).
 db = SQLAlchemy()
 
+# Bind (SQLALCHEMY_BINDS) của các bảng telemetry chỉ ghi thêm (APILog, UserActivity và các bảng tổng hợp của APILog):
+# chúng nằm trong một file SQLite riêng, nên việc ghi log không tranh khóa ghi với dữ liệu của người dùng.
+# Không thể có khóa ngoại giữa hai database, nên user_id của các bảng này chỉ là cột số nguyên.
+TELEMETRY_BIND_KEY = 'telemetry'
+
+
+def normalize_word(word):
+    """Chuẩn hóa từ để so sánh/làm khóa: bỏ khoảng trắng thừa và chuyển về chữ thường."""
+    return " ".join((word or "").split()).lower()
+
+
+def _default_normalized_word(context):
+    """Default của VocabularyEntry.normalized_word: chuẩn hóa từ original_word của chính dòng đó."""
+    return normalize_word(context.get_current_parameters().get('original_word'))[:200]
+
 
 # === MODEL DEFINITIONS ===
 
@@ -43,6 +58,20 @@ class User(db.Model):
     is_admin = db.Column(db.Boolean, default=False, nullable=False)  # Cờ xác định người dùng có phải Admin không
     display_name = db.Column(db.String(100), nullable=True)  # Tên hiển thị tùy chỉnh của người dùng
     is_blocked = db.Column(db.Boolean, default=False, nullable=False)  # Cờ xác định tài khoản có bị Admin chặn không
+    # Bộ đếm phi chuẩn hóa, được cập nhật cùng transaction khi thêm/xóa list và từ (xem counters.py).
+    # Các trang thống kê đọc trực tiếp thay vì COUNT(*) mỗi lần xem; `flask reconcile-counters` tính lại khi cần.
+    list_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)  # Số VocabularyList của user
+    entry_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)  # Số VocabularyEntry của user
+
+    # Index cho danh sách người dùng của Admin Dashboard (phân trang keyset theo (entry_count, id) hoặc id,
+    # có/không lọc theo trạng thái bị chặn hoặc quyền admin)
+    __table_args__ = (
+        db.Index('ix_user_entry_count_id', 'entry_count', 'id'),
+        db.Index('ix_user_is_blocked_entry_count_id', 'is_blocked', 'entry_count', 'id'),
+        db.Index('ix_user_is_admin_entry_count_id', 'is_admin', 'entry_count', 'id'),
+        db.Index('ix_user_is_blocked_id', 'is_blocked', 'id'),
+        db.Index('ix_user_is_admin_id', 'is_admin', 'id'),
+    )
 
     # --- Mối quan hệ (Relationships) ---
     # Một User có thể tạo nhiều VocabularyList.
@@ -80,6 +109,7 @@ class VocabularyList(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), nullable=False)  # Tên của danh sách từ vựng, bắt buộc
     created_at = db.Column(db.DateTime, default=datetime.utcnow)  # Thời điểm danh sách được tạo
+    entry_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)  # Số từ trong list (xem counters.py)
 
 
     # Khóa ngoại user_id: Liên kết danh sách này với một User cụ thể.
@@ -98,6 +128,13 @@ class VocabularyList(db.Model):
 
     # lazy='dynamic' cho phép bạn thực hiện các truy vấn tiếp theo trên 'entries' (ví dụ: .filter_by(), .count())
 
+    # Index cho các truy vấn "các list của một user" sắp xếp theo ngày tạo (My Lists, Dashboard, Admin)
+    # và theo tên (dropdown ở /enter-words, kiểm tra trùng tên).
+    __table_args__ = (
+        db.Index('ix_vocabulary_list_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_vocabulary_list_user_id_name', 'user_id', 'name'),
+    )
+
     def __repr__(self):
         return f'<VocabularyList {self.id} - "{self.name}" by User ID {self.user_id}>'
 
@@ -118,6 +155,9 @@ class VocabularyEntry(db.Model):
     # example_vi = db.Column(db.Text, nullable=True)         # (Tùy chọn) Nghĩa câu ví dụ tiếng Việt
     added_at = db.Column(db.DateTime, default=datetime.utcnow)  # Thời điểm mục từ được thêm vào
     example_vi = db.Column(db.Text, nullable=True)
+    # Từ gốc đã chuẩn hóa (normalize_word), dùng để phát hiện từ đã có trong list khi lưu.
+    # NULL với các bản trùng có sẵn từ trước khi có cột này (xem migration), nên không vi phạm unique index.
+    normalized_word = db.Column(db.String(200), nullable=True, default=_default_normalized_word)
 
     # Khóa ngoại list_id: Liên kết mục từ này với một VocabularyList cụ thể.
     list_id = db.Column(db.Integer, db.ForeignKey('vocabulary_list.id'), nullable=False)
@@ -127,6 +167,15 @@ class VocabularyEntry(db.Model):
     # và cũng quan trọng cho việc kiểm tra quyền sở hữu khi sửa/xóa entry.
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+    # Index cho "các từ trong một list" (list_detail) và "các từ mới nhất của một user" (Dashboard),
+    # cả hai đều sắp xếp theo added_at.
+    # Unique index (list_id, normalized_word): mỗi từ chỉ xuất hiện một lần trong một list (/save-list bỏ qua từ trùng).
+    __table_args__ = (
+        db.Index('ix_vocabulary_entry_list_id_added_at', 'list_id', 'added_at'),
+        db.Index('ix_vocabulary_entry_user_id_added_at', 'user_id', 'added_at'),
+        db.Index('ix_vocabulary_entry_list_id_normalized_word', 'list_id', 'normalized_word', unique=True),
+    )
+
     def __repr__(self):
         """Biểu diễn đối tượng VocabularyEntry dưới dạng chuỗi (hữu ích khi debug)."""
         return f'<VocabularyEntry {self.id} - "{self.original_word}" in List ID {self.list_id}>'
@@ -138,6 +187,7 @@ class APILog(db.Model):
     Lưu trữ thông tin về các lần ứng dụng gọi đến API bên ngoài.
     """
     __tablename__ = 'api_log'
+    __bind_key__ = TELEMETRY_BIND_KEY
     id = db.Column(db.Integer, primary_key=True)
     api_name = db.Column(db.String(100),
                          nullable=False)  # Tên của API được gọi (ví dụ: 'deep_translator', 'dictionary_api')
@@ -146,19 +196,88 @@ class APILog(db.Model):
     status_code = db.Column(db.Integer, nullable=True)  # Mã trạng thái HTTP từ API (nếu có, ví dụ: 200, 404, 500)
     error_message = db.Column(db.Text, nullable=True)  # Thông báo lỗi chi tiết (nếu có)
     request_details = db.Column(db.Text, nullable=True)  # Một phần thông tin của request (ví dụ: từ cần dịch)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'),
-                        nullable=True)  # ID của người dùng gây ra lời gọi API (nếu có)
+    user_id = db.Column(db.Integer, nullable=True)  # ID của người dùng gây ra lời gọi API (nếu có); không có khóa ngoại
 
     # nullable=True vì có thể API được gọi bởi hệ thống.
 
-    # (Tùy chọn) Quan hệ ngược lại với User để dễ dàng xem log của một user cụ thể.
-    # logged_by_user = db.relationship('User', backref=db.backref('api_logs', lazy='dynamic'))
+    duration_ms = db.Column(db.Integer, nullable=True)  # Thời gian của lời gọi API (ms); NULL với log cũ
+    response_bytes = db.Column(db.Integer, nullable=True)  # Kích thước body của response (byte), nếu có
+
+    # Index cho trang /admin/api-logs: danh sách log mới nhất theo keyset (timestamp, id) (id là rowid, có sẵn
+    # ở cuối mọi index), và một index cho mỗi bộ lọc, kết thúc bằng timestamp để vẫn đọc theo thứ tự thời gian.
+    __table_args__ = (
+        db.Index('ix_api_log_timestamp', 'timestamp'),
+        db.Index('ix_api_log_api_name_timestamp', 'api_name', 'timestamp'),
+        db.Index('ix_api_log_success_timestamp', 'success', 'timestamp'),
+        db.Index('ix_api_log_user_id_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_api_log_status_code_timestamp', 'status_code', 'timestamp'),
+    )
 
     def __repr__(self):
         """Biểu diễn đối tượng APILog dưới dạng chuỗi (hữu ích khi debug)."""
         return f'<APILog ID {self.id} - API: {self.api_name} at {self.timestamp} Success: {self.success}>'
 
 
+class APICallHourly(db.Model):
+    """
+    Số lời gọi API theo giờ, theo kết quả (success) và mã HTTP (xem api_rollups.py).
+    Được cập nhật cùng transaction với việc ghi APILog, nên luôn khớp với bảng api_log.
+    """
+    __tablename__ = 'api_call_hourly'
+    __bind_key__ = TELEMETRY_BIND_KEY
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    period_start = db.Column(db.DateTime, primary_key=True)  # Đầu giờ (UTC)
+    api_name = db.Column(db.String(100), primary_key=True)
+    success = db.Column(db.Boolean, primary_key=True)
+    status_code = db.Column(db.Integer, primary_key=True)  # 0 nếu không có response (timeout, lỗi kết nối...)
+    calls = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f'<APICallHourly {self.api_name} {self.period_start} {self.status_code}: {self.calls}>'
+
+
+class APICallDaily(db.Model):
+    """
+    Giống APICallHourly nhưng theo ngày. Các thẻ thống kê và biểu đồ theo ngày/tháng trên /admin/api-logs
+    chỉ đọc bảng này, nên chi phí của trang không tăng theo số dòng của api_log.
+    """
+    __tablename__ = 'api_call_daily'
+    __bind_key__ = TELEMETRY_BIND_KEY
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    period_start = db.Column(db.DateTime, primary_key=True)  # Đầu ngày (UTC)
+    api_name = db.Column(db.String(100), primary_key=True)
+    success = db.Column(db.Boolean, primary_key=True)
+    status_code = db.Column(db.Integer, primary_key=True)  # 0 nếu không có response
+    calls = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f'<APICallDaily {self.api_name} {self.period_start:%Y-%m-%d} {self.status_code}: {self.calls}>'
+
+
+class APILatencyBucket(db.Model):
+    """
+    Histogram thời gian gọi API đã gộp sẵn: số lời gọi của một API trong một phút có duration_ms
+    thuộc khoảng (cận dưới, le_ms]. Được cập nhật cùng transaction với việc ghi APILog (xem api_log_writer.py),
+    để trang /admin/api-logs tính p50/p95/p99 từ vài trăm dòng thay vì quét bảng api_log.
+    """
+    __tablename__ = 'api_latency_bucket'
+    __bind_key__ = TELEMETRY_BIND_KEY
+    # Khóa chính bắt đầu bằng bucket_start: truy vấn theo khoảng thời gian là một lần đọc theo khoảng
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    bucket_start = db.Column(db.DateTime, primary_key=True)  # Đầu phút (UTC) của các lời gọi
+    api_name = db.Column(db.String(100), primary_key=True)
+    le_ms = db.Column(db.Integer, primary_key=True)  # Cận trên của khoảng thời gian (ms), xem latency_histogram.py
+    count = db.Column(db.Integer, default=0, nullable=False)
+    duration_sum_ms = db.Column(db.Integer, default=0, nullable=False)  # Tổng duration_ms (để tính trung bình)
+    response_bytes_sum = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f'<APILatencyBucket {self.api_name} {self.bucket_start} <= {self.le_ms}ms: {self.count}>'
+
+
 # === FORM DEFINITIONS (Sử dụng Flask-WTF) ===
 
 class RegistrationForm(FlaskForm):
@@ -190,11 +309,184 @@ class UserActivity(db.Model):
     Theo dõi các hoạt động quan trọng của người dùng để đánh dấu "lần học".
     """
     __tablename__ = 'user_activity'
+    __bind_key__ = TELEMETRY_BIND_KEY
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)  # ID người dùng (database telemetry riêng, không có khóa ngoại)
     activity_type = db.Column(db.String(100), nullable=False) # Ví dụ: 'session_start', 'words_added', 'list_reviewed'
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     details = db.Column(db.Text, nullable=True) # Thông tin chi tiết hơn về hoạt động
 
+    # Index cho truy vấn hoạt động của một user trong một khoảng thời gian (thông báo tháng trước ở Dashboard)
+    __table_args__ = (
+        db.Index('ix_user_activity_user_id_timestamp', 'user_id', 'timestamp'),
+    )
+
     def __repr__(self):
         return f'<UserActivity {self.id} - User {self.user_id} - Type: {self.activity_type} at {self.timestamp}>'
+
+
+class TelemetryMoveProgress(db.Model):
+    """
+    Tiến độ chuyển một bảng telemetry từ database chính (các phiên bản trước) sang database telemetry,
+    được cập nhật cùng transaction với mỗi lô dòng được chép (xem telemetry_db.move_legacy_tables).
+    """
+    __tablename__ = 'telemetry_move_progress'
+    __bind_key__ = TELEMETRY_BIND_KEY
+    table_name = db.Column(db.String(100), primary_key=True)
+    keep_ids = db.Column(db.Boolean, nullable=False)  # Bảng đích còn trống lúc bắt đầu: giữ nguyên id / không cộng dồn
+    last_key = db.Column(db.Text, nullable=True)  # Khóa chính của dòng cuối đã chép (cursor của keyset.py)
+    rows_moved = db.Column(db.Integer, default=0, nullable=False)
+    copied = db.Column(db.Boolean, default=False, nullable=False)  # Đã chép xong, chỉ còn xóa bảng cũ
+
+    def __repr__(self):
+        return f'<TelemetryMoveProgress {self.table_name}: {self.rows_moved} rows>'
+
+
+class WordCacheEntry(db.Model):
+    """
+    Bộ nhớ đệm (cache) dùng chung cho kết quả tra cứu từ các API bên ngoài
+    (dictionaryapi.dev, Tatoeba, Google Translate).
+    Mỗi bản ghi được xác định bởi (source, word_key, source_lang, target_lang).
+    """
+    __tablename__ = 'word_cache'
+    __table_args__ = (
+        db.UniqueConstraint('source', 'word_key', 'source_lang', 'target_lang', name='uq_word_cache_key'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(50), nullable=False)  # Nguồn dữ liệu: 'dictionary', 'tatoeba', 'translation', ...
+    word_key = db.Column(db.String(500), nullable=False)  # Từ/đoạn văn đã được chuẩn hóa (lowercase, gọn khoảng trắng)
+    source_lang = db.Column(db.String(10), nullable=False)  # Ngôn ngữ nguồn
+    target_lang = db.Column(db.String(10), nullable=False)  # Ngôn ngữ đích
+    payload = db.Column(db.Text, nullable=True)  # Kết quả API dưới dạng JSON
+    is_negative = db.Column(db.Boolean, default=False, nullable=False)  # True nếu là kết quả "không tìm thấy"
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # Hết hạn sau thời điểm này
+
+    def __repr__(self):
+        return f'<WordCacheEntry {self.source}:{self.word_key} ({self.source_lang}->{self.target_lang})>'
+
+
+class DictionaryEntry(db.Model):
+    """
+    Từ điển offline (xem local_dictionary.py): mỗi từ một dòng, đã trích sẵn đúng các trường mà
+    get_word_details_dictionaryapi lấy từ dictionaryapi.dev (loại từ, định nghĩa, ví dụ, IPA).
+    Được nạp bằng `flask import-dictionary` và được tra trước khi gọi API.
+    """
+    __tablename__ = 'dictionary_entry'
+    __table_args__ = {'sqlite_with_rowid': False}  # Bảng WITHOUT ROWID: dữ liệu nằm ngay trong B-tree của khóa chính
+    word = db.Column(db.String(200), primary_key=True)  # normalize_word(từ)
+    word_type = db.Column(db.String(50), nullable=True)
+    definition_en = db.Column(db.Text, nullable=True)
+    example_en = db.Column(db.Text, nullable=True)
+    ipa = db.Column(db.String(100), nullable=True)
+
+    def __repr__(self):
+        return f'<DictionaryEntry {self.word}>'
+
+
+class ExampleSentencePair(db.Model):
+    """
+    Cặp câu ví dụ Anh - Việt của Tatoeba (xem local_examples.py), nạp bằng `flask import-tatoeba`.
+    id là ID câu tiếng Anh trên Tatoeba; mỗi câu tiếng Anh giữ một bản dịch tiếng Việt.
+    """
+    __tablename__ = 'example_sentence_pair'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # ID câu tiếng Anh trên Tatoeba
+    translation_id = db.Column(db.Integer, nullable=False)  # ID câu tiếng Việt trên Tatoeba
+    example_en = db.Column(db.Text, nullable=False)
+    example_vi = db.Column(db.Text, nullable=False)
+    rank = db.Column(db.Integer, nullable=False)  # Điểm xếp hạng, càng nhỏ càng nên hiển thị trước
+
+    def __repr__(self):
+        return f'<ExampleSentencePair {self.id}>'
+
+
+class ExampleToken(db.Model):
+    """
+    Chỉ mục đảo (inverted index) từ -> cặp câu chứa từ đó. Khóa chính (token, rank, pair_id) nên câu tốt nhất
+    cho một từ là dòng đầu tiên của một lần đọc theo khoảng trên B-tree (bảng WITHOUT ROWID).
+    """
+    __tablename__ = 'example_token'
+    __table_args__ = {'sqlite_with_rowid': False}
+    token = db.Column(db.String(100), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True, autoincrement=False)  # Sao chép từ ExampleSentencePair.rank
+    pair_id = db.Column(db.Integer, db.ForeignKey('example_sentence_pair.id', ondelete='CASCADE'),
+                        primary_key=True, autoincrement=False)
+
+    def __repr__(self):
+        return f'<ExampleToken {self.token} -> {self.pair_id}>'
+
+
+class EnrichmentJob(db.Model):
+    """
+    Một lần xử lý (enrich) danh sách từ chạy ở background cho trang /enter-words.
+    Kết quả của từng từ được lưu dần vào EnrichmentJobItem ngay khi có.
+    """
+    __tablename__ = 'enrichment_job'
+    id = db.Column(db.String(36), primary_key=True)  # UUID, khó đoán để không lộ job của người khác
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # 'queued', 'running', 'partial' (mọi từ đã có kết quả, đang bổ sung các từ hết deadline), 'done', 'failed'
+    status = db.Column(db.String(20), default='queued', nullable=False)
+    total_words = db.Column(db.Integer, default=0, nullable=False)  # Tổng số từ cần xử lý
+    completed_words = db.Column(db.Integer, default=0, nullable=False)  # Số từ đã có kết quả
+    error_message = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)  # Lúc worker nhận job khỏi hàng đợi
+    finished_at = db.Column(db.DateTime, nullable=True, index=True)  # Dùng khi dọn job cũ/bị bỏ dở (xem sweep())
+
+    items = db.relationship('EnrichmentJobItem', backref='job', lazy='dynamic', cascade="all, delete-orphan")
+
+    def __repr__(self):
+        return f'<EnrichmentJob {self.id} - User {self.user_id} - {self.status} ({self.completed_words}/{self.total_words})>'
+
+
+class EnrichmentJobItem(db.Model):
+    """
+    Kết quả của một từ trong EnrichmentJob.
+    Một position có thể có nhiều item (kết quả bổ sung sau deadline); item có id lớn nhất là mới nhất.
+    """
+    __tablename__ = 'enrichment_job_item'
+    id = db.Column(db.Integer, primary_key=True)  # Tăng dần, dùng làm con trỏ (cursor) khi client polling
+    job_id = db.Column(db.String(36), db.ForeignKey('enrichment_job.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)  # Vị trí của từ trong danh sách người dùng nhập
+    word = db.Column(db.String(200), nullable=False)
+    result = db.Column(db.Text, nullable=True)  # Kết quả dạng JSON (cấu trúc giống processed_results_dict[word])
+    completed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<EnrichmentJobItem {self.id} - Job {self.job_id} #{self.position} "{self.word}">'
+
+
+class SaveListRequest(db.Model):
+    """
+    Idempotency key của các request /save-list đã xử lý xong.
+    Client gửi lại cùng key khi retry (mất mạng, timeout...) sẽ nhận lại đúng response cũ
+    thay vì lưu các từ thêm một lần nữa.
+    """
+    __tablename__ = 'save_list_request'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'idempotency_key', name='uq_save_list_request_user_key'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    idempotency_key = db.Column(db.String(64), nullable=False)  # Do client sinh (UUID), duy nhất theo user
+    list_id = db.Column(db.Integer, nullable=True)  # List đã được lưu vào (không dùng khóa ngoại: list có thể bị xóa sau đó)
+    response = db.Column(db.Text, nullable=False)  # JSON response đã trả về lần đầu
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<SaveListRequest {self.id} - User {self.user_id} - Key {self.idempotency_key}>'
+
+
+class ServerSession(db.Model):
+    """
+    Dữ liệu session lưu phía server (xem server_sessions.py); cookie chỉ mang session id ngẫu nhiên.
+    Khóa chính là SHA-256 của session id, nên lộ bảng này cũng không dùng được để giả mạo cookie.
+    """
+    __tablename__ = 'server_session'
+    id = db.Column(db.String(64), primary_key=True)  # sha256(session id) dạng hex
+    data = db.Column(db.Text, nullable=False)  # Nội dung session (JSON có tag của Flask)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # Hết hạn sau thời điểm này (dọn bằng sweep)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<ServerSession {self.id[:8]}… expires {self.expires_at}>'
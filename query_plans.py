@@ -0,0 +1,138 @@
+# query_plans.py
+
+# --- Standard Library Imports ---
+import re
+from datetime import datetime, timedelta
+
+# --- Third-party Library Imports ---
+from sqlalchemy import select, func, text, tuple_
+from sqlalchemy.dialects import sqlite
+
+# --- Application-Specific Imports ---
+from models import db, User, VocabularyList, VocabularyEntry, APILog, UserActivity, ExampleSentencePair, ExampleToken
+
+# Một dòng "SCAN <bảng>" không kèm "USING ... INDEX" nghĩa là SQLite đọc toàn bộ bảng.
+FULL_SCAN_PATTERN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+# Sắp xếp/gom nhóm không dùng được index (phải sort tạm trong bộ nhớ).
+TEMP_BTREE_PATTERN = re.compile(r'USE TEMP B-TREE FOR (ORDER BY|GROUP BY)')
+
+
+def hot_queries():
+    """
+    Danh sách các truy vấn chạy thường xuyên nhất trong app.py (giữ đồng bộ khi sửa truy vấn tương ứng).
+
+    Returns:
+        list: Các tuple (tên, câu lệnh SQLAlchemy).
+    """
+    user_id, list_id = 1, 1
+    month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last_month_start = (month_start - timedelta(days=1)).replace(day=1)
+
+    return [
+        # enter_words_page: dropdown các list của user
+        ('lists_by_user_order_by_name',
+         select(VocabularyList).filter_by(user_id=user_id).order_by(VocabularyList.name.asc())),
+        # my_lists_page, admin_view_user_detail_page, dashboard_page
+        ('lists_by_user_order_by_created_at',
+         select(VocabularyList).filter_by(user_id=user_id).order_by(VocabularyList.created_at.desc())),
+        # save_list_route, rename: kiểm tra trùng tên list
+        ('list_by_user_and_name',
+         select(VocabularyList).filter_by(user_id=user_id, name='Unit 1')),
+        # list_detail_page, admin_view_list_entries_page, list_entries_api: trang keyset (added_at, id)
+        ('entries_by_list_keyset_page',
+         select(VocabularyEntry).filter_by(list_id=list_id)
+         .where(tuple_(VocabularyEntry.added_at, VocabularyEntry.id) > tuple_(month_start, 1))
+         .order_by(VocabularyEntry.added_at.asc(), VocabularyEntry.id.asc()).limit(51)),
+        # save_list_route (bulk_save): các từ đã có trong list
+        ('entries_in_list_by_normalized_word',
+         select(VocabularyEntry.normalized_word).where(
+             VocabularyEntry.list_id == list_id, VocabularyEntry.normalized_word.in_(['hello', 'world']))),
+        # lookup_tatoeba_example (local_examples): câu ví dụ tốt nhất cho một từ
+        ('best_example_for_token',
+         select(ExampleSentencePair.example_en, ExampleSentencePair.example_vi)
+         .join(ExampleToken, ExampleToken.pair_id == ExampleSentencePair.id)
+         .where(ExampleToken.token == 'run')
+         .order_by(ExampleToken.rank, ExampleToken.pair_id).limit(1)),
+        # dashboard_page: các từ mới thêm gần đây
+        ('recent_entries_by_user',
+         select(VocabularyEntry).filter_by(user_id=user_id).order_by(VocabularyEntry.added_at.desc()).limit(5)),
+        # dashboard_page: hoạt động tháng trước
+        ('activities_by_user_in_range',
+         select(func.count()).select_from(UserActivity).where(
+             UserActivity.user_id == user_id,
+             UserActivity.timestamp >= last_month_start,
+             UserActivity.timestamp < month_start)),
+        # admin_dashboard: trang keyset của danh sách người dùng theo id hoặc (entry_count, id), có/không có bộ lọc
+        ('users_keyset_page',
+         _users_keyset_page([User.id])),
+        ('users_by_saved_words_keyset_page',
+         _users_keyset_page([User.entry_count, User.id], descending=True)),
+        ('users_by_saved_words_asc_keyset_page',
+         _users_keyset_page([User.entry_count, User.id])),
+        ('blocked_users_keyset_page',
+         _users_keyset_page([User.id], User.is_blocked == True)),  # noqa: E712
+        ('blocked_users_by_saved_words_keyset_page',
+         _users_keyset_page([User.entry_count, User.id], User.is_blocked == True, descending=True)),  # noqa: E712
+        ('admin_users_keyset_page',
+         _users_keyset_page([User.id], User.is_admin == True)),  # noqa: E712
+        ('admin_users_by_saved_words_keyset_page',
+         _users_keyset_page([User.entry_count, User.id], User.is_admin == True, descending=True)),  # noqa: E712
+        # admin_api_logs_page, admin_export_api_logs: trang keyset (timestamp, id) mới nhất, có/không có bộ lọc
+        ('api_logs_keyset_page',
+         _api_logs_keyset_page()),
+        ('api_logs_by_api_name_keyset_page',
+         _api_logs_keyset_page(APILog.api_name == 'dictionary_api')),
+        ('api_logs_by_api_name_and_success_keyset_page',
+         _api_logs_keyset_page(APILog.api_name == 'dictionary_api', APILog.success == False)),  # noqa: E712
+        ('api_logs_failed_keyset_page',
+         _api_logs_keyset_page(APILog.success == False)),  # noqa: E712
+        ('api_logs_by_user_keyset_page',
+         _api_logs_keyset_page(APILog.user_id == user_id)),
+        ('api_logs_by_status_code_keyset_page',
+         _api_logs_keyset_page(APILog.status_code == 500)),
+        ('api_logs_in_time_range_keyset_page',
+         _api_logs_keyset_page(APILog.timestamp >= last_month_start, APILog.timestamp < month_start)),
+    ]
+
+
+def _users_keyset_page(columns, *conditions, descending=False):
+    """Trang thứ hai (có cursor) của danh sách người dùng trên Admin Dashboard, xem keyset.keyset_page."""
+    key, cursor = tuple_(*columns), tuple_(*[10] * len(columns))
+    return (select(User).where(*conditions).where(key < cursor if descending else key > cursor)
+            .order_by(*[column.desc() if descending else column.asc() for column in columns]).limit(26))
+
+
+def _api_logs_keyset_page(*conditions):
+    """Trang thứ hai (có cursor) của danh sách log trên /admin/api-logs, xem api_log_query.get_page."""
+    return (select(APILog).where(*conditions)
+            .where(tuple_(APILog.timestamp, APILog.id) < tuple_(datetime.utcnow(), 1000))
+            .order_by(APILog.timestamp.desc(), APILog.id.desc()).limit(51))
+
+
+def explain(statement):
+    """Chạy EXPLAIN QUERY PLAN cho một câu lệnh, trả về danh sách các dòng 'detail' của plan."""
+    # Biên dịch với tham số dạng :name để truyền lại qua text(); plan không phụ thuộc giá trị tham số
+    # (render_postcompile: triển khai các tham số IN (...) thành từng tham số riêng)
+    compiled = statement.compile(dialect=sqlite.dialect(paramstyle='named'),
+                                 compile_kwargs={'render_postcompile': True})
+    # Chạy trên database chứa bảng được truy vấn (các bảng telemetry nằm ở bind riêng)
+    bind = db.session.get_bind(clause=statement.get_final_froms()[0])
+    rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {compiled}"), compiled.params,
+                              bind_arguments={'bind': bind}).all()
+    return [row[-1] for row in rows]
+
+
+def find_plan_problems(plan):
+    """Trả về danh sách các bước trong plan là full table scan hoặc sort không dùng index."""
+    return [detail for detail in plan if FULL_SCAN_PATTERN.match(detail) or TEMP_BTREE_PATTERN.search(detail)]
+
+
+def check_hot_queries():
+    """
+    Kiểm tra plan của tất cả các truy vấn trong hot_queries() (cần app context, chỉ hỗ trợ SQLite).
+
+    Returns:
+        list: Các tuple (tên, plan, problems) cho từng truy vấn.
+    """
+    return [(name, plan, find_plan_problems(plan))
+            for name, plan in ((name, explain(statement)) for name, statement in hot_queries())]
@@ -0,0 +1,343 @@
+# server_sessions.py
+
+# --- Standard Library Imports ---
+import hashlib  # Khóa lưu trữ = sha256(session id): lộ nơi lưu session cũng không giả mạo được cookie
+import os
+import secrets  # Sinh session id ngẫu nhiên (256 bit)
+import tempfile  # Ghi file session nguyên tử (ghi file tạm rồi os.replace)
+import threading
+import time
+from datetime import datetime, timedelta
+
+# --- Third-party Library Imports ---
+from flask.json.tag import TaggedJSONSerializer  # Cùng định dạng với cookie session mặc định của Flask
+from flask.sessions import SessionInterface, SecureCookieSession
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert  # INSERT ... ON CONFLICT DO UPDATE (app dùng SQLite)
+
+# --- Application-Specific Imports ---
+from models import db, ServerSession
+
+# Session phía server: cookie chỉ mang một session id ngẫu nhiên (~43 ký tự), nội dung session
+# (user_info từ Google, google_auth_pending_setup, last_processed_input...) nằm trong một "store".
+# Cookie không còn phình theo dữ liệu, và mỗi request không phải giải mã/kiểm tra chữ ký cả session.
+#
+# Store là một kho key-value đơn giản có thời hạn: get(key), set(key, value, ttl_seconds), delete(key), sweep().
+#   - SQLAlchemySessionStore: bảng server_session (mặc định).
+#   - FilesystemSessionStore: mỗi session một file trong một thư mục.
+#   - RedisSessionStore: client tương thích Redis (redis-py, hoặc LocalRedis khi phát triển/kiểm thử).
+
+DEFAULT_SWEEP_INTERVAL_SECONDS = 3600  # Dọn session hết hạn tối đa mỗi giờ một lần (mỗi process)
+MAX_SESSION_ID_LENGTH = 128  # Cookie dài bất thường thì bỏ qua, không tra store
+
+
+def _storage_key(sid):
+    return hashlib.sha256(sid.encode('utf-8')).hexdigest()
+
+
+class SQLAlchemySessionStore:
+    """Lưu session trong bảng server_session, dùng connection riêng (không dính transaction của request)."""
+
+    table = ServerSession.__table__
+
+    def get(self, key):
+        now = datetime.utcnow()
+        with db.engine.connect() as conn:
+            row = conn.execute(select(self.table.c.data, self.table.c.expires_at)
+                               .where(self.table.c.id == key)).first()
+        if row is None or row.expires_at <= now:
+            return None
+        return row.data
+
+    def set(self, key, value, ttl_seconds):
+        now = datetime.utcnow()
+        values = {'data': value, 'expires_at': now + timedelta(seconds=ttl_seconds), 'updated_at': now}
+        statement = sqlite_insert(self.table).values(id=key, **values).on_conflict_do_update(
+            index_elements=['id'], set_=values)
+        with db.engine.begin() as conn:
+            conn.execute(statement)
+
+    def delete(self, key):
+        with db.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.id == key))
+
+    def sweep(self):
+        """Xóa các session đã hết hạn (dùng index trên expires_at). Trả về số session đã xóa."""
+        with db.engine.begin() as conn:
+            return conn.execute(delete(self.table).where(self.table.c.expires_at <= datetime.utcnow())).rowcount
+
+
+class FilesystemSessionStore:
+    """Mỗi session là một file <key> trong `directory`; dòng đầu là thời điểm hết hạn (epoch giây)."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    @staticmethod
+    def _read(path, header_only=False):
+        with open(path, 'r', encoding='utf-8') as f:
+            expires_at = float(f.readline())
+            return expires_at, None if header_only else f.read()
+
+    def get(self, key):
+        try:
+            expires_at, value = self._read(self._path(key))
+        except (OSError, ValueError):
+            return None
+        return value if expires_at > time.time() else None
+
+    def set(self, key, value, ttl_seconds):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(f"{time.time() + ttl_seconds}\n")
+                f.write(value)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def sweep(self):
+        removed = 0
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = self._path(name)
+            try:
+                if name.startswith('.tmp-'):
+                    expired = os.path.getmtime(path) < now - 3600  # File tạm sót lại do process bị dừng giữa chừng
+                else:
+                    expired = self._read(path, header_only=True)[0] <= now
+                if expired:
+                    os.remove(path)
+                    removed += 1
+            except (OSError, ValueError):
+                continue
+        return removed
+
+
+class RedisSessionStore:
+    """Lưu session trong Redis (hoặc client tương thích); Redis tự xóa key hết hạn nên sweep() không cần làm gì."""
+
+    def __init__(self, client, key_prefix='session:'):
+        self.client = client
+        self.key_prefix = key_prefix
+
+    def get(self, key):
+        value = self.client.get(self.key_prefix + key)
+        if isinstance(value, bytes):
+            value = value.decode('utf-8')
+        return value
+
+    def set(self, key, value, ttl_seconds):
+        self.client.setex(self.key_prefix + key, int(ttl_seconds), value)
+
+    def delete(self, key):
+        self.client.delete(self.key_prefix + key)
+
+    def sweep(self):
+        return 0
+
+
+class LocalRedis:
+    """
+    Bản thay thế Redis trong bộ nhớ của process (chỉ các lệnh get/setex/delete/ttl mà RedisSessionStore dùng),
+    để chạy và kiểm thử backend 'redis' khi không có Redis server. Không chia sẻ giữa các process.
+    """
+
+    def __init__(self):
+        self._data = {}  # key -> (value bytes, thời điểm hết hạn)
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            item = self._data.get(name)
+            if item is None:
+                return None
+            if item[1] <= time.time():
+                del self._data[name]
+                return None
+            return item[0]
+
+    def setex(self, name, time_seconds, value):
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        with self._lock:
+            self._data[name] = (value, time.time() + time_seconds)
+        return True
+
+    def delete(self, *names):
+        with self._lock:
+            return sum(1 for name in names if self._data.pop(name, None) is not None)
+
+    def ttl(self, name):
+        with self._lock:
+            item = self._data.get(name)
+            if item is None or item[1] <= time.time():
+                return -2
+            return int(item[1] - time.time())
+
+
+class ServerSideSession(SecureCookieSession):
+    """Session dict (theo dõi modified/accessed như cookie session của Flask) kèm session id và thời hạn."""
+
+    def __init__(self, initial=None, sid=None, new=False, expires_at=None):
+        super().__init__(initial)
+        self.sid = sid
+        self.new = new  # True nếu chưa có trong store (chưa gửi cookie cho client)
+        self.expires_at = expires_at  # Thời điểm hết hạn trong store (epoch giây), None nếu mới
+        self.regenerate = False  # True sau clear(): cấp session id mới (chống session fixation khi đăng nhập)
+
+    def clear(self):
+        super().clear()
+        self.regenerate = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    SessionInterface lưu nội dung session trong `store`, cookie chỉ chứa session id ngẫu nhiên.
+
+    - Session rỗng không được lưu và không gửi cookie (khách chỉ xem trang không tạo bản ghi nào).
+    - Chỉ ghi store khi session thay đổi, hoặc khi đã dùng quá nửa thời hạn (gia hạn cho người dùng đang hoạt động).
+    - Thời hạn trong store là app.permanent_session_lifetime tính từ lần ghi cuối.
+    """
+
+    serializer = TaggedJSONSerializer()
+    session_class = ServerSideSession
+
+    def __init__(self, store, sweep_interval=DEFAULT_SWEEP_INTERVAL_SECONDS):
+        self.store = store
+        self.sweep_interval = sweep_interval
+        self._last_sweep = time.monotonic()
+        self._sweep_lock = threading.Lock()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and len(sid) <= MAX_SESSION_ID_LENGTH:
+            try:
+                raw = self.store.get(_storage_key(sid))
+                if raw is not None:
+                    payload = self.serializer.loads(raw)
+                    if payload['e'] > time.time():
+                        return self.session_class(payload['d'], sid=sid, expires_at=payload['e'])
+            except Exception as e:  # Store lỗi hoặc dữ liệu hỏng: coi như session mới, không làm hỏng request
+                print(f"ERROR: Không đọc được server-side session: {e}")
+        return self.session_class(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        cookie_name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        try:
+            if not session:
+                # Session rỗng: xóa bản ghi cũ (ví dụ sau khi đăng xuất) và cookie, không lưu gì
+                if not session.new and (session.modified or session.regenerate):
+                    self.store.delete(_storage_key(session.sid))
+                    response.delete_cookie(cookie_name, domain=domain, path=path,
+                                           secure=self.get_cookie_secure(app),
+                                           samesite=self.get_cookie_samesite(app),
+                                           httponly=self.get_cookie_httponly(app))
+                return
+
+            issue_cookie = session.new
+            if session.regenerate and not session.new:
+                self.store.delete(_storage_key(session.sid))
+                session.sid = secrets.token_urlsafe(32)
+                issue_cookie = True
+
+            lifetime = app.permanent_session_lifetime.total_seconds()
+            now = time.time()
+            needs_refresh = session.expires_at is None or session.expires_at - now < lifetime / 2
+            if not (issue_cookie or session.modified or needs_refresh):
+                return
+
+            expires_at = now + lifetime
+            self.store.set(_storage_key(session.sid),
+                           self.serializer.dumps({'e': expires_at, 'd': dict(session)}), lifetime)
+            session.expires_at = expires_at
+            if issue_cookie or (session.permanent and self.should_set_cookie(app, session)):
+                response.set_cookie(cookie_name, session.sid,
+                                    expires=self.get_expiration_time(app, session),
+                                    httponly=self.get_cookie_httponly(app),
+                                    domain=domain, path=path,
+                                    secure=self.get_cookie_secure(app),
+                                    samesite=self.get_cookie_samesite(app))
+        except Exception as e:  # Không để lỗi của store làm hỏng response
+            print(f"ERROR: Không lưu được server-side session: {e}")
+        finally:
+            self._maybe_sweep()
+
+    def _maybe_sweep(self):
+        """Dọn session hết hạn định kỳ (mỗi process tối đa một lần mỗi sweep_interval giây)."""
+        if not self.sweep_interval or time.monotonic() - self._last_sweep < self.sweep_interval:
+            return
+        if not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sweep = time.monotonic()
+            self.store.sweep()
+        except Exception as e:
+            print(f"ERROR: Dọn server-side session thất bại: {e}")
+        finally:
+            self._sweep_lock.release()
+
+
+class ServerSideSessions:
+    """
+    Extension thay cookie session mặc định của Flask bằng ServerSideSessionInterface.
+
+    Cấu hình:
+      - SESSION_BACKEND: 'sqlalchemy' (mặc định), 'filesystem', 'redis', hoặc 'cookie' (giữ session cookie của Flask).
+      - SESSION_FILE_DIR: thư mục cho backend 'filesystem' (mặc định <instance>/sessions).
+      - SESSION_REDIS: client tương thích Redis (ví dụ LocalRedis()); nếu None thì tạo redis.Redis từ SESSION_REDIS_URL.
+      - SESSION_REDIS_URL, SESSION_KEY_PREFIX: cho backend 'redis'.
+      - SESSION_SWEEP_INTERVAL_SECONDS: chu kỳ dọn session hết hạn (0 để chỉ dọn bằng `flask sweep-sessions`).
+    """
+
+    def __init__(self, app=None):
+        self.store = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.setdefault('SESSION_BACKEND', 'sqlalchemy')
+        sweep_interval = app.config.setdefault('SESSION_SWEEP_INTERVAL_SECONDS', DEFAULT_SWEEP_INTERVAL_SECONDS)
+        app.extensions['server_sessions'] = self
+        if backend == 'cookie':
+            return
+
+        self.store = self._create_store(app, backend)
+        app.session_interface = ServerSideSessionInterface(self.store, sweep_interval=sweep_interval)
+
+    @staticmethod
+    def _create_store(app, backend):
+        if backend == 'sqlalchemy':
+            return SQLAlchemySessionStore()
+        if backend == 'filesystem':
+            directory = app.config.setdefault('SESSION_FILE_DIR', os.path.join(app.instance_path, 'sessions'))
+            return FilesystemSessionStore(directory)
+        if backend == 'redis':
+            client = app.config.setdefault('SESSION_REDIS', None)
+            if client is None:
+                import redis  # Chỉ cần cài redis-py khi dùng Redis server thật
+                client = redis.Redis.from_url(app.config.setdefault('SESSION_REDIS_URL', 'redis://localhost:6379/0'))
+            return RedisSessionStore(client, key_prefix=app.config.setdefault('SESSION_KEY_PREFIX', 'session:'))
+        raise ValueError(f"SESSION_BACKEND không hợp lệ: {backend!r}")
+
+    def sweep(self):
+        """Xóa các session đã hết hạn (cần app context với backend 'sqlalchemy'). Trả về số session đã xóa."""
+        return self.store.sweep() if self.store else 0
@@ -0,0 +1,154 @@
+# single_flight.py
+
+# --- Standard Library Imports ---
+import threading
+
+# --- Application-Specific Imports ---
+from deadline import DeadlineExceeded, current_deadline  # Leader/follower hết thời gian của riêng request mình
+
+DEFAULT_WAIT_TIMEOUT_SECONDS = 30.0  # Lâu hơn timeout dài nhất của các API bên ngoài (xem UPSTREAM_TIMEOUTS)
+
+
+class _Call:
+    """Một lời gọi đang chạy: thread "leader" thực hiện, các thread "follower" chờ kết quả."""
+
+    __slots__ = ('event', 'value', 'error', 'ok')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+        self.ok = False  # False nếu leader bỏ cuộc (follower tự gọi lấy)
+
+
+class SingleFlight:
+    """
+    Gộp các lời gọi trùng nhau đang chạy đồng thời trong cùng process (single-flight):
+    với mỗi khóa (ví dụ ('dictionary', 'hello', 'en', 'en')) chỉ một thread thực sự gọi API,
+    các thread khác yêu cầu cùng khóa trong lúc đó chờ và dùng chung kết quả (hoặc exception).
+
+    Khi cả lớp dán cùng một danh sách từ cùng lúc, mỗi từ chỉ được gọi tới API một lần.
+    Thống kê theo nguồn (phần tử đầu của khóa): số lời gọi thật ('calls'), số yêu cầu được gộp ('coalesced'),
+    số lần chờ quá SINGLE_FLIGHT_WAIT_TIMEOUT ('timeouts').
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.wait_timeout = DEFAULT_WAIT_TIMEOUT_SECONDS
+        self._calls = {}  # khóa -> _Call đang chạy
+        self._lock = threading.Lock()
+        self._stats = {}  # nguồn -> {'calls', 'coalesced', 'timeouts'}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Đọc cấu hình từ app.config:
+          - SINGLE_FLIGHT_ENABLED: False để mọi yêu cầu tự gọi API (như trước).
+          - SINGLE_FLIGHT_WAIT_TIMEOUT: thời gian follower chờ tối đa (giây) trước khi tự gọi API.
+        """
+        self.enabled = app.config.setdefault('SINGLE_FLIGHT_ENABLED', True)
+        self.wait_timeout = app.config.setdefault('SINGLE_FLIGHT_WAIT_TIMEOUT', DEFAULT_WAIT_TIMEOUT_SECONDS)
+
+    @staticmethod
+    def _source(key):
+        return key[0] if isinstance(key, tuple) else str(key)
+
+    def _count(self, key, counter):
+        # Gọi khi đang giữ self._lock
+        source_stats = self._stats.setdefault(self._source(key), {'calls': 0, 'coalesced': 0, 'timeouts': 0})
+        source_stats[counter] += 1
+
+    def get_stats(self):
+        """Thống kê theo nguồn (tính từ khi process khởi động), kèm số lời gọi đang chạy."""
+        with self._lock:
+            stats = []
+            for source, counters in sorted(self._stats.items()):
+                requests_total = counters['calls'] + counters['coalesced']
+                stats.append(dict(counters, source=source, requests=requests_total,
+                                  coalesce_rate=round(100.0 * counters['coalesced'] / requests_total, 1)
+                                  if requests_total else 0.0))
+            return {'sources': stats, 'in_flight': len(self._calls)}
+
+    # --- API mức thấp (dùng khi một leader xử lý nhiều khóa cùng lúc, ví dụ dịch theo batch) ---
+
+    def begin(self, key):
+        """
+        Tham gia lời gọi cho `key`.
+
+        Returns:
+            tuple: (call, is_leader). Leader phải gọi finish(key, call, ...) đúng một lần;
+                   follower gọi wait(key, call).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._count(key, 'coalesced')
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            self._count(key, 'calls')
+            return call, True
+
+    def finish(self, key, call, value=None, error=None, ok=True):
+        """
+        Leader công bố kết quả (hoặc `error`) cho các follower và kết thúc lời gọi.
+        ok=False nghĩa là leader không có kết quả cho khóa này; follower sẽ tự gọi lấy.
+        """
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.value, call.error, call.ok = value, error, ok and error is None
+        call.event.set()
+
+    def wait(self, key, call):
+        """
+        Follower chờ kết quả của leader, tối đa wait_timeout giây và không quá deadline của request hiện tại.
+
+        Returns:
+            tuple: (ok, value); ok=False nếu leader bỏ cuộc hoặc chờ quá wait_timeout.
+
+        Raises:
+            DeadlineExceeded: Nếu deadline của request hiện tại hết trước khi leader xong.
+            Exception: Exception mà lời gọi của leader đã ném ra.
+        """
+        deadline = current_deadline()
+        wait_timeout = self.wait_timeout if deadline is None else min(self.wait_timeout, deadline.remaining())
+        if not call.event.wait(wait_timeout):
+            if deadline is not None and deadline.expired:
+                raise DeadlineExceeded(f"single-flight wait for {key!r}")
+            with self._lock:
+                self._count(key, 'timeouts')
+            return False, None
+        if call.error is not None:
+            raise call.error
+        return call.ok, call.value
+
+    # --- API chính ---
+
+    def do(self, key, func):
+        """
+        Gọi func() cho `key`, hoặc dùng chung kết quả nếu một thread khác đang gọi cho cùng khóa.
+        Nếu leader lỗi, exception được ném lại ở mọi follower; nếu leader bỏ cuộc/quá thời gian chờ,
+        hoặc lời gọi của leader bị cắt vì deadline của request leader (DeadlineExceeded), follower tự gọi func().
+        Follower hết deadline của chính mình trong lúc chờ thì nhận DeadlineExceeded.
+        """
+        if not self.enabled:
+            return func()
+        call, is_leader = self.begin(key)
+        if not is_leader:
+            ok, value = self.wait(key, call)
+            return value if ok else func()
+        try:
+            value = func()
+        except DeadlineExceeded:
+            self.finish(key, call, ok=False)  # Follower có deadline riêng, có thể còn thời gian để tự gọi
+            raise
+        except Exception as e:
+            self.finish(key, call, error=e)
+            raise
+        except BaseException:  # KeyboardInterrupt, SystemExit...: không chuyển cho follower
+            self.finish(key, call, ok=False)
+            raise
+        self.finish(key, call, value)
+        return value
@@ -0,0 +1,151 @@
+# sqlite_tuning.py
+
+# --- Standard Library Imports ---
+import re
+import threading
+import time
+
+# --- Third-party Library Imports ---
+from sqlalchemy import event
+
+# --- Application-Specific Imports ---
+from models import db
+
+# Các bộ PRAGMA áp dụng cho MỖI connection SQLite mới (mọi bind: database chính và database telemetry).
+# Thứ tự có ý nghĩa: busy_timeout được đặt trước để việc chuyển journal_mode cũng chờ khóa thay vì báo lỗi.
+PROFILES = {
+    # - journal_mode=WAL: người đọc không bị chặn bởi người ghi (và ngược lại), chỉ các người ghi phải xếp hàng.
+    # - synchronous=NORMAL: với WAL vẫn an toàn khi app bị dừng đột ngột, chỉ có thể mất vài commit cuối
+    #   nếu cả máy mất điện; fsync ít hơn nhiều so với FULL.
+    # - busy_timeout: chờ khóa ghi tối đa 5 giây thay vì trả về "database is locked" ngay.
+    # - cache_size âm là KiB (20 MB mỗi connection), mmap_size là byte (256 MB), temp_store=MEMORY cho sort/index tạm.
+    # - journal_size_limit: file -wal được thu nhỏ lại sau checkpoint thay vì giữ kích thước lớn nhất từng có.
+    'production': {
+        'busy_timeout': 5000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -20000,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+        'journal_size_limit': 67108864,
+    },
+    # Giữ mặc định của SQLite (rollback journal, synchronous=FULL); dùng để so sánh trong benchmark.
+    'default': {},
+}
+DEFAULT_PROFILE = 'production'
+DEFAULT_OPTIMIZE_INTERVAL_SECONDS = 3600
+OPTIMIZE_ANALYSIS_LIMIT = 400  # Số dòng tối đa ANALYZE đọc cho mỗi index khi PRAGMA optimize (giữ optimize nhanh)
+
+_PRAGMA_NAME = re.compile(r'^[a-z_]+$')
+_PRAGMA_VALUE = re.compile(r'^-?[\w.]+$')
+
+
+class SQLiteTuning:
+    """
+    Extension cấu hình connection SQLite của mọi bind và chạy PRAGMA optimize định kỳ.
+
+    Cấu hình:
+      - SQLITE_PRAGMA_PROFILE: tên profile trong PROFILES (mặc định 'production').
+      - SQLITE_PRAGMAS: dict PRAGMA ghi đè lên profile cho mọi bind, ví dụ {'cache_size': -64000}.
+      - SQLITE_BIND_PRAGMAS: {bind key: dict PRAGMA} ghi đè riêng cho từng bind (None là database chính).
+      - SQLITE_OPTIMIZE_INTERVAL_SECONDS: chu kỳ chạy PRAGMA optimize trong thread nền sau một request
+        (mặc định 3600, lần đầu ngay sau request đầu tiên; 0 để chỉ chạy bằng `flask optimize-db`).
+
+    Lưu ý: WAL cần các process dùng chung bộ nhớ trên cùng một máy, không dùng được với file database
+    trên ổ mạng (NFS/SMB); khi đó dùng profile 'default'.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.pragmas_by_bind = {}
+        self.journal_modes = {}  # journal_mode thực tế của từng bind (đọc từ connection đầu tiên)
+        self.interval = 0
+        self._last_optimize = None
+        self._optimize_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Gắn listener 'connect' vào engine của mọi bind SQLite. Phải gọi sau db.init_app(app)."""
+        self.app = app
+        profile = app.config.setdefault('SQLITE_PRAGMA_PROFILE', DEFAULT_PROFILE)
+        if profile not in PROFILES:
+            raise ValueError(f"SQLITE_PRAGMA_PROFILE không hợp lệ: {profile!r}")
+        overrides = app.config.setdefault('SQLITE_PRAGMAS', {})
+        bind_overrides = app.config.setdefault('SQLITE_BIND_PRAGMAS', {})
+        self.interval = app.config.setdefault('SQLITE_OPTIMIZE_INTERVAL_SECONDS', DEFAULT_OPTIMIZE_INTERVAL_SECONDS)
+
+        with app.app_context():
+            engines = dict(db.engines)
+        for bind_key, engine in engines.items():
+            if engine.dialect.name != 'sqlite':
+                continue
+            pragmas = dict(PROFILES[profile], **overrides, **bind_overrides.get(bind_key, {}))
+            for name, value in pragmas.items():
+                if not _PRAGMA_NAME.match(name) or not _PRAGMA_VALUE.match(str(value)):
+                    raise ValueError(f"PRAGMA không hợp lệ: {name}={value!r}")
+            self.pragmas_by_bind[bind_key] = pragmas
+            event.listen(engine, 'connect', self._make_connect_listener(bind_key, pragmas))
+
+        app.extensions['sqlite_tuning'] = self
+        app.after_request(self._maybe_optimize_in_background)
+
+    def _make_connect_listener(self, bind_key, pragmas):
+        def set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for name, value in pragmas.items():
+                    result = cursor.execute(f"PRAGMA {name}={value}").fetchone()
+                    if name == 'journal_mode' and result is not None:
+                        self.journal_modes[bind_key] = result[0]
+            finally:
+                cursor.close()
+        return set_pragmas
+
+    # --- PRAGMA optimize / ANALYZE ---
+
+    def optimize(self, analyze=False):
+        """
+        Chạy PRAGMA optimize (SQLite chỉ ANALYZE lại các bảng có thống kê đã cũ, giới hạn OPTIMIZE_ANALYSIS_LIMIT
+        dòng mỗi index) trên mọi bind SQLite; với analyze=True chạy ANALYZE đầy đủ. Cần app context.
+
+        Returns:
+            dict: {bind key: thời gian chạy (giây)}.
+        """
+        durations = {}
+        for bind_key in self.pragmas_by_bind:
+            start = time.perf_counter()
+            with db.engines[bind_key].begin() as connection:
+                if analyze:
+                    connection.exec_driver_sql("ANALYZE")
+                else:
+                    connection.exec_driver_sql(f"PRAGMA analysis_limit={OPTIMIZE_ANALYSIS_LIMIT}")
+                    connection.exec_driver_sql("PRAGMA optimize")
+            durations[bind_key] = time.perf_counter() - start
+        return durations
+
+    def _maybe_optimize_in_background(self, response):
+        """after_request: chạy optimize() trong thread nền, mỗi process tối đa một lần mỗi interval giây."""
+        if not self.interval or (self._last_optimize is not None
+                                 and time.monotonic() - self._last_optimize < self.interval):
+            return response
+        if self._optimize_lock.acquire(blocking=False):
+            self._last_optimize = time.monotonic()
+            threading.Thread(target=self._optimize_in_app_context, name='sqlite-optimize', daemon=True).start()
+        return response
+
+    def _optimize_in_app_context(self):
+        try:
+            with self.app.app_context():
+                self.optimize()
+        except Exception as e:
+            print(f"ERROR: PRAGMA optimize thất bại: {e}")
+        finally:
+            self._optimize_lock.release()
+
+    def get_stats(self):
+        """PRAGMA đang áp dụng và journal_mode thực tế của từng bind (tên bind None hiển thị là 'main')."""
+        return [{'bind': bind_key or 'main',
+                 'journal_mode': self.journal_modes.get(bind_key),
+                 'pragmas': pragmas}
+                for bind_key, pragmas in self.pragmas_by_bind.items()]
@@ -0,0 +1,121 @@
+# telemetry_db.py
+
+# --- Third-party Library Imports ---
+from sqlalchemy import MetaData, Table, inspect, select, literal, tuple_, update, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert  # INSERT ... ON CONFLICT (app dùng SQLite)
+
+# --- Application-Specific Imports ---
+from models import db, TELEMETRY_BIND_KEY, TelemetryMoveProgress
+from keyset import encode_cursor, decode_cursor  # Vị trí dòng cuối đã chép, lưu trong TelemetryMoveProgress.last_key
+
+# Chuyển dữ liệu telemetry (api_log, user_activity và các bảng tổng hợp của api_log) từ database chính
+# của các phiên bản trước sang database telemetry riêng (xem models.TELEMETRY_BIND_KEY).
+
+
+def telemetry_tables():
+    """Các bảng thuộc bind telemetry (trừ bảng tiến độ chuyển dữ liệu), theo thứ tự tạo."""
+    return [table for table in db.metadatas[TELEMETRY_BIND_KEY].sorted_tables
+            if table.name != TelemetryMoveProgress.__tablename__]
+
+
+def move_legacy_tables(batch_size=5000):
+    """
+    Sao chép các bảng telemetry còn trong database chính sang database telemetry (từng lô `batch_size` dòng),
+    rồi xóa chúng khỏi database chính. Cần chạy `flask db -d migrations_telemetry upgrade` trước.
+
+    - Nếu bảng đích còn trống, các dòng được chép nguyên (kể cả id).
+    - Nếu bảng đích đã có dữ liệu (app đã chạy với database telemetry trước khi chuyển): bảng có cột id được
+      chép với id mới; bảng tổng hợp (khóa chính nhiều cột) được cộng dồn vào dòng cùng khóa.
+
+    Chạy lại an toàn nếu lần trước bị dừng giữa chừng: mỗi lô được chép theo thứ tự khóa chính và vị trí dòng cuối
+    được ghi vào TelemetryMoveProgress trong cùng transaction với lô đó, nên lần sau chép tiếp từ đúng chỗ đó
+    (không chép lại, không cộng dồn hai lần); bảng cũ chỉ bị xóa sau khi đã chép xong.
+
+    Returns:
+        dict: {tên bảng: số dòng đã chuyển}; rỗng nếu hai bind dùng chung một database.
+    """
+    main_engine = db.engines[None]
+    telemetry_engine = db.engines[TELEMETRY_BIND_KEY]
+    if main_engine.url == telemetry_engine.url:
+        return {}
+
+    progress_table = TelemetryMoveProgress.__table__
+    legacy_table_names = set(inspect(main_engine).get_table_names())
+    moved = {}
+    for table in telemetry_tables():
+        if table.name not in legacy_table_names:
+            # Bảng cũ đã bị xóa: tiến độ còn sót (dừng sau khi xóa bảng) không còn ý nghĩa
+            with telemetry_engine.begin() as connection:
+                connection.execute(delete(progress_table).where(progress_table.c.table_name == table.name))
+            continue
+        legacy = Table(table.name, MetaData(), autoload_with=main_engine)
+        progress = _load_progress(telemetry_engine, table)
+        rows_moved = progress.rows_moved
+        if not progress.copied:
+            rows_moved = _copy_table(main_engine, telemetry_engine, legacy, table, progress, batch_size)
+
+        with main_engine.begin() as connection:
+            legacy.drop(connection)
+        with telemetry_engine.begin() as connection:
+            connection.execute(delete(progress_table).where(progress_table.c.table_name == table.name))
+        moved[table.name] = rows_moved
+    return moved
+
+
+def _load_progress(telemetry_engine, table):
+    """Tiến độ của lần chuyển trước (nếu bị dừng giữa chừng), hoặc bắt đầu mới: quyết định giữ id một lần duy nhất."""
+    progress_table = TelemetryMoveProgress.__table__
+    with telemetry_engine.begin() as connection:
+        progress = connection.execute(
+            select(progress_table).where(progress_table.c.table_name == table.name)).first()
+        if progress is None:
+            target_empty = connection.execute(select(literal(1)).select_from(table).limit(1)).first() is None
+            connection.execute(progress_table.insert().values(
+                table_name=table.name, keep_ids=target_empty, last_key=None, rows_moved=0, copied=False))
+            progress = connection.execute(
+                select(progress_table).where(progress_table.c.table_name == table.name)).first()
+    return progress
+
+
+def _copy_table(main_engine, telemetry_engine, legacy, table, progress, batch_size):
+    """
+    Chép các dòng của bảng cũ sau progress.last_key sang bảng đích, từng lô theo thứ tự khóa chính.
+
+    Returns:
+        int: Tổng số dòng đã chép (kể cả các lần chạy trước).
+    """
+    progress_table = TelemetryMoveProgress.__table__
+    key_columns = [legacy.c[column.name] for column in table.primary_key]
+    columns = [column.name for column in table.columns if column.name in legacy.c]
+    insert_columns = list(columns)
+    if not progress.keep_ids and 'id' in table.c:
+        insert_columns.remove('id')  # Tránh trùng id với log đã ghi vào database telemetry
+
+    statement = sqlite_insert(table)
+    if not progress.keep_ids and 'id' not in table.c:
+        statement = statement.on_conflict_do_update(
+            index_elements=[column.name for column in table.primary_key],
+            set_={column.name: table.c[column.name] + statement.excluded[column.name]
+                  for column in table.columns if not column.primary_key})
+
+    last_key, rows_moved = progress.last_key, progress.rows_moved
+    while True:
+        query = select(*[legacy.c[name] for name in columns]).order_by(*key_columns).limit(batch_size)
+        if last_key:
+            query = query.where(tuple_(*key_columns) > tuple_(*decode_cursor(last_key, key_columns)))
+        with main_engine.connect() as source:
+            rows = source.execute(query).all()
+        if not rows:
+            break
+        last_key = encode_cursor([getattr(rows[-1], column.name) for column in key_columns])
+        rows_moved += len(rows)
+        # Lô dòng và vị trí mới trong cùng một transaction: hoặc cả hai được ghi, hoặc không gì cả
+        with telemetry_engine.begin() as target:
+            target.execute(statement, [{name: row._mapping[name] for name in insert_columns} for row in rows])
+            target.execute(update(progress_table).where(progress_table.c.table_name == table.name)
+                           .values(last_key=last_key, rows_moved=rows_moved))
+
+    with telemetry_engine.begin() as target:
+        target.execute(update(progress_table).where(progress_table.c.table_name == table.name)
+                       .values(copied=True))
+    return rows_moved
@@ -0,0 +1,442 @@
+# upstream.py
+
+# --- Standard Library Imports ---
+import threading  # Khóa tạo session và cache translator theo từng thread
+import time
+from collections import deque  # Cửa sổ trượt các kết quả gọi gần đây của circuit breaker
+from contextlib import contextmanager
+from contextvars import ContextVar  # Session và timeout của lời gọi Google Translate hiện tại (riêng cho từng thread)
+
+# --- Third-party Library Imports ---
+import requests  # Gửi các yêu cầu HTTP tới API bên ngoài
+from requests.adapters import HTTPAdapter  # Cấu hình connection pool cho mỗi session
+from deep_translator import GoogleTranslator  # Thư viện dịch thuật sử dụng Google Translate
+from deep_translator import google as deep_translator_google  # Module gọi requests.get của GoogleTranslator
+
+# --- Application-Specific Imports ---
+from deadline import DeadlineExceeded, current_deadline  # Deadline của request hiện tại (rút ngắn timeout của từng lời gọi)
+
+# Timeout mặc định cho từng API: (connect timeout, read timeout), đơn vị giây.
+# Connect timeout ngắn để phát hiện nhanh host không phản hồi; read timeout giữ như các giá trị cũ trong app.py.
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_TIMEOUTS = {
+    'dictionary_api': (DEFAULT_CONNECT_TIMEOUT, 15),
+    'tatoeba_api': (DEFAULT_CONNECT_TIMEOUT, 10),
+    'deep_translator_google': (DEFAULT_CONNECT_TIMEOUT, 10),
+    'libretranslate_batch': (DEFAULT_CONNECT_TIMEOUT, 45),
+    'libretranslate_single': (DEFAULT_CONNECT_TIMEOUT, 20),
+}
+DEFAULT_READ_TIMEOUT = 15  # Dùng cho API chưa có trong DEFAULT_TIMEOUTS
+DEFAULT_POOL_MAXSIZE = 20  # Số kết nối keep-alive tối đa giữ lại cho mỗi host
+
+# Bulkhead: số lời gọi đồng thời tối đa tới mỗi API. Tổng nhỏ hơn ENRICHMENT_MAX_WORKERS (12) cho từng API,
+# nên một API chậm chỉ giữ được một phần worker, phần còn lại vẫn phục vụ các API khác.
+DEFAULT_MAX_CONCURRENCY = {
+    'dictionary_api': 6,
+    'tatoeba_api': 6,
+    'deep_translator_google': 6,
+    'libretranslate_batch': 2,
+    'libretranslate_single': 4,
+}
+DEFAULT_API_MAX_CONCURRENCY = 4  # Dùng cho API chưa có trong DEFAULT_MAX_CONCURRENCY
+DEFAULT_BULKHEAD_WAIT_SECONDS = 2.0  # Chờ tối đa bấy lâu để có chỗ, sau đó trả về giá trị dự phòng
+
+# Circuit breaker (áp dụng cho từng API)
+DEFAULT_BREAKER = {
+    'window_seconds': 60,  # Chỉ xét các lời gọi trong 60 giây gần nhất
+    'min_calls': 10,  # Cần ít nhất bấy nhiêu lời gọi trong cửa sổ mới xét mở mạch
+    'failure_rate': 0.5,  # Mở mạch khi >= 50% lời gọi lỗi (exception, HTTP 5xx/429)
+    'slow_call_seconds': 5.0,  # Lời gọi lâu hơn bấy nhiêu giây được coi là chậm
+    'slow_call_rate': 0.5,  # Mở mạch khi >= 50% lời gọi chậm
+    'open_seconds': 30,  # Thời gian mạch mở trước khi cho lời gọi thử (half-open)
+    'half_open_max_calls': 1,  # Số lời gọi thử đồng thời khi half-open
+}
+
+
+# GoogleTranslator.translate() gọi thẳng requests.get (không session, không timeout). Module requests mà
+# deep_translator.google dùng được thay bằng _TranslatorRequests: trong UpstreamClient.translate(), GET đi qua
+# session và timeout (đã rút ngắn theo deadline) của lời gọi hiện tại; ngoài đó vẫn là requests.get như cũ.
+_translator_call = ContextVar('translator_call', default=None)  # (session, timeout)
+
+
+class _TranslatorRequests:
+    """Thay cho module requests trong deep_translator.google."""
+
+    def get(self, url, **kwargs):
+        call = _translator_call.get()
+        if call is None:
+            return requests.get(url, **kwargs)
+        session, timeout = call
+        kwargs.setdefault('timeout', timeout)
+        return session.get(url, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+
+deep_translator_google.requests = _TranslatorRequests()
+
+
+class UpstreamUnavailable(requests.exceptions.RequestException):
+    """
+    Không gọi API vì circuit breaker đang mở, bulkhead đã đầy, hoặc request đã hết thời gian (deadline).
+    Là một RequestException, nên các chỗ đang bắt lỗi request vẫn trả về giá trị dự phòng như khi API lỗi.
+    """
+
+    def __init__(self, api_name, reason):
+        super().__init__(f"{api_name} unavailable: {reason}")
+        self.api_name = api_name
+        self.reason = reason  # 'circuit_open', 'bulkhead_full' hoặc 'deadline_exceeded'
+
+
+class UpstreamError(requests.exceptions.RequestException):
+    """
+    API đã được gọi nhưng lỗi tạm thời (timeout, lỗi kết nối, HTTP 5xx/429, phản hồi không đọc được).
+    Khác với kết quả "không tìm thấy" (404, danh sách rỗng): không được lưu vào word_cache.
+    """
+
+    def __init__(self, api_name, reason):
+        super().__init__(f"{api_name} error: {reason}")
+        self.api_name = api_name
+        self.reason = reason
+
+
+class UpstreamDeadlineExceeded(UpstreamUnavailable, DeadlineExceeded):
+    """Lời gọi bắt đầu sau deadline của request, hoặc bị cắt vì timeout đã được rút ngắn theo deadline."""
+
+    def __init__(self, api_name):
+        super().__init__(api_name, 'deadline_exceeded')
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker cho một API: closed -> open khi tỉ lệ lỗi hoặc tỉ lệ lời gọi chậm trong cửa sổ trượt vượt ngưỡng;
+    open -> half_open sau open_seconds (cho half_open_max_calls lời gọi thử); lời gọi thử thành công -> closed,
+    thất bại -> open lại.
+    """
+
+    def __init__(self, window_seconds, min_calls, failure_rate, slow_call_seconds, slow_call_rate,
+                 open_seconds, half_open_max_calls):
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.state = 'closed'
+        self._outcomes = deque()  # (thời điểm, thành công?, chậm?)
+        self._opened_at = 0.0
+        self._probes = 0  # Số lời gọi thử đang chạy khi half_open
+        self._lock = threading.Lock()
+        self.stats = {'opened': 0, 'rejected': 0}
+
+    def _trim(self, now):
+        while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+            self._outcomes.popleft()
+
+    def allow(self):
+        """True nếu được phép gọi; lời gọi được phép phải kết thúc bằng record()."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == 'open' and now - self._opened_at >= self.open_seconds:
+                self.state = 'half_open'
+                self._probes = 0
+            if self.state == 'closed':
+                return True
+            if self.state == 'half_open' and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return True
+            self.stats['rejected'] += 1
+            return False
+
+    def record(self, success, elapsed):
+        """Ghi nhận kết quả của một lời gọi đã được allow()."""
+        with self._lock:
+            now = time.monotonic()
+            slow = elapsed >= self.slow_call_seconds
+            if self.state == 'half_open':
+                self._probes = max(0, self._probes - 1)
+                if success and not slow:
+                    self.state = 'closed'
+                    self._outcomes.clear()
+                else:
+                    self._open(now)
+                return
+            if self.state != 'closed':
+                return  # Lời gọi bắt đầu trước khi mạch mở
+            self._outcomes.append((now, success, slow))
+            self._trim(now)
+            calls = len(self._outcomes)
+            if calls < self.min_calls:
+                return
+            failures = sum(1 for _, ok, _ in self._outcomes if not ok)
+            slow_calls = sum(1 for _, _, is_slow in self._outcomes if is_slow)
+            if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_call_rate:
+                self._open(now)
+
+    def release(self):
+        """Trả lại lượt gọi đã allow() nhưng không thực hiện (ví dụ bulkhead đầy)."""
+        with self._lock:
+            if self.state == 'half_open':
+                self._probes = max(0, self._probes - 1)
+
+    def _open(self, now):
+        self.state = 'open'
+        self._opened_at = now
+        self._outcomes.clear()
+        self.stats['opened'] += 1
+
+    def snapshot(self):
+        """Trạng thái hiện tại (cho trang admin)."""
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            calls = len(self._outcomes)
+            failures = sum(1 for _, ok, _ in self._outcomes if not ok)
+            slow_calls = sum(1 for _, _, is_slow in self._outcomes if is_slow)
+            state = self.state
+            retry_in = 0
+            if state == 'open':
+                retry_in = max(0.0, self.open_seconds - (now - self._opened_at))
+                if retry_in == 0:
+                    state = 'half_open'  # Lời gọi tiếp theo sẽ là lời gọi thử
+            return {
+                'state': state,
+                'calls': calls,
+                'failure_rate': round(100.0 * failures / calls, 1) if calls else 0.0,
+                'slow_rate': round(100.0 * slow_calls / calls, 1) if calls else 0.0,
+                'retry_in': round(retry_in, 1),
+                'opened': self.stats['opened'],
+                'rejected': self.stats['rejected'],
+            }
+
+
+class UpstreamClient:
+    """
+    Lớp HTTP dùng chung cho mọi lời gọi tới API bên ngoài (dictionaryapi.dev, Tatoeba, LibreTranslate).
+
+    Thay vì gọi trực tiếp requests.get/post (mỗi lần mở một kết nối TCP + TLS mới), mỗi API
+    có một requests.Session riêng với connection pool keep-alive theo từng host, nên các lời gọi
+    liên tiếp (kể cả từ nhiều thread của EnrichmentEngine) dùng lại kết nối đã mở.
+
+    Mỗi API còn được bảo vệ bởi một circuit breaker và một bulkhead (giới hạn số lời gọi đồng thời),
+    xem guard(): khi API chậm/lỗi liên tục, lời gọi bị từ chối ngay bằng UpstreamUnavailable thay vì
+    giữ worker thread tới hết timeout.
+
+    Nếu thread hiện tại có deadline (xem deadline.py), timeout của lời gọi được rút ngắn theo thời gian còn lại;
+    lời gọi bắt đầu sau deadline, hoặc bị cắt vì deadline, ném UpstreamDeadlineExceeded.
+
+    Ngoài ra lớp này giữ các instance GoogleTranslator để dùng lại. GoogleTranslator.translate()
+    ghi vào thuộc tính của chính instance nên không an toàn khi nhiều thread dùng chung;
+    vì vậy mỗi thread có cache translator riêng theo cặp ngôn ngữ. Lời gọi dịch đi qua translate() để dùng
+    session, timeout và deadline như request().
+    """
+
+    def __init__(self, app=None):
+        self._sessions = {}  # api_name -> requests.Session
+        self._lock = threading.Lock()
+        self._local = threading.local()  # Cache GoogleTranslator của từng thread
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        self.pool_maxsize = DEFAULT_POOL_MAXSIZE
+        self.max_concurrency = dict(DEFAULT_MAX_CONCURRENCY)
+        self.bulkhead_wait = DEFAULT_BULKHEAD_WAIT_SECONDS
+        self.breaker_settings = dict(DEFAULT_BREAKER)
+        self._guards = {}  # api_name -> (CircuitBreaker, BoundedSemaphore, bộ đếm)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Đọc cấu hình từ app.config:
+          - UPSTREAM_TIMEOUTS: dict {api_name: (connect, read)} ghi đè timeout mặc định.
+          - UPSTREAM_POOL_MAXSIZE: số kết nối keep-alive tối đa cho mỗi host.
+          - UPSTREAM_MAX_CONCURRENCY: dict {api_name: số lời gọi đồng thời tối đa} ghi đè bulkhead mặc định.
+          - UPSTREAM_BULKHEAD_WAIT_SECONDS: thời gian chờ tối đa khi bulkhead đầy.
+          - UPSTREAM_BREAKER: dict ghi đè các ngưỡng của circuit breaker (xem DEFAULT_BREAKER).
+        """
+        self.timeouts.update(app.config.setdefault('UPSTREAM_TIMEOUTS', {}))
+        self.pool_maxsize = app.config.setdefault('UPSTREAM_POOL_MAXSIZE', DEFAULT_POOL_MAXSIZE)
+        self.max_concurrency.update(app.config.setdefault('UPSTREAM_MAX_CONCURRENCY', {}))
+        self.bulkhead_wait = app.config.setdefault('UPSTREAM_BULKHEAD_WAIT_SECONDS', DEFAULT_BULKHEAD_WAIT_SECONDS)
+        self.breaker_settings.update(app.config.setdefault('UPSTREAM_BREAKER', {}))
+        with self._lock:
+            self._guards.clear()  # Tạo lại theo cấu hình mới ở lần gọi tiếp theo
+        app.extensions['upstream'] = self
+
+    # --- Circuit breaker + bulkhead ---
+
+    def _guard_for(self, api_name):
+        guard = self._guards.get(api_name)
+        if guard is None:
+            with self._lock:
+                guard = self._guards.get(api_name)
+                if guard is None:
+                    max_concurrency = self.max_concurrency.get(api_name, DEFAULT_API_MAX_CONCURRENCY)
+                    guard = self._guards[api_name] = (
+                        CircuitBreaker(**self.breaker_settings),
+                        threading.BoundedSemaphore(max_concurrency),
+                        {'max_concurrency': max_concurrency, 'in_flight': 0, 'bulkhead_rejected': 0,
+                         'deadline_exceeded': 0},
+                    )
+        return guard
+
+    @contextmanager
+    def guard(self, api_name):
+        """
+        Bọc một lời gọi tới API `api_name` (dùng cho cả các thư viện không đi qua request(), như deep_translator).
+
+        Raises:
+            UpstreamUnavailable: Nếu request đã quá deadline, circuit breaker đang mở, hoặc bulkhead vẫn đầy
+                                 sau bulkhead_wait giây (không chờ quá deadline).
+
+        Yields:
+            dict: Đặt outcome['success'] = False nếu lời gọi "thành công" về mặt kỹ thuật nhưng nên tính là lỗi
+                  (ví dụ HTTP 5xx). Exception ném ra trong khối with luôn được tính là lỗi, trừ
+                  UpstreamDeadlineExceeded (lời gọi bị cắt vì deadline không phải lỗi của API).
+        """
+        breaker, semaphore, counters = self._guard_for(api_name)
+        deadline = current_deadline()
+        if deadline is not None and deadline.expired:
+            with self._lock:
+                counters['deadline_exceeded'] += 1
+            raise UpstreamDeadlineExceeded(api_name)
+        if not breaker.allow():
+            raise UpstreamUnavailable(api_name, 'circuit_open')
+        bulkhead_wait = self.bulkhead_wait if deadline is None else min(self.bulkhead_wait, deadline.remaining())
+        if not semaphore.acquire(timeout=bulkhead_wait):
+            breaker.release()
+            with self._lock:
+                counters['bulkhead_rejected'] += 1
+            raise UpstreamUnavailable(api_name, 'bulkhead_full')
+
+        with self._lock:
+            counters['in_flight'] += 1
+        outcome = {'success': True}
+        started = time.monotonic()
+        try:
+            yield outcome
+        except UpstreamDeadlineExceeded:
+            outcome['success'] = None
+            raise
+        except Exception:
+            outcome['success'] = False
+            raise
+        finally:
+            if outcome['success'] is None:
+                breaker.release()
+            else:
+                breaker.record(outcome['success'], time.monotonic() - started)
+            with self._lock:
+                counters['in_flight'] -= 1
+                if outcome['success'] is None:
+                    counters['deadline_exceeded'] += 1
+            semaphore.release()
+
+    def get_resilience_stats(self):
+        """Trạng thái circuit breaker và bulkhead của từng API đã được gọi (cho trang /admin/api-logs)."""
+        with self._lock:
+            guards = list(self._guards.items())
+        stats = []
+        for api_name, (breaker, _, counters) in sorted(guards):
+            with self._lock:
+                counters_copy = dict(counters)
+            stats.append(dict(breaker.snapshot(), api_name=api_name, **counters_copy))
+        return stats
+
+    # --- HTTP ---
+
+    def _create_session(self):
+        session = requests.Session()
+        # pool_block=False: khi pool đầy, vẫn mở thêm kết nối tạm thay vì bắt thread phải chờ
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_maxsize, pool_block=False)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def session_for(self, api_name):
+        """Lấy (hoặc tạo) session dùng chung của một API."""
+        session = self._sessions.get(api_name)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(api_name)
+                if session is None:
+                    session = self._sessions[api_name] = self._create_session()
+        return session
+
+    def timeout_for(self, api_name):
+        """Trả về tuple (connect timeout, read timeout) đã cấu hình cho API."""
+        return self.timeouts.get(api_name, (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT))
+
+    def request(self, api_name, method, url, **kwargs):
+        """
+        Gửi request qua session của api_name (qua circuit breaker và bulkhead của API đó).
+        Nếu không truyền timeout, dùng timeout đã cấu hình; timeout không vượt quá thời gian còn lại của deadline.
+        HTTP 5xx và 429 được tính là lỗi cho breaker.
+        """
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout_for(api_name)
+        with self.guard(api_name) as outcome:
+            deadline = current_deadline()
+            configured_timeout = kwargs['timeout']
+            if deadline is not None:
+                kwargs['timeout'] = deadline.clamp(configured_timeout)
+            try:
+                response = self.session_for(api_name).request(method, url, **kwargs)
+            except requests.exceptions.Timeout as e:
+                if kwargs['timeout'] != configured_timeout:  # Timeout do deadline rút ngắn, không phải do API
+                    raise UpstreamDeadlineExceeded(api_name) from e
+                raise
+            outcome['success'] = response.status_code < 500 and response.status_code != 429
+        return response
+
+    def get(self, api_name, url, **kwargs):
+        return self.request(api_name, 'GET', url, **kwargs)
+
+    def post(self, api_name, url, **kwargs):
+        return self.request(api_name, 'POST', url, **kwargs)
+
+    # --- Google Translate (deep_translator) ---
+
+    def get_translator(self, source='auto', target='vi'):
+        """Lấy GoogleTranslator của thread hiện tại cho cặp ngôn ngữ (source, target)."""
+        translators = getattr(self._local, 'translators', None)
+        if translators is None:
+            translators = self._local.translators = {}
+        translator = translators.get((source, target))
+        if translator is None:
+            translator = translators[(source, target)] = GoogleTranslator(source=source, target=target)
+        return translator
+
+    def translate(self, text, source='auto', target='vi', api_name='deep_translator_google'):
+        """
+        Dịch `text` bằng GoogleTranslator qua circuit breaker/bulkhead của api_name, với session dùng chung và
+        timeout đã cấu hình (rút ngắn theo deadline) như request().
+
+        Raises:
+            UpstreamDeadlineExceeded: Nếu deadline đã hết trước khi gửi, hoặc lời gọi bị cắt vì timeout đã rút ngắn.
+        """
+        configured_timeout = self.timeout_for(api_name)
+        with self.guard(api_name):
+            deadline = current_deadline()
+            timeout = configured_timeout
+            if deadline is not None:
+                if deadline.expired:  # Có thể đã hết trong lúc chờ bulkhead
+                    raise UpstreamDeadlineExceeded(api_name)
+                timeout = deadline.clamp(configured_timeout)
+            token = _translator_call.set((self.session_for(api_name), timeout))
+            try:
+                return self.get_translator(source=source, target=target).translate(text)
+            except requests.exceptions.Timeout as e:
+                if timeout != configured_timeout:  # Timeout do deadline rút ngắn, không phải do API
+                    raise UpstreamDeadlineExceeded(api_name) from e
+                raise
+            finally:
+                _translator_call.reset(token)
+
+    def close(self):
+        """Đóng tất cả kết nối đang mở (dùng khi tắt ứng dụng hoặc trong benchmark)."""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
@@ -0,0 +1,255 @@
+# word_cache.py
+
+# --- Standard Library Imports ---
+import json  # Tuần tự hóa kết quả API để lưu vào database
+import threading  # Khóa (lock) bảo vệ LRU và bộ đếm khi nhiều thread cùng truy cập
+from collections import OrderedDict  # Cài đặt LRU đơn giản
+from datetime import datetime, timedelta
+
+# --- Application-Specific Imports ---
+from models import db, WordCacheEntry, normalize_word  # normalize_word: chuẩn hóa khóa cache
+from single_flight import SingleFlight  # Gộp các lần tra cùng một khóa đang chạy đồng thời
+from upstream import UpstreamUnavailable, UpstreamError  # API bị chặn hoặc lỗi tạm thời: dùng bản cache đã hết hạn
+
+# Thời gian sống (TTL, giây) mặc định cho từng nguồn dữ liệu.
+# Dữ liệu từ điển/ví dụ gần như không thay đổi nên có thể giữ lâu.
+DEFAULT_TTL_SECONDS = {
+    'dictionary': 30 * 24 * 3600,  # 30 ngày
+    'tatoeba': 7 * 24 * 3600,  # 7 ngày
+    'translation': 30 * 24 * 3600,  # 30 ngày
+}
+DEFAULT_NEGATIVE_TTL_SECONDS = 3600  # Kết quả "không tìm thấy" chỉ giữ 1 giờ
+DEFAULT_LRU_SIZE = 5000  # Số mục tối đa trong tầng cache bộ nhớ (mỗi process)
+MAX_WORD_KEY_LENGTH = 500  # Đồng bộ với độ dài cột WordCacheEntry.word_key
+
+
+class WordCache:
+    """
+    Cache 2 tầng cho kết quả tra cứu từ các API bên ngoài:
+      1. Tầng "nóng": LRU trong bộ nhớ của process (nhanh, không cần truy vấn DB).
+      2. Tầng bền vững: bảng 'word_cache' trong database, dùng chung giữa các process/lần khởi động.
+
+    Khóa cache là (source, từ đã chuẩn hóa, source_lang, target_lang).
+    Mỗi nguồn có TTL riêng; kết quả "không tìm thấy" (negative) được lưu với TTL ngắn
+    để tránh gọi lại API liên tục cho những từ không tồn tại.
+    Khi cache miss, các request đồng thời cho cùng một khóa chỉ gọi API một lần (self.single_flight).
+    Nếu API đang bị chặn (UpstreamUnavailable) hoặc lỗi tạm thời (UpstreamError), bản ghi đã hết hạn trong bảng
+    word_cache (nếu có) được trả về; lỗi không bao giờ được lưu thành kết quả "không tìm thấy".
+    """
+
+    def __init__(self, app=None):
+        self._lru = OrderedDict()  # key -> (value, is_negative, expires_at)
+        self._lock = threading.Lock()
+        self._stats = {}  # source -> {'memory_hits', 'db_hits', 'misses', 'negative_hits'}
+        self.max_size = DEFAULT_LRU_SIZE
+        self.ttl_seconds = dict(DEFAULT_TTL_SECONDS)
+        self.negative_ttl_seconds = DEFAULT_NEGATIVE_TTL_SECONDS
+        self.single_flight = SingleFlight()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Đọc cấu hình từ app.config:
+          - WORD_CACHE_LRU_SIZE: số mục tối đa của tầng bộ nhớ.
+          - WORD_CACHE_TTL_SECONDS: dict {source: ttl} ghi đè TTL mặc định.
+          - WORD_CACHE_NEGATIVE_TTL_SECONDS: TTL cho kết quả "không tìm thấy".
+          - SINGLE_FLIGHT_*: xem SingleFlight.init_app.
+        """
+        self.max_size = app.config.setdefault('WORD_CACHE_LRU_SIZE', DEFAULT_LRU_SIZE)
+        self.ttl_seconds.update(app.config.setdefault('WORD_CACHE_TTL_SECONDS', {}))
+        self.negative_ttl_seconds = app.config.setdefault('WORD_CACHE_NEGATIVE_TTL_SECONDS',
+                                                          DEFAULT_NEGATIVE_TTL_SECONDS)
+        self.single_flight.init_app(app)
+        app.extensions['word_cache'] = self
+
+    # --- Bộ đếm hit/miss ---
+
+    def _count(self, source, counter):
+        with self._lock:
+            source_stats = self._stats.setdefault(
+                source, {'memory_hits': 0, 'db_hits': 0, 'misses': 0, 'negative_hits': 0, 'stale_hits': 0})
+            source_stats[counter] += 1
+
+    def get_stats(self):
+        """Trả về danh sách thống kê hit/miss theo từng nguồn (dùng cho trang /admin/api-logs)."""
+        with self._lock:
+            stats = []
+            for source, counters in sorted(self._stats.items()):
+                hits = counters['memory_hits'] + counters['db_hits']
+                total = hits + counters['misses']
+                stats.append(dict(counters, source=source, hits=hits, total=total,
+                                  hit_rate=round(100.0 * hits / total, 1) if total else 0.0))
+            return stats
+
+    # --- Tầng bộ nhớ (LRU) ---
+
+    def _memory_get(self, key, now):
+        with self._lock:
+            cached = self._lru.get(key)
+            if cached is None:
+                return None
+            if cached[2] <= now:  # Đã hết hạn
+                del self._lru[key]
+                return None
+            self._lru.move_to_end(key)
+            return cached
+
+    def _memory_set(self, key, value, is_negative, expires_at):
+        with self._lock:
+            self._lru[key] = (value, is_negative, expires_at)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_size:
+                self._lru.popitem(last=False)  # Bỏ mục ít được dùng nhất
+
+    # --- Tầng database ---
+
+    def _db_get(self, source, word_key, source_lang, target_lang, now, allow_expired=False):
+        try:
+            entry = WordCacheEntry.query.filter_by(source=source, word_key=word_key,
+                                                   source_lang=source_lang, target_lang=target_lang).first()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Lỗi khi đọc word_cache cho '{word_key}' ({source}): {e}")
+            return None
+        if entry is None or (entry.expires_at <= now and not allow_expired):
+            return None
+        return json.loads(entry.payload) if entry.payload else None, entry.is_negative, entry.expires_at
+
+    def _db_set(self, source, word_key, source_lang, target_lang, value, is_negative, now, expires_at):
+        try:
+            entry = WordCacheEntry.query.filter_by(source=source, word_key=word_key,
+                                                   source_lang=source_lang, target_lang=target_lang).first()
+            if entry is None:
+                entry = WordCacheEntry(source=source, word_key=word_key,
+                                       source_lang=source_lang, target_lang=target_lang)
+                db.session.add(entry)
+            entry.payload = json.dumps(value, ensure_ascii=False)
+            entry.is_negative = is_negative
+            entry.created_at = now
+            entry.expires_at = expires_at
+            db.session.commit()
+        except Exception as e:
+            # Có thể xảy ra khi 2 request cùng ghi một khóa (UNIQUE constraint). Cache chỉ là tối ưu,
+            # nên lỗi ở đây không được làm hỏng luồng xử lý chính.
+            db.session.rollback()
+            print(f"Lỗi khi ghi word_cache cho '{word_key}' ({source}): {e}")
+
+    # --- API chính ---
+
+    @staticmethod
+    def flight_key(source, word, source_lang='en', target_lang='vi'):
+        """Khóa cache/single-flight của một từ, hoặc None nếu từ không được cache (rỗng hoặc quá dài)."""
+        word_key = normalize_word(word)
+        if not word_key or len(word_key) > MAX_WORD_KEY_LENGTH:
+            return None
+        return source, word_key, source_lang, target_lang
+
+    def get_or_load(self, source, word, loader, source_lang='en', target_lang='vi', is_negative=None):
+        """
+        Lấy kết quả từ cache, hoặc gọi loader() rồi lưu lại kết quả nếu chưa có/đã hết hạn.
+
+        Args:
+            source (str): Tên nguồn dữ liệu (ví dụ: 'dictionary', 'tatoeba', 'translation').
+            word (str): Từ/đoạn văn cần tra cứu (sẽ được chuẩn hóa để làm khóa).
+            loader (callable): Hàm không tham số gọi API thật khi cache miss.
+            source_lang (str): Ngôn ngữ nguồn (là một phần của khóa).
+            target_lang (str): Ngôn ngữ đích (là một phần của khóa).
+            is_negative (callable, optional): Hàm nhận kết quả và trả về True nếu đó là
+                                              kết quả "không tìm thấy". Mặc định: kết quả rỗng/None.
+
+        Returns:
+            Kết quả của loader() (có thể lấy từ cache). Phải tuần tự hóa được bằng JSON.
+        """
+        key = self.flight_key(source, word, source_lang, target_lang)
+        if key is None:
+            return loader()  # Không cache chuỗi rỗng hoặc đoạn văn quá dài
+        word_key = key[1]
+        now = datetime.utcnow()
+
+        # 1. Tầng bộ nhớ
+        cached = self._memory_get(key, now)
+        if cached is not None:
+            self._count(source, 'memory_hits')
+            if cached[1]:
+                self._count(source, 'negative_hits')
+            return cached[0]
+
+        # 2. Tầng database
+        cached = self._db_get(source, word_key, source_lang, target_lang, now)
+        if cached is not None:
+            self._count(source, 'db_hits')
+            if cached[1]:
+                self._count(source, 'negative_hits')
+            self._memory_set(key, *cached)
+            return cached[0]
+
+        # 3. Cache miss: gọi API thật và lưu kết quả (một lần cho mọi request đồng thời cùng khóa)
+        def load_and_store():
+            # Một leader khác có thể vừa lưu kết quả ngay trước khi lời gọi này bắt đầu
+            cached_now = self._memory_get(key, datetime.utcnow())
+            if cached_now is not None:
+                return cached_now[0]
+            self._count(source, 'misses')
+            try:
+                value = loader()
+            except (UpstreamUnavailable, UpstreamError):
+                # API đang bị chặn hoặc lỗi tạm thời: dùng kết quả cũ (đã hết hạn) nếu có, không ghi đè cache
+                stale = self._db_get(source, word_key, source_lang, target_lang, now, allow_expired=True)
+                if stale is None or stale[1]:
+                    raise
+                self._count(source, 'stale_hits')
+                return stale[0]
+            negative = is_negative(value) if is_negative else not value
+            ttl = self.negative_ttl_seconds if negative else self.ttl_seconds.get(source, DEFAULT_NEGATIVE_TTL_SECONDS)
+            expires_at = now + timedelta(seconds=ttl)
+            self._memory_set(key, value, negative, expires_at)
+            self._db_set(source, word_key, source_lang, target_lang, value, negative, now, expires_at)
+            return value
+
+        return self.single_flight.do(key, load_and_store)
+
+    def get_many(self, source, words, source_lang='en', target_lang='vi'):
+        """
+        Tra cứu nhiều từ trong cache (không gọi API). Dùng cho các đường xử lý theo batch.
+
+        Returns:
+            dict: {word: value} chỉ gồm các từ có trong cache và chưa hết hạn.
+        """
+        now = datetime.utcnow()
+        found = {}
+        for word in words:
+            word_key = normalize_word(word)
+            if not word_key or len(word_key) > MAX_WORD_KEY_LENGTH:
+                continue
+            key = (source, word_key, source_lang, target_lang)
+            cached = self._memory_get(key, now)
+            if cached is not None:
+                self._count(source, 'memory_hits')
+            else:
+                cached = self._db_get(source, word_key, source_lang, target_lang, now)
+                if cached is None:
+                    continue
+                self._count(source, 'db_hits')
+                self._memory_set(key, *cached)
+            if cached[1]:
+                self._count(source, 'negative_hits')
+            found[word] = cached[0]
+        return found
+
+    def set(self, source, word, value, source_lang='en', target_lang='vi', is_negative=False):
+        """Lưu một kết quả đã lấy được từ API (theo batch) vào cả 2 tầng cache."""
+        word_key = normalize_word(word)
+        if not word_key or len(word_key) > MAX_WORD_KEY_LENGTH:
+            return
+        self._count(source, 'misses')
+        now = datetime.utcnow()
+        ttl = self.negative_ttl_seconds if is_negative else self.ttl_seconds.get(source, DEFAULT_NEGATIVE_TTL_SECONDS)
+        expires_at = now + timedelta(seconds=ttl)
+        self._memory_set((source, word_key, source_lang, target_lang), value, is_negative, expires_at)
+        self._db_set(source, word_key, source_lang, target_lang, value, is_negative, now, expires_at)
+
+    def clear_memory(self):
+        """Xóa tầng cache bộ nhớ của process hiện tại (không ảnh hưởng bảng word_cache)."""
+        with self._lock:
+            self._lru.clear()
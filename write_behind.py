@@ -0,0 +1,203 @@
+# write_behind.py
+
+# --- Standard Library Imports ---
+import atexit  # Ghi nốt các bản ghi còn trong hàng đợi khi process tắt
+import os  # Phát hiện fork (mỗi process cần thread ghi riêng)
+import queue  # Hàng đợi có giới hạn giữa các thread tạo bản ghi và thread ghi database
+import threading
+import time
+
+# --- Third-party Library Imports ---
+from sqlalchemy import insert  # Bulk insert nhiều dòng trong một câu lệnh
+
+# --- Application-Specific Imports ---
+from models import db
+
+
+class WriteBehindWriter:
+    """
+    Lớp cơ sở cho các bảng chỉ ghi thêm (append-only) như APILog, UserActivity:
+    bản ghi được đưa vào một hàng đợi trong bộ nhớ và một thread nền bulk insert theo lô
+    khi đủ <PREFIX>_BATCH_SIZE bản ghi hoặc sau <PREFIX>_FLUSH_INTERVAL giây.
+
+    - Bộ nhớ có giới hạn: hàng đợi tối đa <PREFIX>_QUEUE_MAXSIZE bản ghi.
+    - Khi hàng đợi đầy: <PREFIX>_OVERFLOW_POLICY = 'drop' (bỏ bản ghi mới, mặc định) hoặc 'block'
+      (chờ tối đa <PREFIX>_BLOCK_TIMEOUT giây rồi mới bỏ). Số bản ghi bị bỏ được đếm trong get_stats().
+    - Thread ghi dùng app context và session riêng, nên lỗi khi ghi không bao giờ
+      rollback dữ liệu của request.
+    - Khi process tắt, các bản ghi còn lại được ghi nốt (atexit).
+
+    Lớp con khai báo `model`, `config_prefix`, `extension_name` và cài đặt `_to_row()`;
+    có thể cài đặt `_after_insert()` để ghi thêm dữ liệu tổng hợp trong cùng transaction.
+    """
+
+    model = None  # Model SQLAlchemy được bulk insert
+    config_prefix = None  # Tiền tố của các khóa cấu hình, ví dụ 'API_LOG'
+    extension_name = None  # Tên đăng ký trong app.extensions
+    thread_name = 'write-behind'
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = None
+        self._thread = None
+        self._thread_pid = None
+        self._lock = threading.Lock()  # Bảo vệ việc khởi động thread và bộ đếm
+        self._flush_lock = threading.Lock()  # Chỉ một nơi ghi vào database tại một thời điểm
+        self._stopping = threading.Event()
+        self._stats = {'queued': 0, 'written': 0, 'dropped': 0, 'failed': 0, 'flushes': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Đọc cấu hình từ app.config (với PREFIX = config_prefix):
+          - PREFIX_WRITE_BEHIND: False để ghi ngay (vẫn dùng session riêng), mặc định True.
+          - PREFIX_QUEUE_MAXSIZE: số bản ghi tối đa trong hàng đợi.
+          - PREFIX_BATCH_SIZE: số bản ghi tối đa trong một lần bulk insert.
+          - PREFIX_FLUSH_INTERVAL: thời gian chờ tối đa (giây) trước khi ghi một lô chưa đầy.
+          - PREFIX_OVERFLOW_POLICY: 'drop' hoặc 'block' khi hàng đợi đầy.
+          - PREFIX_BLOCK_TIMEOUT: thời gian chờ tối đa (giây) với policy 'block'.
+        """
+        prefix = self.config_prefix
+        self.app = app
+        self.write_behind = app.config.setdefault(f'{prefix}_WRITE_BEHIND', True)
+        self.batch_size = app.config.setdefault(f'{prefix}_BATCH_SIZE', 500)
+        self.flush_interval = app.config.setdefault(f'{prefix}_FLUSH_INTERVAL', 1.0)
+        self.overflow_policy = app.config.setdefault(f'{prefix}_OVERFLOW_POLICY', 'drop')
+        self.block_timeout = app.config.setdefault(f'{prefix}_BLOCK_TIMEOUT', 0.5)
+        self._queue = queue.Queue(maxsize=app.config.setdefault(f'{prefix}_QUEUE_MAXSIZE', 10000))
+        app.extensions[self.extension_name] = self
+        atexit.register(self.shutdown)
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self._stats[counter] = self._stats.get(counter, 0) + amount
+
+    def get_stats(self):
+        """Trả về bộ đếm của writer trong process hiện tại."""
+        with self._lock:
+            return dict(self._stats, pending=self._queue.qsize(), policy=self.overflow_policy)
+
+    # --- Ghi ---
+
+    def _to_row(self, obj):
+        """Chuyển một bản ghi thành dict để bulk insert. Lớp con phải cài đặt."""
+        raise NotImplementedError
+
+    def _after_insert(self, rows):
+        """Chạy sau khi insert `rows`, trước commit (cùng transaction). Mặc định không làm gì."""
+
+    def enqueue_row(self, row):
+        """
+        Đưa một dict (đã sẵn sàng để insert) vào hàng đợi. Không chạm vào db.session của request.
+
+        Returns:
+            bool: False nếu bản ghi bị bỏ do hàng đợi đầy.
+        """
+        if not self.write_behind:
+            self._insert_rows([row])
+            return True
+
+        self._ensure_thread()
+        try:
+            if self.overflow_policy == 'block':
+                self._queue.put(row, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(row)
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('queued')
+        return True
+
+    def write(self, obj):
+        """Chuyển obj thành dict bằng _to_row() rồi đưa vào hàng đợi."""
+        return self.enqueue_row(self._to_row(obj))
+
+    def _ensure_thread(self):
+        """Khởi động thread ghi (lần đầu, hoặc sau khi process bị fork)."""
+        if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def _next_batch(self, timeout):
+        """Chờ bản ghi đầu tiên tối đa `timeout` giây, sau đó gom thêm cho đến khi đủ lô hoặc hết flush_interval."""
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._next_batch(timeout=self.flush_interval)
+            if batch:
+                self._insert_rows(batch)
+                self._mark_done(len(batch))
+
+    def _mark_done(self, count):
+        for _ in range(count):
+            self._queue.task_done()
+
+    def _insert_rows(self, rows):
+        with self._flush_lock, self.app.app_context():
+            try:
+                db.session.execute(insert(self.model), rows)
+                self._after_insert(rows)
+                db.session.commit()
+                self._count('written', len(rows))
+                self._count('flushes')
+            except Exception as e:
+                db.session.rollback()
+                self._count('failed', len(rows))
+                print(f"CRITICAL ERROR: Không thể ghi {len(rows)} bản ghi {self.model.__tablename__} vào database: {e}")
+
+    def flush(self, timeout=5.0):
+        """
+        Ghi ngay tất cả bản ghi đang chờ trong thread hiện tại, sau đó chờ (tối đa `timeout` giây)
+        lô mà thread nền đang ghi dở.
+
+        Returns:
+            bool: True nếu mọi bản ghi đã đưa vào hàng đợi đều đã được xử lý.
+        """
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                break
+            self._insert_rows(batch)
+            self._mark_done(len(batch))
+
+        # Giống Queue.join() nhưng có timeout
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def shutdown(self, timeout=5.0):
+        """Dừng thread ghi và ghi nốt các bản ghi còn lại."""
+        self._stopping.set()
+        if self._thread is not None and self._thread_pid == os.getpid():
+            self._thread.join(timeout)
+        self.flush()